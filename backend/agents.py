@@ -0,0 +1,232 @@
+"""
+Pluggable source agents for the comparison markets (StockX, TCGPlayer, PWCC...).
+
+An agent prices one card on one market. It subclasses SourceAgent, declares
+what a fetch costs and how it may be run, and implements ``scrape(card)``:
+
+    class HeritageAgent(SourceAgent):
+        name, label, host = 'heritage', 'Heritage', 'www.ha.com'
+        cost, concurrency = 3.0, 1
+        metrics = reference_fields = ('last_sale',)
+
+        async def scrape(self, card):
+            ...  # {'last_sale': 1234.0, 'url': ...}
+
+    registry.register(HeritageAgent())
+
+Then add the module to AGENT_MODULES. Registering an agent sets up its cache
+TTL and its resilience guard (timeout bounds, circuit breaker). /search, the
+scanner and the refresher all take their agents from the registry, so a new
+source needs no change to the request path.
+
+A market that was read but doesn't list the card (or has no prices for it)
+is a None result, which is cached like any other answer. A scrape that
+couldn't read the market (a bot check, a navigation error, an error status)
+raises instead, so it counts against the source's circuit breaker.
+
+``fetch(card)`` returns a PriceRecord: the agent's metrics under their
+existing field names (e.g. StockX ``lowest_ask``), the one reference price the
+market engine compares listings against, and the grade that price refers to.
+Concurrency, cost and enablement can be overridden per agent from the
+environment, e.g. AGENT_STOCKX_CONCURRENCY=1 or AGENT_PWCC_ENABLED=0.
+"""
+
+import asyncio
+import concurrent.futures
+import importlib
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from cache import result_cache
+from config import AGENT_MODULES
+from resilience import resilience
+
+
+class ScrapeFailed(Exception):
+    """A scrape couldn't read the market: blocked, a navigation error or an error status."""
+
+
+@dataclass
+class PriceRecord:
+    source: str                         # the agent's label, e.g. 'StockX'
+    url: str
+    metrics: Dict[str, float]
+    reference_price: float = 0.0
+    company: str = ''                   # grading company/grade the prices refer to ('' / 0 = raw)
+    grade: float = 0.0
+    extras: Dict[str, Any] = field(default_factory=dict)
+    fetched_at: float = field(default_factory=time.time)
+
+    def to_dict(self) -> Dict:
+        """JSON form. Metrics and extras stay top-level so clients keep reading e.g. ``lowest_ask``."""
+        return {
+            **self.extras,
+            **self.metrics,
+            'source': self.source,
+            'url': self.url,
+            'metrics': dict(self.metrics),
+            'reference_price': self.reference_price,
+            'company': self.company or None,
+            'grade': self.grade or None,
+            'fetched_at': self.fetched_at,
+        }
+
+
+class CrossLoopSemaphore:
+    """A counting semaphore that coroutines on different event loops can share."""
+
+    def __init__(self, value: int):
+        self._value = value
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    async def __aenter__(self):
+        with self._lock:
+            if self._value > 0:
+                self._value -= 1
+                return self
+            waiter = concurrent.futures.Future()
+            self._waiters.append(waiter)
+        try:
+            await asyncio.wrap_future(waiter)
+        except asyncio.CancelledError:
+            # Handed a slot just as we were cancelled: pass it on
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._release()
+        return False
+
+    def _release(self):
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if waiter.set_running_or_notify_cancel():
+                    waiter.set_result(None)
+                    return
+            self._value += 1
+
+
+class SourceAgent:
+    name = ''                                   # cache/config key, e.g. 'stockx'
+    label = ''                                  # comparison_data key, e.g. 'StockX'
+    host = ''                                   # for per-host rate limits
+    cost = 1.0                                  # relative cost of one fetch; a browser scrape is ~3
+    concurrency = 2                             # fetches in flight per process
+    ttl: Tuple[float, float] = (10 * 60, 30 * 60)   # cache (fresh, stale-while-revalidate) seconds
+    timeout: Tuple[float, float] = (5.0, 25.0)      # resilience guard (min, max) seconds
+    metrics: Tuple[str, ...] = ()               # price fields the agent reports
+    reference_fields: Tuple[str, ...] = ()      # the first positive one is the reference price
+    graded: Tuple[str, float] = ('', 0.0)       # (company, grade) the prices refer to
+    enabled = True
+
+    def __init__(self):
+        for setting, kind in (('cost', float), ('concurrency', int)):
+            value = os.environ.get(f'AGENT_{self.name.upper()}_{setting.upper()}')
+            if value:
+                setattr(self, setting, kind(value))
+        self.enabled = os.environ.get(f'AGENT_{self.name.upper()}_ENABLED', '1' if self.enabled else '0') != '0'
+        self._slots = CrossLoopSemaphore(self.concurrency)
+
+    def supports(self, card: Dict) -> bool:
+        """Whether this agent can price ``card``; all cards by default."""
+        return True
+
+    async def scrape(self, card: Dict) -> Optional[Dict]:
+        """The raw result for ``card``: a dict with the agent's metrics and a url, or None when the
+        market doesn't list the card. Raises (e.g. ScrapeFailed) when the market couldn't be read."""
+        raise NotImplementedError
+
+    def normalize(self, raw: Dict) -> Optional[PriceRecord]:
+        """A PriceRecord from a raw result; None when no metric has a price."""
+        metrics = {}
+        for name in self.metrics:
+            try:
+                metrics[name] = float(raw.get(name) or 0)
+            except (TypeError, ValueError):
+                metrics[name] = 0.0
+        if not any(metrics.values()):
+            return None
+        reference = next((metrics[name] for name in self.reference_fields if metrics.get(name, 0) > 0), 0.0)
+        extras = {k: v for k, v in raw.items() if k not in metrics and k not in ('source', 'url')}
+        company, grade = self.graded
+        return PriceRecord(self.label, raw.get('url') or raw.get('link') or '', metrics, reference,
+                           company, grade, extras)
+
+    async def fetch(self, card: Dict) -> Optional[PriceRecord]:
+        async with self._slots:
+            raw = await self.scrape(card)
+        return self.normalize(raw) if raw else None
+
+
+class AgentRegistry:
+    def __init__(self):
+        self._agents: Dict[str, SourceAgent] = {}
+        self._lock = threading.Lock()
+
+    def register(self, agent: SourceAgent) -> SourceAgent:
+        if not agent.name or not agent.label:
+            raise ValueError(f"{type(agent).__name__} needs a name and a label")
+        with self._lock:
+            self._agents[agent.name] = agent
+        result_cache.ttls[agent.name] = agent.ttl
+        resilience.add(agent.name, agent.timeout)
+        return agent
+
+    def get(self, name: str) -> SourceAgent:
+        return self._agents[name]
+
+    def all(self) -> List[SourceAgent]:
+        """Enabled agents in registration order."""
+        with self._lock:
+            return [agent for agent in self._agents.values() if agent.enabled]
+
+    def select(self, card: Dict, names: Optional[Iterable[str]] = None,
+               budget: Optional[float] = None) -> List[SourceAgent]:
+        """
+        The agents to run for one request: those named (all enabled ones by
+        default) that support ``card``. With a cost ``budget``, the cheapest
+        agents that fit it. Unknown names raise KeyError.
+        """
+        agents = self.all()
+        if names is not None:
+            names = set(names)
+            unknown = names - {agent.name for agent in agents}
+            if unknown:
+                raise KeyError(', '.join(sorted(unknown)))
+            agents = [agent for agent in agents if agent.name in names]
+        agents = [agent for agent in agents if agent.supports(card)]
+        if budget:
+            chosen, spent = [], 0.0
+            for agent in sorted(agents, key=lambda a: a.cost):
+                if spent + agent.cost <= budget:
+                    chosen.append(agent)
+                    spent += agent.cost
+            agents = [agent for agent in agents if agent in chosen]
+        return agents
+
+    def describe(self) -> List[Dict]:
+        with self._lock:
+            agents = list(self._agents.values())
+        return [{
+            'name': agent.name, 'label': agent.label, 'host': agent.host, 'cost': agent.cost,
+            'concurrency': agent.concurrency, 'ttl': list(agent.ttl), 'timeout': list(agent.timeout),
+            'metrics': list(agent.metrics), 'enabled': agent.enabled,
+        } for agent in agents]
+
+
+registry = AgentRegistry()
+
+
+def load_agents(modules: Iterable[str] = AGENT_MODULES) -> AgentRegistry:
+    """Import the agent modules; each registers its agents on import."""
+    for module in modules:
+        importlib.import_module(module.strip())
+    return registry
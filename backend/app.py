@@ -1,21 +1,40 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
 from pokemontcgsdk import Card
 from pokemontcgsdk import RestClient
-from ebaysdk.finding import Connection as Finding
-import re
+from pokemontcgsdk import querybuilder as pokemontcg_queries
 import os
+import json
+import time
 import asyncio
-from typing import List, Dict, Optional, Tuple
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 
-# Import the new agents
-from stockx_scraper import get_stockx_data
-from tcgplayer_analyst import get_tcgplayer_data
-from pwcc_agent import get_pwcc_data
-
-# Import category router and config
-from config import API_BASE_URL
+# Import the source agents, category router and config
+from agents import load_agents, registry
+from config import API_BASE_URL, HISTORY_ROLLUPS, HISTORY_STATS_WINDOW, PAGE_POLICY, POKEMONTCG_API_URL, REFRESH_MODE, \
+    SCAN_WORKERS, SCRAPE_MODE, SEARCH_COST_BUDGET, SOURCE_DEADLINES
 from routers.pokemon_cards import pokemon_cards_bp
+from cache import result_cache, normalize_query
+from cluster import SECRET_HEADER as CLUSTER_SECRET_HEADER, cluster
+from singleflight import SingleFlight
+from fanout import gather_with_deadlines, iter_with_deadlines, same_card
+from http_cache import Prepared, cache_control, flask_response, prepare
+from job_queue import job_queue
+from card_index import guess_card
+from catalog import card_catalog
+from ebay_client import ebay_client
+from market_engine import reference_prices, score_listings, summarize
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, TRACE_HEADER, end_trace, http_requests, http_seconds, \
+    metrics, span, start_trace, wants_trace
+from page_policy import scrape_metrics
+from price_history import price_history
+from refresher import Refresher, demand, featured_query
+from resilience import SourceUnavailable, resilience
+from scrape_tiers import tiers
+from suggest import build_index
+from scanner import ScanJobs, dedupe, read_state, scan_path
+from seed_data import FEATURED_CARDS
+from streaming import STREAM_HEADERS, stream_in_thread, stream_mimetype, wants_sse
 
 app = Flask(__name__)
 CORS(app)
@@ -25,225 +44,587 @@ app.register_blueprint(pokemon_cards_bp)
 
 # Configure API keys
 POKEMONTCG_API_KEY = os.environ.get('POKEMONTCG_API_KEY', '')
-EBAY_APP_ID = os.environ.get('EBAY_APP_ID', 'YOUR_EBAY_APP_ID')
-EBAY_DEV_ID = os.environ.get('EBAY_DEV_ID', 'YOUR_EBAY_DEV_ID')
-EBAY_CERT_ID = os.environ.get('EBAY_CERT_ID', 'YOUR_EBAY_CERT_ID')
 
 if POKEMONTCG_API_KEY:
     RestClient.configure(POKEMONTCG_API_KEY)
+# The SDK reads its endpoint from a module global
+pokemontcg_queries.__endpoint__ = POKEMONTCG_API_URL
 
+# Typeahead index, built once from the local catalog (or the seeded products)
+suggest_index = build_index(card_catalog)
 
-class GradeParser:
-    GRADING_PATTERNS = {
-        'PSA': r'PSA\s*(\d+(?:\.\d+)?)',
-        'BGS': r'BGS\s*(\d+(?:\.\d+)?)',
-        'CGC': r'CGC\s*(\d+(?:\.\d+)?)',
-        'SGC': r'SGC\s*(\d+(?:\.\d+)?)',
-        'TAG': r'TAG\s*(\d+(?:\.\d+)?)',
-        'ACE': r'ACE\s*(\d+(?:\.\d+)?)',
-        'PCA': r'PCA\s*(\d+(?:\.\d+)?)',
-    }
-    
-    @staticmethod
-    def parse_grade(title: str) -> Tuple[Optional[str], Optional[float]]:
-        title_upper = title.upper()
-        for company, pattern in GradeParser.GRADING_PATTERNS.items():
-            match = re.search(pattern, title_upper)
-            if match:
-                try:
-                    grade = float(match.group(1))
-                    if 1 <= grade <= 10:
-                        return company, grade
-                except ValueError:
-                    continue
-        return None, None
+# Concurrent identical fetches share one upstream call
+inflight = SingleFlight()
+
+
+def _cached_fetch(source: str, key: str, fetch, refresh=None):
+    """Serve ``key`` from the result cache, coalescing concurrent misses into one guarded fetch.
+
+    ``refresh`` replaces ``fetch`` for background refreshes of stale entries.
+    """
+    def guarded(fn):
+        return lambda: inflight.do(key, lambda: resilience.call(source, fn))
+    return result_cache.get_or_fetch(source, key, guarded(fetch), guarded(refresh) if refresh else None)
 
 
 async def fetch_card_metadata_async(query: str) -> Optional[Dict]:
+    # Resolved locally when the card catalog has been synced (python catalog.py sync)
+    metadata = card_catalog.resolve(query)
+    if metadata:
+        return metadata
     # Running in a thread since pokemontcgsdk is synchronous
-    return await asyncio.to_thread(_fetch_card_metadata, query)
+    return await _cached_fetch(
+        'metadata', result_cache.make_key('metadata', query),
+        lambda: asyncio.to_thread(_fetch_card_metadata, query)
+    )
 
 def _fetch_card_metadata(query: str) -> Optional[Dict]:
-    try:
-        cards = Card.where(q=f'name:{query}')
-        if cards:
-            card = cards[0]
-            return {
-                'name': card.name,
-                'id': card.id,
-                'image_url': card.images.large if hasattr(card, 'images') else None,
-                'set_name': card.set.name if hasattr(card, 'set') else 'Unknown Set',
-                'set_series': card.set.series if hasattr(card, 'set') else 'Unknown Series',
-                'number': card.number if hasattr(card, 'number') else '',
-                'rarity': card.rarity if hasattr(card, 'rarity') else 'Unknown',
-                'release_date': card.set.releaseDate if hasattr(card, 'set') and hasattr(card.set, 'releaseDate') else None,
-            }
-    except Exception as e:
-        print(f"Error fetching card metadata: {str(e)}")
+    # Upstream errors propagate so the source's circuit breaker sees them
+    cards = Card.where(q=f'name:{query}')
+    if cards:
+        card = cards[0]
+        return {
+            'name': card.name,
+            'id': card.id,
+            'image_url': card.images.large if hasattr(card, 'images') else None,
+            'set_name': card.set.name if hasattr(card, 'set') else 'Unknown Set',
+            'set_series': card.set.series if hasattr(card, 'set') else 'Unknown Series',
+            'number': card.number if hasattr(card, 'number') else '',
+            'rarity': card.rarity if hasattr(card, 'rarity') else 'Unknown',
+            'release_date': card.set.releaseDate if hasattr(card, 'set') and hasattr(card.set, 'releaseDate') else None,
+        }
     return None
 
 
-async def fetch_ebay_listings_async(query: str) -> List[Dict]:
-    return await asyncio.to_thread(_fetch_ebay_listings, query)
+async def fetch_ebay_listings_async(query: str, on_batch=None) -> List[Dict]:
+    """
+    Graded eBay listings for ``query``; on a cache miss ``on_batch`` sees the
+    listings so far as each call lands. It runs on the caller's loop only: a
+    stale hit's background refresh fetches without it.
+    """
+    return await _cached_fetch(
+        'ebay', result_cache.make_key('ebay', query),
+        lambda: ebay_client.fetch_listings(query, on_batch),
+        refresh=lambda: ebay_client.fetch_listings(query)
+    )
+
 
-def _fetch_ebay_listings(query: str) -> List[Dict]:
-    try:
-        api = Finding(
-            appid=EBAY_APP_ID,
-            devid=EBAY_DEV_ID,
-            certid=EBAY_CERT_ID,
-            config_file=None,
-            siteid='EBAY-US'
-        )
-        search_query = f"{query} graded pokemon card"
-        response = api.execute('findItemsAdvanced', {
-            'keywords': search_query,
-            'itemFilter': [
-                {'name': 'ListingType', 'value': 'FixedPrice'},
-                {'name': 'Condition', 'value': 'New'},
-            ],
-            'sortOrder': 'PricePlusShippingLowest',
-            'paginationInput': {'entriesPerPage': 50, 'pageNumber': 1}
-        })
-        
-        listings = []
-        if response.reply.ack == 'Success':
-            search_result = response.reply.searchResult
-            if hasattr(search_result, 'item'):
-                for item in search_result.item:
-                    title = item.title
-                    company, grade = GradeParser.parse_grade(title)
-                    if company and grade:
-                        try:
-                            price = float(item.sellingStatus.currentPrice.value)
-                            listings.append({
-                                'title': title,
-                                'price': price,
-                                'currency': item.sellingStatus.currentPrice._currencyId,
-                                'url': item.viewItemURL,
-                                'company': company,
-                                'grade': grade,
-                                'image_url': item.galleryURL if hasattr(item, 'galleryURL') else None,
-                                'condition': item.condition.conditionDisplayName if hasattr(item, 'condition') else 'N/A',
-                                'location': item.location if hasattr(item, 'location') else 'N/A',
-                                'source': 'eBay'
-                            })
-                        except Exception:
-                            continue
-        return listings
-    except Exception as e:
-        print(f"Error fetching eBay listings: {repr(e)}")
-        return []
-
-
-def normalize_and_calculate_arbitrage(listings, stockx_results, tcg_results, pwcc_results):
-    """The Brain: Match apples-to-apples and find arbitrage opportunities."""
-    
-    # 1. Calculate Standard Market Stats (eBay-based)
-    grade_prices = {}
-    for l in listings:
-        key = str(l['grade'])
-        if key not in grade_prices: grade_prices[key] = []
-        grade_prices[key].append(l['price'])
-        
-    market_stats = {}
-    for gk, p in grade_prices.items():
-        market_stats[gk] = {'average': sum(p)/len(p), 'count': len(p), 'min': min(p), 'max': max(p)}
-
-    # 2. Enrich with StockX and TCGPlayer data & Check Arbitrage
-    # Target common grades for comparison
-    comparison_data = {
-        'StockX': stockx_results,
-        'TCGPlayer': tcg_results,
-        'PWCC': pwcc_results
-    }
+def _card_key(source: str, card: Dict) -> str:
+    """Cache key for a scraped source: the card id once known, else name + set."""
+    return result_cache.card_key(source, card)
+
+
+async def _agent_record(agent, card: Dict) -> Optional[Dict]:
+    # In cluster mode the node that owns the card runs the agent (see cluster.py)
+    return await cluster.fetch(agent.name, card, lambda: _scrape_record(agent, card))
+
+
+async def _scrape_record(agent, card: Dict) -> Optional[Dict]:
+    if SCRAPE_MODE == 'queue':
+        # A worker process runs the agent (python workers.py); it also caches the result
+        return await job_queue.run(agent.name, _card_key(agent.name, card), card)
+    record = await agent.fetch(card)
+    return record.to_dict() if record else None
 
-    for listing in listings:
-        listing['arbitrage_opportunity'] = False
-        listing['deal_score'] = 50 # Base score
-        
-        # Match with StockX (if grade matches)
-        # Assuming stockx_results is a dict of grade -> data or a single call result
-        # For this implementation, we assume stockx_results is the best match for the searched card/grade
-        if stockx_results and stockx_results.get('lowest_ask'):
-            # Only compare if it's the right grade (StockX specialist was targeted)
-            # Logic: If eBay Price < StockX Lowest Ask * 0.85, flag as arbitrage
-            if listing['price'] < stockx_results['lowest_ask'] * 0.85:
-                listing['arbitrage_opportunity'] = True
-                listing['deal_score'] = 90
-            
-        # Deal Score adjustments
-        grade_key = str(listing['grade'])
-        avg_price = market_stats.get(grade_key, {}).get('average', 0)
-        if avg_price > 0:
-            if listing['price'] < avg_price * 0.80:
-                listing['is_steal'] = True
-                listing['deal_score'] += 20
-            else:
-                listing['is_steal'] = False
 
+def _agent_fetcher(agent):
+    """Cached, coalesced and guarded fetch of one source agent's record for a card."""
+    async def fetch(card: Dict) -> Optional[Dict]:
+        return await _cached_fetch(agent.name, _card_key(agent.name, card), lambda: _agent_record(agent, card))
+    return fetch
+
+
+load_agents()
+
+# Source agents only need the card name and set, so they can start early
+SCRAPED_SOURCES = {agent.name: _agent_fetcher(agent) for agent in registry.all()}
+
+
+def _refresh_plan(source: str, key: str, fetch):
+    return key, lambda: resilience.call(source, fetch)
+
+
+def _agent_plan(agent):
+    return lambda card, query: _refresh_plan(agent.name, _card_key(agent.name, card), lambda: _agent_record(agent, card))
+
+
+# What the refresher re-fetches to keep a hot card warm: source -> (cache key, guarded upstream fetch)
+REFRESH_PLANS = {
+    'ebay': lambda card, query: _refresh_plan(
+        'ebay', result_cache.make_key('ebay', query), lambda: ebay_client.fetch_listings(query)),
+    **{agent.name: _agent_plan(agent) for agent in registry.all()},
+}
+
+
+def _speculative_target(query: str) -> Dict:
+    """Best guess at the card a query resolves to, without a network call."""
+    cached = result_cache.peek('metadata', result_cache.make_key('metadata', query))
+    if cached:
+        return cached
+    return card_catalog.resolve(query) or guess_card(query) or {'name': query.strip(), 'set_name': ''}
+
+
+async def _adopt_speculative(source: str, task: asyncio.Task, guess: Dict, metadata: Dict):
+    """Await a speculative scrape that hit the right card and cache it under the card id."""
+    result = await task
+    if result is not None and not guess.get('id') and metadata.get('id'):
+        result_cache.set(source, _card_key(source, metadata), result)
+    return result
+
+
+def normalize_and_calculate_arbitrage(listings, agent_results: Dict[str, Optional[Dict]]):
+    """The Brain: Match apples-to-apples and find arbitrage opportunities.
+
+    ``agent_results`` maps agent names to their records; comparison_data
+    keys them by agent label, with None for agents that didn't run.
+    Per-grade market stats (with a per-company breakdown) and deal scores
+    against every comparison source come from the vectorized market engine.
+    """
+    comparison_data = {agent.label: agent_results.get(agent.name) for agent in registry.all()}
+    market_stats = score_listings(listings, comparison_data)
     return listings, market_stats, comparison_data
 
 
-@app.route('/search', methods=['GET'])
-async def search():
-    query = request.args.get('q', '')
-    if not query:
-        return jsonify({'error': 'Query parameter "q" is required'}), 400
-    
-    # Run heavy operations in parallel
-    # 1. Fetch metadata and eBay listings first to get details for specialized agents
-    metadata, ebay_listings = await asyncio.gather(
-        fetch_card_metadata_async(query),
-        fetch_ebay_listings_async(query)
-    )
-    
-    if not metadata:
-        return jsonify({'error': 'No card metadata found for this query'}), 404
-
-    # 2. Prepare specialized agent tasks based on metadata
-    stockx_task = get_stockx_data(metadata['name'], metadata['set_name'], "PSA 10")
-    tcg_task = get_tcgplayer_data(metadata['name'], metadata['set_name'])
-    pwcc_task = get_pwcc_data(metadata['name'], metadata['set_name'])
-    
-    # Run Source Agents in parallel
-    results = await asyncio.gather(stockx_task, tcg_task, pwcc_task)
-    stockx_data, tcg_data, pwcc_data = results
-    
-    # 3. Normalize and calculate Arbitrage
-    final_listings, market_stats, compare_sources = normalize_and_calculate_arbitrage(
-        ebay_listings, stockx_data, tcg_data, pwcc_data
-    )
-    
-    # 4. Sort by Deal Score (High to Low)
+async def _search_body(query: str, metadata: Dict, results: Dict, late: List[str],
+                       pending: List[str], degraded: Dict[str, str]) -> Dict:
+    """The /search response for whatever sources have settled so far."""
+    ebay_listings = results['ebay'] or []
+
+    # 4. Normalize and calculate Arbitrage
+    with span('scoring'):
+        final_listings, market_stats, compare_sources = normalize_and_calculate_arbitrage(
+            ebay_listings, {source: result for source, result in results.items() if source != 'ebay'}
+        )
+
+    # eBay late or empty: fall back to recently stored listings for market stats
+    market_stats_source = 'live'
+    if not ebay_listings and 'ebay' not in pending and metadata.get('id'):
+        with span('history'):
+            stored = await asyncio.to_thread(
+                price_history.listings_since, metadata['id'], time.time() - HISTORY_STATS_WINDOW
+            )
+        if stored:
+            market_stats, market_stats_source = summarize(stored), 'history'
+
+    # 5. Sort by Deal Score (High to Low)
     final_listings = sorted(final_listings, key=lambda x: (-x.get('deal_score', 0), x['price']))
-    
-    response = {
+
+    return {
         'query': query,
         'card': metadata,
         'listings': final_listings,
         'market_stats': market_stats,
+        'market_stats_source': market_stats_source,
         'comparison_data': compare_sources,
-        'total_results': len(final_listings)
+        'total_results': len(final_listings),
+        'partial': bool(late or degraded),
+        'timed_out_sources': list(late),
+        'pending_sources': list(pending),
+        'degraded_sources': dict(degraded),
     }
-    
-    return jsonify(response)
 
 
+async def search_events(query: str, sources: Optional[List[str]] = None) -> AsyncIterator[Tuple[str, Dict]]:
+    """The /search pipeline as a stream of ``(event, body)`` pairs.
+
+    'card' as soon as metadata resolves, then 'update' each time eBay or a
+    scraped source settles, with listings re-scored against everything that
+    has arrived so far; the last one is 'done' instead. eBay listings also
+    stream in while its pages and grade variants land, as 'update' events
+    that still list eBay under 'pending_sources'. Every body has the
+    full /search response shape. A failed lookup yields one 'error' body
+    carrying a 'status'. Sources whose circuit breaker is open, or that time
+    out or fail upstream, settle at once as None and are listed with the
+    reason under 'degraded_sources'. ``sources`` limits the source agents
+    run (all of them by default), within SEARCH_COST_BUDGET.
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    deadlines = {source: started + seconds for source, seconds in SOURCE_DEADLINES.items()}
+    for agent in registry.all():
+        deadlines.setdefault(agent.name, started + agent.timeout[1])
+    degraded = {}
+    progress = asyncio.Queue()
+
+    async def settle(source: str, fetch):
+        try:
+            with span('fetch', source):
+                return await fetch
+        except SourceUnavailable as e:
+            degraded[source] = e.reason
+            return None
+
+    # 1. Start everything at once: metadata, eBay, and the scraped sources
+    #    speculatively against our best local guess at the card
+    metadata_task = asyncio.ensure_future(settle('metadata', fetch_card_metadata_async(query)))
+    ebay_task = asyncio.ensure_future(settle(
+        'ebay', fetch_ebay_listings_async(query, lambda batch: progress.put_nowait(('ebay', batch)))))
+    guess = _speculative_target(query)
+    agents = [agent.name for agent in registry.select(guess, sources, SEARCH_COST_BUDGET)]
+    scraped_tasks = {
+        source: asyncio.ensure_future(settle(source, SCRAPED_SOURCES[source](guess)))
+        for source in agents
+    }
+    sources = {'ebay': ebay_task, **scraped_tasks}
+
+    try:
+        resolved, timed_out = await gather_with_deadlines(
+            {'metadata': metadata_task}, deadlines
+        )
+        metadata = resolved['metadata']
+        if not metadata:
+            if 'metadata' in degraded:
+                yield 'error', {'error': f"Card metadata lookup unavailable ({degraded['metadata']})", 'status': 503}
+            elif timed_out:
+                yield 'error', {'error': 'Card metadata lookup timed out', 'status': 504}
+            else:
+                yield 'error', {'error': 'No card metadata found for this query', 'status': 404}
+            return
+
+        # 2. Keep speculative scrapes that targeted the resolved card, re-target the rest
+        if same_card(guess, metadata):
+            scraped_tasks = {
+                source: asyncio.ensure_future(_adopt_speculative(source, task, guess, metadata))
+                for source, task in scraped_tasks.items()
+            }
+        else:
+            for source, task in scraped_tasks.items():
+                task.cancel()
+                degraded.pop(source, None)
+            scraped_tasks = {
+                source: asyncio.ensure_future(settle(source, SCRAPED_SOURCES[source](metadata)))
+                for source in agents
+            }
+        sources = {'ebay': ebay_task, **scraped_tasks}
+
+        # 3. Report each source as it settles, each bounded by its own deadline
+        results = {source: None for source in sources}
+        # The latest listings from sources still fetching; every body carries them until the source settles
+        partials = {}
+        pending = list(sources)
+        late = []
+        yield 'card', await _search_body(query, metadata, results, late, pending, degraded)
+
+        async for source, result, missed in iter_with_deadlines(sources, deadlines, progress):
+            if missed is None:
+                partials[source] = result
+            else:
+                # A source that timed out or failed keeps whatever it already streamed
+                results[source] = result if result is not None else partials.get(source)
+                partials.pop(source, None)
+                pending.remove(source)
+                if missed:
+                    late.append(source)
+            body = await _search_body(query, metadata, dict(results, **partials), late, pending, degraded)
+            if pending:
+                yield 'update', dict(body, source=source)
+
+        price_history.record(metadata.get('id'), body['listings'], body['comparison_data'])
+        yield 'done', body
+    finally:
+        # The consumer went away (or the lookup failed): stop the remaining sources
+        for task in [metadata_task, *sources.values()]:
+            task.cancel()
+
+
+async def run_search(query: str, sources: Optional[List[str]] = None) -> Tuple[Dict, int]:
+    """The /search pipeline. Returns ``(response body, status code)``."""
+    async for event, body in search_events(query, sources):
+        if event == 'error':
+            status = body.pop('status')
+            return body, status
+        if event == 'done':
+            return body, 200
+
+
+def _requested_sources(value: Optional[str]) -> Optional[List[str]]:
+    """``?sources=stockx,pwcc`` as agent names; None (every agent) when absent."""
+    if not value:
+        return None
+    names = sorted({name.strip().lower() for name in value.split(',') if name.strip()})
+    known = {agent.name for agent in registry.all()}
+    unknown = [name for name in names if name not in known]
+    if unknown:
+        raise ValueError(f"Unknown sources: {', '.join(unknown)} (available: {', '.join(sorted(known))})")
+    return names
+
+
+async def handle_search(query: str, sources: Optional[str] = None) -> Tuple[Dict, int]:
+    """Validate and run a search. Shared by the Flask route and the ASGI app."""
+    if not query:
+        return {'error': 'Query parameter "q" is required'}, 400
+    try:
+        names = _requested_sources(sources)
+    except ValueError as e:
+        return {'error': str(e)}, 400
+
+    # Identical concurrent searches share one pipeline run
+    key = f"search:{normalize_query(query)}" + (f":{','.join(names)}" if names else '')
+    body, status = await inflight.do(key, lambda: run_search(query, names))
+    if 'query' in body:
+        body = dict(body, query=query)
+    if status == 200:
+        suggest_index.record(body['card']['name'])
+        demand.hit(body['card'], query)
+    return body, status
+
+
+async def handle_search_stream(query: str, sources: Optional[str] = None) -> AsyncIterator[Tuple[str, Dict]]:
+    """Validate and stream a search. Shared by the Flask route and the ASGI app."""
+    if not query:
+        yield 'error', {'error': 'Query parameter "q" is required', 'status': 400}
+        return
+    try:
+        names = _requested_sources(sources)
+    except ValueError as e:
+        yield 'error', {'error': str(e), 'status': 400}
+        return
+    async for event, body in search_events(query, names):
+        if event == 'done':
+            suggest_index.record(body['card']['name'])
+            demand.hit(body['card'], query)
+        yield event, body
+
+
+def search_response(query: str, body: Dict, status: int) -> Prepared:
+    """/search body prepared for HTTP, cacheable until its shortest-lived source goes stale.
+
+    Partial and failed searches get 'no-cache', so clients revalidate
+    instead of holding on to an incomplete answer.
+    """
+    if status != 200 or body.get('partial'):
+        return prepare(body, 'no-cache')
+    keys = {'ebay': result_cache.make_key('ebay', query)}
+    keys.update({agent.name: _card_key(agent.name, body['card']) for agent in registry.all()
+                 if body['comparison_data'].get(agent.label)})
+    fresh, stale = [], []
+    for source, key in keys.items():
+        fresh_ttl, stale_ttl = result_cache.ttls[source]
+        fresh.append(fresh_ttl - (result_cache.age(source, key) or 0.0))
+        stale.append(stale_ttl)
+    return prepare(body, cache_control(min(fresh), min(stale)))
+
+
+def handle_suggest(query: str, limit: int = 8) -> Dict:
+    """Typeahead suggestions, served entirely from memory."""
+    return {'query': query, 'suggestions': suggest_index.suggest(query, max(1, min(limit, 20)))}
+
+
+@app.route('/search', methods=['GET'])
+async def search():
+    query = request.args.get('q', '')
+    body, status = await handle_search(query, request.args.get('sources'))
+    return flask_response(search_response(query, body, status), status)
+
+
+@app.route('/search/stream', methods=['GET'])
+def search_stream():
+    """/search as NDJSON (default) or server-sent events, one event per settled source."""
+    query, sources = request.args.get('q', ''), request.args.get('sources')
+    sse = wants_sse(request.args.get('format'), request.headers.get('Accept', ''))
+    return Response(
+        stream_in_thread(lambda: handle_search_stream(query, sources), sse),
+        mimetype=stream_mimetype(sse),
+        headers=STREAM_HEADERS,
+    )
+
+
+@app.route('/suggest', methods=['GET'])
+def suggest():
+    return jsonify(handle_suggest(request.args.get('q', ''), request.args.get('limit', 8, type=int)))
+
+
+# Bulk watchlist scans reuse the /search fetchers and scoring
+scan_jobs = ScanJobs(
+    {'metadata': fetch_card_metadata_async, 'ebay': fetch_ebay_listings_async, **SCRAPED_SOURCES},
+    normalize_and_calculate_arbitrage,
+)
+
+
+@app.route('/scan', methods=['POST'])
+def start_scan():
+    """Start a watchlist scan ({"cards": [...]}) or resume one ({"scan_id": ...})."""
+    payload = request.get_json(silent=True) or {}
+    cards = payload.get('cards')
+    if cards is not None:
+        if not isinstance(cards, list):
+            return jsonify({'error': '"cards" must be a list of card queries'}), 400
+        cards = dedupe(cards)
+        if not cards:
+            return jsonify({'error': '"cards" is empty'}), 400
+    elif not payload.get('scan_id'):
+        return jsonify({'error': 'Provide "cards" to start a scan or "scan_id" to resume one'}), 400
+
+    try:
+        scan_id = scan_jobs.start(cards, payload.get('scan_id'), int(payload.get('workers') or SCAN_WORKERS))
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+    except KeyError:
+        return jsonify({'error': f"Scan '{payload['scan_id']}' not found"}), 404
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 409
+    return jsonify({'scan_id': scan_id, 'status_url': f'/scan/{scan_id}'}), 202
+
+
+@app.route('/scan/<scan_id>', methods=['GET'])
+def scan_status(scan_id):
+    """Progress counters for a scan."""
+    try:
+        state = read_state(scan_id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if state is None:
+        return jsonify({'error': f"Scan '{scan_id}' not found"}), 404
+    if state['status'] == 'running' and not scan_jobs.running(scan_id):
+        state['status'] = 'stopped'
+    return jsonify(state)
+
+
+@app.route('/scan/<scan_id>/results', methods=['GET'])
+def scan_results(scan_id):
+    """Stream a finished scan's listings as NDJSON, best deal first."""
+    try:
+        path = scan_path(scan_id, 'results.ndjson')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not os.path.exists(path):
+        return jsonify({'error': f"Scan '{scan_id}' has no results yet", 'status_url': f'/scan/{scan_id}'}), 404
+    limit = request.args.get('limit', type=int)
+    min_score = request.args.get('min_score', type=int)
+
+    def lines():
+        sent = 0
+        with open(path) as f:
+            for line in f:
+                if limit is not None and sent >= limit:
+                    return
+                # Sorted by deal_score, so the first line below the threshold ends the stream
+                if min_score is not None and json.loads(line).get('deal_score', 0) < min_score:
+                    return
+                sent += 1
+                yield line
+
+    return Response(lines(), mimetype='application/x-ndjson')
+
+
+@app.route('/history/<card_id>', methods=['GET'])
+def history(card_id):
+    """Stored price trends for a card, from the precomputed rollups (no upstream calls)."""
+    bucket = request.args.get('bucket', '1d')
+    if bucket not in HISTORY_ROLLUPS:
+        return jsonify({'error': f"bucket must be one of {', '.join(HISTORY_ROLLUPS)}"}), 400
+    days = request.args.get('days', 30, type=float)
+    series = price_history.series(
+        card_id, bucket, since=time.time() - days * 24 * 3600,
+        source=request.args.get('source'), company=request.args.get('company'),
+        grade=request.args.get('grade', type=float),
+    )
+    return jsonify({'card_id': card_id, 'bucket': bucket, 'days': days, 'series': series})
+
+
+# Keeps the hottest cards warm ahead of demand (or run it as a sidecar: python refresher.py)
+refresher = Refresher(REFRESH_PLANS, fetch_card_metadata_async, inflight.do)
+
+
+@app.before_request
+def _start_refresher():
+    if REFRESH_MODE == 'inline':
+        refresher.start()
+
+
+@app.before_request
+def _start_timing():
+    g.started = time.perf_counter()
+    g.trace = start_trace() if wants_trace(request.headers.get(TRACE_HEADER)) else None
+
+
+@app.after_request
+def _record_timing(response):
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    http_requests.inc(route=route, method=request.method, status=str(response.status_code))
+    http_seconds.observe(time.perf_counter() - g.started, route=route)
+    if g.trace is not None:
+        response.headers['Server-Timing'] = g.trace.server_timing()
+    return response
+
+
+@app.teardown_request
+def _end_trace(exc):
+    end_trace()
+
+
+@metrics.collector
+def _cache_metrics():
+    stats = result_cache.stats()
+    yield ('cache_requests_total', 'counter', 'Result cache lookups by source and outcome.',
+           [({'source': source, 'outcome': outcome}, count)
+            for source, counts in stats.items() for outcome, count in counts.items()])
+
+
+@metrics.collector
+def _breaker_metrics():
+    states = {source: status['breaker']['state'] for source, status in resilience.status().items()}
+    yield ('circuit_open', 'gauge', 'Whether a source\'s circuit breaker is open (1) or half open (0.5).',
+           [({'source': source}, {'open': 1.0, 'half_open': 0.5}.get(state, 0.0)) for source, state in states.items()])
+
+
+@metrics.collector
+def _job_metrics():
+    if SCRAPE_MODE != 'queue':
+        return
+    yield ('jobs', 'gauge', 'Scrape jobs by status.',
+           [({'status': status}, count) for status, count in job_queue.counts().items()])
+    yield ('job_workers', 'gauge', 'Live scrape worker processes.', [({}, len(job_queue.workers()))])
+
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Stage latency histograms, per-source outcome counters and cache counters for Prometheus."""
+    return Response(metrics.render(), mimetype=None, content_type=METRICS_CONTENT_TYPE)
+
+
+def _price_snapshot(card: Dict, query: str) -> Optional[Dict]:
+    """Headline prices for a card from fresh cache entries only; None when nothing is cached."""
+    listings = result_cache.peek('ebay', result_cache.make_key('ebay', query))
+    scraped = {source: result_cache.peek(source, _card_key(source, card)) for source in SCRAPED_SOURCES}
+    if listings is None and not any(scraped.values()):
+        return None
+    listings, _, comparison_data = normalize_and_calculate_arbitrage(listings or [], scraped)
+    return {
+        'lowest_listing': min((l['price'] for l in listings), default=None),
+        'listings': len(listings),
+        'opportunities': sum(1 for l in listings if l.get('arbitrage_opportunity')),
+        'reference_prices': reference_prices(comparison_data),
+    }
 
 
 @app.route('/featured', methods=['GET'])
 def featured():
-    """Return featured/popular cards for homepage display"""
-    featured_cards = [
-        {"name": "Charizard", "set": "Base Set", "image": "https://images.pokemontcg.io/base1/4_hires.png"},
-        {"name": "Pikachu", "set": "Base Set", "image": "https://images.pokemontcg.io/base1/58_hires.png"},
-        {"name": "Mewtwo", "set": "Base Set", "image": "https://images.pokemontcg.io/base1/10_hires.png"},
-        {"name": "Blastoise", "set": "Base Set", "image": "https://images.pokemontcg.io/base1/2_hires.png"},
-        {"name": "Venusaur", "set": "Base Set", "image": "https://images.pokemontcg.io/base1/15_hires.png"},
-        {"name": "Gyarados", "set": "Base Set", "image": "https://images.pokemontcg.io/base1/6_hires.png"},
-    ]
-    return jsonify({"featured": featured_cards})
+    """Featured cards for the homepage: the most searched cards, topped up with the
+    pinned picks, priced from the refresher's warm cache entries (no upstream calls)."""
+    limit = max(1, min(request.args.get('limit', len(FEATURED_CARDS), type=int), 24))
+    entries = [(card, query) for _, card, query in demand.top(limit)]
+    seen = {card['id'] for card, _ in entries}
+    for pick in FEATURED_CARDS:
+        if len(entries) >= limit:
+            break
+        query = featured_query(pick)
+        card = card_catalog.resolve(query) or result_cache.peek('metadata', result_cache.make_key('metadata', query))
+        card = card or {'name': pick['name'], 'set_name': pick['set']}
+        if not card.get('id') or card['id'] not in seen:
+            seen.add(card.get('id'))
+            entries.append((dict(card, image_url=card.get('image_url') or pick['image']), query))
+
+    featured_cards = [{
+        'name': card['name'],
+        'set': card.get('set_name', ''),
+        'image': card.get('image_url'),
+        'card_id': card.get('id'),
+        'prices': _price_snapshot(card, query),
+    } for card, query in entries]
+    # Prices come from eBay's cache entries, so the response is as fresh as they are
+    fresh_ttl, stale_ttl = result_cache.ttls['ebay']
+    return flask_response(prepare({"featured": featured_cards}, cache_control(fresh_ttl, stale_ttl)))
 
 
 @app.route('/health', methods=['GET'])
@@ -251,5 +632,64 @@ def health():
     return jsonify({'status': 'healthy', 'service': 'PokeAggregator Multi-Source API'})
 
 
+@app.route('/agents', methods=['GET'])
+def agents():
+    """The registered source agents with their cost, concurrency, TTL and timeout."""
+    return jsonify({'agents': registry.describe()})
+
+
+@app.route('/agents/metrics', methods=['GET'])
+def agent_metrics():
+    """Per-agent scrape timings, requests, bytes and blocked resources, plus HTTP tier success rates."""
+    return jsonify({'page_policy': PAGE_POLICY, 'agents': scrape_metrics.summary(), 'tiers': tiers.status()})
+
+
+@app.route('/sources/status', methods=['GET'])
+def sources_status():
+    """Circuit breaker state, adaptive timeout and call counters per upstream source."""
+    status = {'sources': resilience.status(), 'ebay': ebay_client.stats(), 'scrape_mode': SCRAPE_MODE}
+    if SCRAPE_MODE == 'queue':
+        status['jobs'] = job_queue.stats()
+    return jsonify(status)
+
+
+@app.route('/cluster/fetch', methods=['POST'])
+async def cluster_fetch():
+    """An agent's record for a card this node owns, fetched for another cluster node."""
+    if not cluster.enabled:
+        return jsonify({'error': 'Not found'}), 404
+    if not cluster.authorized(request.headers.get(CLUSTER_SECRET_HEADER)):
+        return jsonify({'error': 'Forbidden'}), 403
+    body = request.get_json(silent=True) or {}
+    source, card = body.get('source'), body.get('card')
+    if source not in SCRAPED_SOURCES or not isinstance(card, dict) or not card.get('name'):
+        return jsonify({'error': 'A known source and a card with a name are required'}), 400
+    agent = registry.get(source)
+    # Served from this node's cache; never forwarded again, even if the rings disagree
+    try:
+        value = await _cached_fetch(source, _card_key(source, card), lambda: _scrape_record(agent, card))
+    except SourceUnavailable as e:
+        cluster.served(source, False)
+        return jsonify({'error': str(e), 'reason': e.reason}), 503
+    cluster.served(source, True)
+    return jsonify({'node': cluster.self_name, 'value': value})
+
+
+@app.route('/cluster/status', methods=['GET'])
+def cluster_status():
+    """Cluster members and which are being skipped; ``?card_id=`` also shows that card's owner."""
+    status = cluster.status()
+    card_id = request.args.get('card_id')
+    if card_id:
+        status['owner'] = {'card_id': card_id, 'node': cluster.owner({'id': card_id})}
+    return jsonify(status)
+
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """Return hit/stale/miss counters per cached source, plus the refresher's progress."""
+    return jsonify({'cache': result_cache.stats(), 'refresher': refresher.status()})
+
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,182 @@
+"""
+ASGI entry point for the API: ``uvicorn asgi:app``.
+
+/search and /search/stream run natively on the server's event loop, so a
+single process can multiplex hundreds of in-flight searches. Every other
+route, including the pokemon_cards blueprint, is served by the existing
+Flask app through an ASGI adapter. The browser pool and upstream
+connections live for the whole process and are shut down with the server.
+"""
+
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from asgiref.wsgi import WsgiToAsgi
+
+from app import app as flask_app, handle_search, handle_search_stream, handle_suggest, refresher, search_response
+from browser_pool import browser_pool
+from config import ASGI_UPSTREAM_THREADS, REFRESH_MODE
+from http_cache import Prepared, respond
+from http_pool import http_pool
+from metrics import TRACE_HEADER, end_trace, http_requests, http_seconds, start_trace, wants_trace
+from streaming import STREAM_HEADERS, encode, stream_mimetype, wants_sse
+
+_flask_asgi = WsgiToAsgi(flask_app)
+
+
+async def send_json(send, body, status: int = 200, headers=()):
+    payload = json.dumps(body).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(payload)).encode()),
+            (b'access-control-allow-origin', b'*'),
+            *headers,
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': payload})
+
+
+async def send_prepared(scope, send, prepared: Prepared, status: int = 200):
+    """Answer with ``prepared``: 304 on a matching validator, compressed when accepted."""
+    request_headers = {k.decode('latin-1').lower(): v.decode('latin-1') for k, v in scope.get('headers', [])}
+    status, headers, payload = respond(prepared, request_headers, status)
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            *((k.lower().encode(), v.encode()) for k, v in headers.items()),
+            (b'content-length', str(len(payload)).encode()),
+            (b'access-control-allow-origin', b'*'),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': payload})
+
+
+def query_params(scope):
+    return {k: v[0] for k, v in parse_qs(scope.get('query_string', b'').decode('utf-8')).items()}
+
+
+async def _search(scope, receive, send):
+    params = query_params(scope)
+    query = params.get('q', '')
+    body, status = await handle_search(query, params.get('sources'))
+    await send_prepared(scope, send, search_response(query, body, status), status)
+
+
+async def _search_stream(scope, receive, send):
+    params = query_params(scope)
+    accept = dict(scope.get('headers', [])).get(b'accept', b'').decode('latin-1')
+    sse = wants_sse(params.get('format'), accept)
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', stream_mimetype(sse).encode()),
+            (b'access-control-allow-origin', b'*'),
+            *((k.lower().encode(), v.encode()) for k, v in STREAM_HEADERS.items()),
+        ],
+    })
+
+    async def relay():
+        events = handle_search_stream(params.get('q', ''), params.get('sources'))
+        try:
+            async for event, body in events:
+                await send({'type': 'http.response.body', 'body': encode(event, body, sse), 'more_body': True})
+        finally:
+            await events.aclose()
+
+    async def disconnected():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    # Stop the pipeline as soon as the client goes away
+    relay_task = asyncio.ensure_future(relay())
+    watch_task = asyncio.ensure_future(disconnected())
+    done, _ = await asyncio.wait({relay_task, watch_task}, return_when=asyncio.FIRST_COMPLETED)
+    if relay_task in done:
+        watch_task.cancel()
+        relay_task.result()
+        await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+    else:
+        relay_task.cancel()
+
+
+async def _suggest(scope, receive, send):
+    params = query_params(scope)
+    try:
+        limit = int(params.get('limit', 8))
+    except ValueError:
+        limit = 8
+    await send_json(send, handle_suggest(params.get('q', ''), limit))
+
+
+# Routes served directly on the event loop; everything else goes to Flask
+NATIVE_ROUTES = {
+    ('GET', '/search'): _search,
+    ('GET', '/search/stream'): _search_stream,
+    ('GET', '/suggest'): _suggest,
+}
+
+
+async def _instrumented(handler, route: str, scope, receive, send):
+    """Run a native route with the same request metrics and opt-in trace as the Flask routes."""
+    headers = {k.decode('latin-1').lower(): v.decode('latin-1') for k, v in scope.get('headers', [])}
+    trace = start_trace() if wants_trace(headers.get(TRACE_HEADER.lower())) else None
+    started = time.perf_counter()
+    status = 500
+
+    async def send_instrumented(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+            if trace is not None:
+                message = dict(message, headers=[*message['headers'],
+                                                 (b'server-timing', trace.server_timing().encode())])
+        await send(message)
+
+    try:
+        await handler(scope, receive, send_instrumented)
+    finally:
+        http_requests.inc(route=route, method=scope['method'], status=str(status))
+        http_seconds.observe(time.perf_counter() - started, route=route)
+        if trace is not None:
+            end_trace()
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            # The eBay/TCG SDKs are synchronous and run via asyncio.to_thread;
+            # size the default executor for many concurrent searches
+            loop = asyncio.get_running_loop()
+            loop.set_default_executor(ThreadPoolExecutor(ASGI_UPSTREAM_THREADS))
+            if REFRESH_MODE == 'inline':
+                refresher.start()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await asyncio.to_thread(browser_pool.shutdown)
+            await asyncio.to_thread(http_pool.shutdown)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+
+    if scope['type'] == 'http':
+        route = scope['path'].rstrip('/') or '/'
+        handler = NATIVE_ROUTES.get((scope['method'], route))
+        if handler is not None:
+            await _instrumented(handler, route, scope, receive, send)
+            return
+
+    await _flask_asgi(scope, receive, send)
@@ -0,0 +1 @@
+# Pokemon Card Aggregator - Benchmarks
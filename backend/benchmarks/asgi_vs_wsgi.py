@@ -0,0 +1,51 @@
+"""
+Load benchmark comparing the WSGI (Flask) and ASGI serving modes.
+
+    python -m benchmarks.asgi_vs_wsgi --requests 400 --concurrency 200 --latency 0.5
+
+Each mode is started as a subprocess with simulated upstreams
+(see benchmarks/serve.py) and hit with distinct /search queries, so request
+coalescing doesn't collapse the load.
+"""
+
+import argparse
+import asyncio
+import subprocess
+import sys
+
+from benchmarks.load import run_load, wait_until_up
+
+
+def bench_mode(mode: str, port: int, args) -> dict:
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'benchmarks.serve', '--mode', mode,
+         '--port', str(port), '--latency', str(args.latency)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        asyncio.run(wait_until_up(base_url))
+        queries = [f"card {i}" for i in range(args.requests)]
+        return asyncio.run(run_load(base_url, '/search', queries, args.concurrency))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.5)
+    parser.add_argument('--modes', nargs='+', default=['wsgi', 'asgi'])
+    args = parser.parse_args()
+
+    print(f"{'mode':<6} {'req':>6} {'err':>5} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for i, mode in enumerate(args.modes):
+        r = bench_mode(mode, 8101 + i, args)
+        print(f"{mode:<6} {r['requests']:>6} {r['errors']:>5} {r['throughput_rps']:>9.1f} "
+              f"{r['p50_ms']:>9.0f} {r['p95_ms']:>9.0f} {r['p99_ms']:>9.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+Cluster mode on one machine: several API nodes sharding card scrapes.
+
+    python -m benchmarks.cluster_bench --nodes 3 --cards 12
+    python -m benchmarks.cluster_bench --nodes 3 --compare --kill
+
+Starts the stub server (benchmarks/stubs.py) and ``--nodes`` API processes
+(benchmarks/serve.py against the stubs), each with its own DATA_DIR and
+result cache, as separate machines would have. The nodes share a member
+file (CLUSTER_NODES_FILE) and shard cards with cluster.py. Every card is
+searched on every node, and the upstream requests the stubs saw are
+reported per site. Sharded, each card's StockX/TCGPlayer/PWCC pages are
+fetched about once, however many nodes are searched.
+
+``--compare`` runs the same searches with cluster mode off for the
+unsharded counts. ``--kill`` then stops one node and searches new cards on
+the others: the stopped node's cards move to the next node on the ring, and
+no search should fail.
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List
+
+from benchmarks.load import run_load, wait_until_up
+from benchmarks.search_bench import BACKEND_DIR, BROWSER_AGENTS, CARDS, server_env
+from benchmarks.stubs import Fault, StubServer
+
+LATENCY = {'metadata': 0.02, 'ebay': 0.05, 'stockx': 0.3, 'tcgplayer': 0.2, 'pwcc': 0.2}
+
+
+def node_env(stub_url: str, data_dir: str, name: str, members: str, sharded: bool) -> Dict[str, str]:
+    env = server_env(stub_url, data_dir, api_only=False)
+    env.update({
+        # The nodes cache, so a card one node scraped serves the others
+        'CACHE_BACKEND': 'sqlite',
+        **{f"RATE_{agent.upper()}": '1000' for agent in BROWSER_AGENTS},
+    })
+    if sharded:
+        env.update({'CLUSTER_SELF': name, 'CLUSTER_NODES_FILE': members, 'CLUSTER_RETRY_AFTER': '60',
+                    'CLUSTER_SECRET': 'cluster-bench'})
+    return env
+
+
+def scrape_requests(stubs: StubServer) -> Dict[str, int]:
+    return {agent: stubs.stats()[agent]['requests'] for agent in BROWSER_AGENTS}
+
+
+def search_everywhere(urls: List[str], cards: List[str], concurrency: int, timeout: float) -> int:
+    """Search every card on every node, the nodes concurrently; the number of failed searches."""
+    async def run():
+        results = await asyncio.gather(*(run_load(url, '/search', cards, concurrency, timeout) for url in urls))
+        return sum(result['errors'] for result in results)
+    return asyncio.run(run())
+
+
+def run(args, sharded: bool):
+    stubs = StubServer(faults={name: Fault(latency=latency) for name, latency in LATENCY.items()}).start()
+    root = tempfile.mkdtemp(prefix='pokeagg-cluster-')
+    names = [f"node{i}" for i in range(args.nodes)]
+    urls = [f"http://127.0.0.1:{args.port + i}" for i in range(args.nodes)]
+    members = os.path.join(root, 'members')
+    with open(members, 'w') as f:
+        f.writelines(f"{name} {url}\n" for name, url in zip(names, urls))
+
+    servers, logs = [], []
+    try:
+        for i, name in enumerate(names):
+            data_dir = os.path.join(root, name)
+            os.makedirs(data_dir)
+            logs.append(open(os.path.join(data_dir, 'server.log'), 'w'))
+            servers.append(subprocess.Popen(
+                [sys.executable, '-m', 'benchmarks.serve', '--mode', args.mode, '--port', str(args.port + i),
+                 '--upstreams', 'stubs'],
+                cwd=BACKEND_DIR, env=node_env(stubs.base_url, data_dir, name, members, sharded),
+                stdout=logs[-1], stderr=subprocess.STDOUT,
+            ))
+        for url in urls:
+            asyncio.run(wait_until_up(url, timeout=60))
+
+        cards = [CARDS[i % len(CARDS)] + (f" {i // len(CARDS)}" if i >= len(CARDS) else '') for i in range(args.cards)]
+        errors = search_everywhere(urls, cards, args.concurrency, args.timeout)
+        counts = scrape_requests(stubs)
+        print(f"{'sharded' if sharded else 'unsharded'}: {args.cards} cards x {args.nodes} nodes, "
+              f"{errors} failed searches")
+        print('  scrape requests: ' + ', '.join(f"{agent} {count}" for agent, count in counts.items()))
+
+        if args.kill and sharded and args.nodes > 1:
+            servers[-1].terminate()
+            servers[-1].wait(timeout=10)
+            before = counts
+            cards = [f"{card} after" for card in cards]
+            errors = search_everywhere(urls[:-1], cards, args.concurrency, args.timeout)
+            counts = scrape_requests(stubs)
+            print(f"{names[-1]} stopped: {args.cards} new cards x {args.nodes - 1} nodes, {errors} failed searches")
+            print('  scrape requests: ' + ', '.join(
+                f"{agent} {counts[agent] - before[agent]}" for agent in BROWSER_AGENTS))
+    finally:
+        for server in servers:
+            server.terminate()
+        for server in servers:
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+        for log in logs:
+            log.close()
+        stubs.stop()
+    if args.keep_data:
+        print(f"Node data and logs kept in {root}")
+    else:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--nodes', type=int, default=3)
+    parser.add_argument('--cards', type=int, default=12)
+    parser.add_argument('--mode', choices=['wsgi', 'asgi'], default='asgi')
+    parser.add_argument('--concurrency', type=int, default=4, help='searches in flight per node')
+    parser.add_argument('--timeout', type=float, default=120)
+    parser.add_argument('--port', type=int, default=8301, help='first node port; the others follow it')
+    parser.add_argument('--compare', action='store_true', help='also run with cluster mode off')
+    parser.add_argument('--kill', action='store_true', help='stop a node and search new cards on the others')
+    parser.add_argument('--keep-data', action='store_true', help="keep the nodes' DATA_DIRs and logs")
+    args = parser.parse_args()
+
+    run(args, sharded=True)
+    if args.compare:
+        run(args, sharded=False)
+
+
+if __name__ == '__main__':
+    main()
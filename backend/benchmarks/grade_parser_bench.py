@@ -0,0 +1,86 @@
+"""
+Micro-benchmark: compiled single-pass GradeParser vs the original per-company loop.
+
+    python -m benchmarks.grade_parser_bench --titles 100000
+
+The corpus in benchmarks/fixtures/ebay_titles.txt is repeated up to the
+requested size. Titles on which the two parsers disagree are listed, since
+the new parser intentionally recognises more forms.
+"""
+
+import argparse
+import os
+import re
+import time
+from typing import Optional, Tuple
+
+from grade_parser import GradeParser
+
+CORPUS = os.path.join(os.path.dirname(__file__), 'fixtures', 'ebay_titles.txt')
+
+
+class LegacyGradeParser:
+    """The implementation GradeParser replaced, kept for comparison."""
+
+    GRADING_PATTERNS = {
+        'PSA': r'PSA\s*(\d+(?:\.\d+)?)',
+        'BGS': r'BGS\s*(\d+(?:\.\d+)?)',
+        'CGC': r'CGC\s*(\d+(?:\.\d+)?)',
+        'SGC': r'SGC\s*(\d+(?:\.\d+)?)',
+        'TAG': r'TAG\s*(\d+(?:\.\d+)?)',
+        'ACE': r'ACE\s*(\d+(?:\.\d+)?)',
+        'PCA': r'PCA\s*(\d+(?:\.\d+)?)',
+    }
+
+    @staticmethod
+    def parse_grade(title: str) -> Tuple[Optional[str], Optional[float]]:
+        title_upper = title.upper()
+        for company, pattern in LegacyGradeParser.GRADING_PATTERNS.items():
+            match = re.search(pattern, title_upper)
+            if match:
+                try:
+                    grade = float(match.group(1))
+                    if 1 <= grade <= 10:
+                        return company, grade
+                except ValueError:
+                    continue
+        return None, None
+
+
+def timed(fn, titles) -> float:
+    started = time.perf_counter()
+    fn(titles)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--titles', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with open(CORPUS) as f:
+        corpus = [line.strip() for line in f if line.strip()]
+    titles = (corpus * (args.titles // len(corpus) + 1))[:args.titles]
+
+    runs = {
+        'legacy parse_grade': lambda ts: [LegacyGradeParser.parse_grade(t) for t in ts],
+        'parse_grade': lambda ts: [GradeParser.parse_grade(t) for t in ts],
+    }
+    baseline = None
+    print(f"{len(titles)} titles, best of {args.repeat}")
+    for name, fn in runs.items():
+        best = min(timed(fn, titles) for _ in range(args.repeat))
+        baseline = baseline or best
+        print(f"  {name:<22} {best * 1000:8.1f} ms  {best / len(titles) * 1e6:6.2f} us/title  "
+              f"{baseline / best:5.2f}x")
+
+    print("\nTitles where the parsers disagree:")
+    for title in corpus:
+        old, new = LegacyGradeParser.parse_grade(title), GradeParser.parse_grade(title)
+        if old != new:
+            print(f"  {title!r}: {old} -> {new}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Async HTTP load driver shared by the benchmark scripts.
+
+Uses a bare asyncio HTTP/1.1 client (one connection per request) so the
+driver's own overhead stays small next to the server being measured.
+"""
+
+import asyncio
+import time
+from typing import Dict, List, Tuple
+from urllib.parse import urlencode, urlsplit
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def http_get(base_url: str, path: str, params: Dict = None, headers: Dict = None,
+                   timeout: float = 120) -> Tuple[int, Dict[str, str], bytes]:
+    """Minimal ``GET`` returning ``(status, headers, body)``."""
+    url = urlsplit(base_url)
+    target = path + ('?' + urlencode(params) if params else '')
+    lines = [f"GET {target} HTTP/1.1", f"Host: {url.netloc}", "Connection: close"]
+    lines += [f"{k}: {v}" for k, v in (headers or {}).items()]
+    request = ('\r\n'.join(lines) + '\r\n\r\n').encode('utf-8')
+
+    async def exchange():
+        reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+        try:
+            writer.write(request)
+            await writer.drain()
+            return await reader.read()
+        finally:
+            writer.close()
+
+    raw = await asyncio.wait_for(exchange(), timeout)
+    head, _, body = raw.partition(b'\r\n\r\n')
+    head_lines = head.decode('iso-8859-1').split('\r\n')
+    status = int(head_lines[0].split()[1])
+    response_headers = {}
+    for line in head_lines[1:]:
+        name, _, value = line.partition(':')
+        response_headers[name.strip().lower()] = value.strip()
+    if response_headers.get('transfer-encoding') == 'chunked':
+        body = _dechunk(body)
+    return status, response_headers, body
+
+
+def _dechunk(body: bytes) -> bytes:
+    out = bytearray()
+    while body:
+        size_line, _, body = body.partition(b'\r\n')
+        size = int(size_line.split(b';')[0] or b'0', 16)
+        if size == 0:
+            break
+        out += body[:size]
+        body = body[size + 2:]
+    return bytes(out)
+
+
+async def run_load(base_url: str, path: str, queries: List[str], concurrency: int,
+                   timeout: float = 120) -> Dict:
+    """GET ``path?q=<query>`` once per query with at most ``concurrency`` in flight."""
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(query):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                status, _, _ = await http_get(base_url, path, {'q': query}, timeout=timeout)
+                if status != 200:
+                    errors += 1
+            except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(q) for q in queries))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(queries),
+        'errors': errors,
+        'elapsed_s': elapsed,
+        'throughput_rps': len(queries) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+
+async def wait_until_up(base_url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            status, _, _ = await http_get(base_url, '/health', timeout=2)
+            if status == 200:
+                return
+        except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not come up")
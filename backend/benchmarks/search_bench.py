@@ -0,0 +1,244 @@
+"""
+Offline /search benchmark against local stand-ins for every upstream.
+
+    python -m benchmarks.search_bench --scenario default --requests 300 --concurrency 50
+    python -m benchmarks.search_bench --scenario faults --api-only --save-baseline
+    python -m benchmarks.search_bench --latency stockx=1.5 --errors ebay=0.1
+
+Starts the stub server (benchmarks/stubs.py) in process and the API as a
+subprocess pointed at it (benchmarks/serve.py, so the result cache, the
+refresher and the eBay quotas are off), with a throwaway DATA_DIR. The real eBay client, metadata lookup and browser agents run
+end to end, so changes to app.py or the agents show up in the numbers.
+
+Each run warms up, then reports:
+
+- throughput and p50/p95/p99 latency of distinct /search queries
+- the server's resident memory: before and after the run, the peak, and
+  the growth per search
+
+``--api-only`` disables the browser agents (AGENT_*_ENABLED=0). Use it
+where Chromium isn't installed.
+
+Baselines are kept per scenario and serving mode in benchmarks/baselines/.
+A run is compared against its baseline when one exists, and exits non-zero
+when a metric is worse by more than ``--tolerance``. ``--save-baseline``
+records the run as the new baseline.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+from benchmarks.load import run_load, wait_until_up
+from benchmarks.stubs import Fault, StubServer, add_fault_arguments, faults_from_args, upstream_env
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), 'baselines')
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CARDS = ('Charizard', 'Pikachu', 'Blastoise', 'Venusaur', 'Mewtwo', 'Lugia', 'Umbreon', 'Rayquaza',
+         'Gengar', 'Dragonite', 'Mew', 'Gyarados')
+
+BROWSER_AGENTS = ('stockx', 'tcgplayer', 'pwcc')
+# Upstream latencies in seconds, roughly what the live sources answer in
+TYPICAL = {'metadata': 0.08, 'ebay': 0.25, 'stockx': 0.9, 'tcgplayer': 0.6, 'pwcc': 0.7}
+SCENARIOS: Dict[str, Dict[str, Fault]] = {
+    'default': {name: Fault(latency=latency) for name, latency in TYPICAL.items()},
+    'faults': {name: Fault(latency=latency, errors=0.05, hangs=0.02) for name, latency in TYPICAL.items()},
+    'slow': {name: Fault(latency=latency * 4) for name, latency in TYPICAL.items()},
+}
+# metric -> whether higher is better
+METRICS = {
+    'throughput_rps': True,
+    'p50_ms': False,
+    'p95_ms': False,
+    'p99_ms': False,
+    'error_rate': False,
+    'rss_peak_mb': False,
+    'rss_per_search_kb': False,
+}
+# Differences below these floors are noise, whatever the tolerance says
+NOISE_FLOORS = {'p50_ms': 20.0, 'p95_ms': 50.0, 'p99_ms': 100.0, 'error_rate': 0.01,
+                'rss_peak_mb': 8.0, 'rss_per_search_kb': 16.0}
+
+
+def queries(count: int, prefix: str = '') -> List[str]:
+    """Distinct card queries, so request coalescing doesn't collapse the load."""
+    return [f"{prefix}{CARDS[i % len(CARDS)]} {i}" for i in range(count)]
+
+
+def memory_mb(pid: int) -> Tuple[float, float]:
+    """``(resident, peak resident)`` of a process in MB, from /proc."""
+    values = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                name, _, rest = line.partition(':')
+                if name in ('VmRSS', 'VmHWM'):
+                    values[name] = int(rest.split()[0]) / 1024.0
+    except OSError:
+        pass
+    return values.get('VmRSS', 0.0), values.get('VmHWM', 0.0)
+
+
+def server_env(stub_url: str, data_dir: str, api_only: bool) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update(upstream_env(stub_url))
+    env.update({
+        'DATA_DIR': data_dir,
+        'PYTHONUNBUFFERED': '1',
+    })
+    if api_only:
+        env.update({f"AGENT_{name.upper()}_ENABLED": '0' for name in BROWSER_AGENTS})
+    return env
+
+
+def run(args, faults: Dict[str, Fault]) -> Dict:
+    stubs = StubServer(faults=faults, seed=args.seed).start()
+    data_dir = tempfile.mkdtemp(prefix='pokeagg-bench-')
+    log = open(os.path.join(data_dir, 'server.log'), 'w')
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'benchmarks.serve', '--mode', args.mode, '--port', str(args.port),
+         '--upstreams', 'stubs'],
+        cwd=BACKEND_DIR, env=server_env(stubs.base_url, data_dir, args.api_only),
+        stdout=log, stderr=subprocess.STDOUT
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        asyncio.run(wait_until_up(base_url, timeout=60))
+        started = time.perf_counter()
+        cold = asyncio.run(run_load(base_url, '/search', ['Warmup Charizard'], 1, args.timeout))
+        asyncio.run(run_load(base_url, '/search', queries(args.warmup, 'warmup '), args.concurrency, args.timeout))
+        warm_s = time.perf_counter() - started
+
+        rss_before, _ = memory_mb(server.pid)
+        result = asyncio.run(run_load(base_url, '/search', queries(args.requests), args.concurrency, args.timeout))
+        rss_after, rss_peak = memory_mb(server.pid)
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with {server.returncode}; see {log.name}")
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+        log.close()
+        stubs.stop()
+
+    result.update({
+        'error_rate': result['errors'] / result['requests'] if result['requests'] else 0.0,
+        'cold_ms': cold['p50_ms'],
+        'warmup_s': warm_s,
+        'rss_before_mb': rss_before,
+        'rss_after_mb': rss_after,
+        'rss_peak_mb': rss_peak,
+        'rss_per_search_kb': (rss_after - rss_before) * 1024 / result['requests'] if result['requests'] else 0.0,
+        'upstream_requests': stubs.stats(),
+    })
+    if args.keep_data:
+        print(f"Server data and log kept in {data_dir}")
+    else:
+        shutil.rmtree(data_dir, ignore_errors=True)
+    return result
+
+
+def baseline_path(args) -> str:
+    name = args.scenario + ('-api' if args.api_only else '') + f"-{args.mode}.json"
+    return os.path.join(BASELINE_DIR, name)
+
+
+def load_baseline(path: str) -> Optional[Dict]:
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(result: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Regression messages for metrics worse than the baseline by more than ``tolerance``."""
+    regressions = []
+    for metric, higher_is_better in METRICS.items():
+        old, new = baseline['result'].get(metric), result.get(metric)
+        if old is None or new is None:
+            continue
+        worse = old - new if higher_is_better else new - old
+        if worse <= NOISE_FLOORS.get(metric, 0.0) or worse <= abs(old) * tolerance:
+            continue
+        regressions.append(f"{metric}: {old:.2f} -> {new:.2f}")
+    return regressions
+
+
+def report(result: Dict, baseline: Optional[Dict]):
+    print(f"{'metric':<20} {'run':>12} {'baseline':>12}")
+    for metric in ('requests', 'errors', *METRICS, 'cold_ms', 'rss_before_mb', 'rss_after_mb'):
+        old = baseline['result'].get(metric) if baseline else None
+        old_text = f"{old:>12.2f}" if isinstance(old, (int, float)) else f"{'-':>12}"
+        print(f"{metric:<20} {result[metric]:>12.2f} {old_text}")
+    print('upstream requests: ' + ', '.join(
+        f"{name} {counts['requests']} ({counts['errors']} errors, {counts['hangs']} hangs)"
+        for name, counts in result['upstream_requests'].items() if counts['requests']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), default='default')
+    parser.add_argument('--api-only', action='store_true', help='disable the browser agents')
+    parser.add_argument('--mode', choices=['wsgi', 'asgi'], default='asgi')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--timeout', type=float, default=120)
+    parser.add_argument('--port', type=int, default=8201)
+    parser.add_argument('--seed', type=int, default=0, help='seed for the injected faults')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='allowed relative regression')
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--keep-data', action='store_true', help="keep the server's DATA_DIR and log")
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    faults = faults_from_args(args, SCENARIOS[args.scenario])
+    print(f"Scenario {args.scenario}{' (API sources only)' if args.api_only else ''}, {args.mode}: "
+          f"{args.requests} searches, concurrency {args.concurrency}")
+    result = run(args, faults)
+
+    path = baseline_path(args)
+    baseline = load_baseline(path)
+    report(result, baseline)
+
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump({
+                'scenario': args.scenario,
+                'api_only': args.api_only,
+                'mode': args.mode,
+                'requests': args.requests,
+                'concurrency': args.concurrency,
+                'faults': {name: vars(fault) for name, fault in faults.items()},
+                'saved_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'result': result,
+            }, f, indent=2, sort_keys=True)
+        print(f"Saved baseline to {path}")
+        return
+
+    if baseline is None:
+        print(f"No baseline at {path}; run with --save-baseline to record one")
+        return
+    if (baseline.get('requests'), baseline.get('concurrency')) != (args.requests, args.concurrency):
+        print("Note: the baseline was recorded with a different --requests/--concurrency")
+    regressions = compare(result, baseline, args.tolerance)
+    if regressions:
+        print(f"Regressed beyond {args.tolerance:.0%}:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print(f"Within {args.tolerance:.0%} of the baseline")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Run the API against fake upstreams for load benchmarks.
+
+    python -m benchmarks.serve --mode asgi --port 8001 --latency 0.5
+    python -m benchmarks.serve --mode asgi --port 8001 --upstreams stubs
+
+With ``--upstreams simulated`` (the default), metadata, eBay and the source
+agents are replaced in process with sleeps of a fixed latency. With
+``--upstreams stubs`` nothing is patched: the real clients and agents run
+against the URLs in the environment, normally the stub server from
+benchmarks/stubs.py (see benchmarks/search_bench.py). Either way the result
+cache, the background refresher and the eBay call quotas are off, so every
+request runs the full /search pipeline without touching the network.
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault('CACHE_BACKEND', 'none')
+os.environ.setdefault('REFRESH_MODE', 'off')
+# Measure the app, not eBay's call quotas
+os.environ.setdefault('RATE_EBAY', '100000')
+os.environ.setdefault('EBAY_DAILY_QUOTA', '1e12')
+
+
+def patch_upstreams(latency: float):
+    import app
+    from agents import registry
+    from cache import normalize_query
+    from ebay_client import EbayClient
+
+    def fake_metadata(query):
+        time.sleep(latency * 0.3)
+        return {
+            'name': query.title(),
+            'id': f"bench-{normalize_query(query).replace(' ', '-')}",
+            'image_url': None,
+            'set_name': 'Base Set',
+            'set_series': 'Base',
+            'number': '4',
+            'rarity': 'Rare Holo',
+            'release_date': '1999/01/09',
+        }
+
+    def fake_find(self, keywords, page):
+        time.sleep(latency * 0.5)
+        listings = [
+            {'item_id': f"{keywords}-{grade}-{i}", 'title': f"{keywords} PSA {grade}", 'price': 100.0 * grade + i,
+             'currency': 'USD', 'url': 'https://www.ebay.com/itm/0', 'company': 'PSA', 'grade': float(grade),
+             'label': None, 'qualifier': None, 'image_url': None, 'condition': 'N/A', 'location': 'N/A',
+             'source': 'eBay'}
+            for i in range(10) for grade in (8, 9, 10)
+        ]
+        return listings, 1
+
+    samples = {
+        'stockx': {'lowest_ask': 1200.0, 'last_sale': 1100.0, 'highest_bid': 1000.0, 'url': 'https://stockx.com/'},
+        'tcgplayer': {'raw_market_price': 300.0, 'listed_median': 320.0, 'link': 'https://www.tcgplayer.com/'},
+        'pwcc': {'market_price': 1050.0, 'url': 'https://www.pwccmarketplace.com/'},
+    }
+
+    def fake_scrape(agent):
+        async def scrape(card):
+            await asyncio.sleep(latency)
+            return dict(samples.get(agent.name, {}), source=agent.label)
+        return scrape
+
+    app._fetch_card_metadata = fake_metadata
+    EbayClient._find = fake_find
+    for agent in registry.all():
+        agent.scrape = fake_scrape(agent)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--mode', choices=['wsgi', 'asgi'], default='asgi')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--upstreams', choices=['simulated', 'stubs'], default='simulated')
+    parser.add_argument('--latency', type=float, default=0.5, help='simulated upstream latency in seconds')
+    args = parser.parse_args()
+
+    if args.upstreams == 'simulated':
+        patch_upstreams(args.latency)
+
+    if args.mode == 'wsgi':
+        from werkzeug.serving import run_simple
+        from app import app
+        run_simple(args.host, args.port, app, threaded=True)
+    else:
+        import uvicorn
+        from asgi import app
+        uvicorn.run(app, host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,428 @@
+"""
+Local stand-ins for every upstream the API calls, for offline benchmarks.
+
+    python -m benchmarks.stubs --port 8300 --latency stockx=0.8 --errors ebay=0.05
+
+One HTTP server answers for all of them, each under its own path prefix:
+
+    /ebay            eBay Finding API (findItemsAdvanced, XML)
+    /pokemontcg      pokemontcg.io /v2/cards
+    /stockx          StockX search and product pages
+    /tcgplayer       TCGPlayer search and product pages
+    /tcgplayer-api   TCGPlayer's price points JSON
+    /pwcc            PWCC market price research
+
+The HTML pages are rendered from benchmarks/fixtures/ and carry the
+selectors and embedded JSON the browser agents read. Listings, cards and
+prices are derived from the query, so a given search gets the same answer
+on every run.
+
+Each upstream (named as its source: metadata, ebay, stockx, tcgplayer,
+pwcc) has its own fault profile:
+
+- latency, in seconds, jittered by +/- jitter
+- errors, the fraction of requests answered with HTTP 500
+- hangs, the fraction held open for HANG_SECONDS before a 503, longer
+  than any source timeout
+
+``upstream_env(base_url)`` is the environment that points the API at a
+running stub server.
+"""
+
+import argparse
+import html
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import zlib
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from string import Template
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+UPSTREAMS = ('metadata', 'ebay', 'stockx', 'tcgplayer', 'pwcc')
+# Path prefix -> upstream; longest prefix first
+PREFIXES = (
+    ('/tcgplayer-api', 'tcgplayer'),
+    ('/pokemontcg', 'metadata'),
+    ('/tcgplayer', 'tcgplayer'),
+    ('/stockx', 'stockx'),
+    ('/ebay', 'ebay'),
+    ('/pwcc', 'pwcc'),
+)
+HANG_SECONDS = 60.0
+# Listings per Finding page, and pages reported for the base query
+EBAY_ITEMS_PER_PAGE = 40
+EBAY_TOTAL_PAGES = 3
+COMPANIES = ('PSA', 'BGS', 'CGC')
+GRADES = ('10', '9.5', '9', '8.5', '8', '7')
+EBAY_QUERY_SUFFIXES = (' graded pokemon card', ' pokemon')
+GRADE_IN_QUERY = re.compile(r'\s+(PSA|BGS|CGC|SGC)\s+(\d+(?:\.\d)?)$', re.IGNORECASE)
+
+
+@dataclass
+class Fault:
+    latency: float = 0.0
+    jitter: float = 0.2
+    errors: float = 0.0
+    hangs: float = 0.0
+
+
+def _seed(text: str) -> int:
+    return zlib.crc32(text.lower().encode('utf-8'))
+
+
+def _base_price(card: str) -> float:
+    """A card's price level, stable per card name."""
+    return 40.0 + _seed(card) % 1960
+
+
+def _money(value: float) -> str:
+    return f"{value:,.2f}"
+
+
+def _slug(text: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '-', text.lower()).strip('-')
+
+
+@lru_cache(maxsize=None)
+def _fixture(name: str) -> Template:
+    with open(os.path.join(FIXTURES, name)) as f:
+        return Template(f.read())
+
+
+# -- upstream responses --------------------------------------------------------
+
+def ebay_response(keywords: str, page: int) -> str:
+    """A findItemsAdvancedResponse for ``keywords``. Variants overlap the base query's items."""
+    card = keywords
+    for suffix in EBAY_QUERY_SUFFIXES:
+        if card.lower().endswith(suffix):
+            card = card[:-len(suffix)]
+            break
+    variant = GRADE_IN_QUERY.search(card)
+    if variant:
+        card = card[:variant.start()]
+        slots = [(variant.group(1).upper(), variant.group(2))]
+        total_pages = 1
+    else:
+        slots = [(company, grade) for company in COMPANIES for grade in GRADES]
+        total_pages = EBAY_TOTAL_PAGES
+
+    base = _base_price(card)
+    items = []
+    if page <= total_pages:
+        for i in range(EBAY_ITEMS_PER_PAGE):
+            n = (page - 1) * EBAY_ITEMS_PER_PAGE + i
+            company, grade = slots[n % len(slots)]
+            serial = n // len(slots)
+            item_id = str(100000000000 + _seed(f"{card}|{company}|{grade}|{serial}") % 900000000000)
+            price = base * float(grade) / 10 * (0.8 + (_seed(item_id) % 400) / 1000)
+            items.append(
+                f"<item><itemId>{item_id}</itemId>"
+                f"<title>{_xml(card.title())} Pokemon Card {company} {grade}</title>"
+                f"<viewItemURL>https://www.ebay.com/itm/{item_id}</viewItemURL>"
+                f"<galleryURL>https://i.ebayimg.com/images/{item_id}.jpg</galleryURL>"
+                f"<location>Portland,OR,USA</location>"
+                f"<sellingStatus><currentPrice currencyId=\"USD\">{price:.2f}</currentPrice></sellingStatus>"
+                f"<condition><conditionDisplayName>New</conditionDisplayName></condition>"
+                f"</item>"
+            )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<findItemsAdvancedResponse xmlns="http://www.ebay.com/marketplace/search/v1/services">'
+        '<ack>Success</ack><version>1.13.0</version>'
+        f'<timestamp>{time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime())}</timestamp>'
+        f'<searchResult count="{len(items)}">{"".join(items)}</searchResult>'
+        f'<paginationOutput><pageNumber>{page}</pageNumber><entriesPerPage>{EBAY_ITEMS_PER_PAGE}</entriesPerPage>'
+        f'<totalPages>{total_pages}</totalPages>'
+        f'<totalEntries>{total_pages * EBAY_ITEMS_PER_PAGE}</totalEntries></paginationOutput>'
+        '</findItemsAdvancedResponse>'
+    )
+
+
+def _xml(text: str) -> str:
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def _xml_value(body: str, tag: str) -> Optional[str]:
+    match = re.search(rf'<{tag}>(.*?)</{tag}>', body, re.DOTALL)
+    return match.group(1) if match else None
+
+
+def pokemontcg_cards(query: Dict[str, list]) -> Dict:
+    """``/v2/cards?q=name:...`` with one card on the first page, nothing after it."""
+    q = (query.get('q') or [''])[0]
+    name = q.split(':', 1)[1].strip('"') if ':' in q else q
+    page = int((query.get('page') or ['1'])[0])
+    if page > 1 or not name:
+        return {'data': [], 'page': page, 'pageSize': 250, 'count': 0, 'totalCount': 1}
+    card_id = f"stub-{_slug(name)}"
+    legalities = {'unlimited': 'Legal'}
+    card = {
+        'id': card_id,
+        'name': name.title(),
+        'supertype': 'Pokémon',
+        'subtypes': ['Stage 2'],
+        'number': str(1 + _seed(name) % 102),
+        'rarity': 'Rare Holo',
+        'artist': 'Mitsuhiro Arita',
+        'hp': '120',
+        'types': ['Fire'],
+        'legalities': legalities,
+        'images': {'small': f"https://images.pokemontcg.io/stub/{card_id}.png",
+                   'large': f"https://images.pokemontcg.io/stub/{card_id}_hires.png"},
+        'set': {
+            'id': 'base1', 'name': 'Base', 'series': 'Base', 'printedTotal': 102, 'total': 102,
+            'legalities': legalities, 'ptcgoCode': 'BS', 'releaseDate': '1999/01/09',
+            'updatedAt': '2022/10/10 15:12:00',
+            'images': {'symbol': 'https://images.pokemontcg.io/base1/symbol.png',
+                       'logo': 'https://images.pokemontcg.io/base1/logo.png'},
+        },
+    }
+    return {'data': [card], 'page': 1, 'pageSize': 250, 'count': 1, 'totalCount': 1}
+
+
+def stockx_page(path: str, query: Dict[str, list]) -> Optional[str]:
+    if path == '/search':
+        search = (query.get('s') or [''])[0]
+        return _fixture('stockx_search.html').substitute(
+            query=html.escape(search), title=html.escape(search.title()), product_path=f"/{_slug(search)}")
+    slug = path.strip('/')
+    if not slug or '/' in slug:
+        return None
+    base = _base_price(slug.replace('-', ' '))
+    market = {'lowestAsk': round(base * 1.15), 'lastSale': round(base * 1.05), 'highestBid': round(base * 0.95)}
+    next_data = {'props': {'pageProps': {'req': {'appContext': {'states': {'query': {'value': {
+        'data': {'product': {'urlKey': slug, 'title': slug.replace('-', ' ').title(), 'market': market}}
+    }}}}}}}, 'page': '/[product]'}
+    return _fixture('stockx_product.html').substitute(
+        title=slug.replace('-', ' ').title(), next_data=json.dumps(next_data),
+        lowest_ask=_money(market['lowestAsk']), last_sale=_money(market['lastSale']),
+        highest_bid=_money(market['highestBid']))
+
+
+def _tcgplayer_prices(product_id: str) -> Tuple[float, float]:
+    base = _base_price(product_id) / 4
+    return round(base, 2), round(base * 1.07, 2)
+
+
+def tcgplayer_page(path: str, query: Dict[str, list]) -> Optional[str]:
+    if path == '/search/all/product':
+        search = (query.get('q') or [''])[0]
+        product_path = f"/product/{100000 + _seed(search) % 400000}/pokemon-{_slug(search)}"
+        return _fixture('tcgplayer_search.html').substitute(
+            query=html.escape(search), title=html.escape(search.title()), product_path=product_path)
+    match = re.match(r'^/product/(\d+)(/[\w-]*)?$', path)
+    if not match:
+        return None
+    market, median = _tcgplayer_prices(match.group(1))
+    title = (match.group(2) or '').strip('/').replace('-', ' ').title()
+    return _fixture('tcgplayer_product.html').substitute(
+        title=title, market_price=_money(market), listed_median=_money(median))
+
+
+def tcgplayer_price_points(path: str) -> Optional[list]:
+    match = re.match(r'^/v2/product/(\d+)/pricepoints$', path)
+    if not match:
+        return None
+    market, median = _tcgplayer_prices(match.group(1))
+    return [
+        {'printingType': 'Holofoil', 'marketPrice': market, 'buylistMarketPrice': None,
+         'listedMedianPrice': median},
+        {'printingType': '1st Edition Holofoil', 'marketPrice': round(market * 3.2, 2), 'buylistMarketPrice': None,
+         'listedMedianPrice': round(median * 3.2, 2)},
+    ]
+
+
+def pwcc_page(path: str, query: Dict[str, list]) -> Optional[str]:
+    if path != '/market-price-research':
+        return None
+    search = (query.get('q') or [''])[0]
+    base = _base_price(search) * 1.1
+    return _fixture('pwcc_research.html').substitute(
+        title=html.escape(search.title()), price=_money(base), older_price=_money(base * 0.92))
+
+
+# -- server --------------------------------------------------------------------
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server: 'StubServer'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._handle(b'')
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        self._handle(self.rfile.read(length) if length else b'')
+
+    def _handle(self, body: bytes):
+        url = urlsplit(self.path)
+        for prefix, upstream in PREFIXES:
+            if url.path == prefix or url.path.startswith(prefix + '/'):
+                break
+        else:
+            return self._send(404, 'text/plain', b'no such upstream')
+
+        status = self.server.inject(upstream)
+        if status is not None:
+            return self._send(status, 'text/plain', b'injected fault')
+
+        path, query = url.path[len(prefix):] or '/', parse_qs(url.query)
+        try:
+            answer = self._answer(prefix, path, query, body.decode('utf-8', 'replace'))
+        except Exception as e:
+            print(f"Stubs: {self.path} failed: {repr(e)}")
+            return self._send(500, 'text/plain', b'stub error')
+        if answer is None:
+            return self._send(404, 'text/html', b'<html><body>Not Found</body></html>')
+        content_type, payload = answer
+        self._send(200, content_type, payload.encode('utf-8'))
+
+    def _answer(self, prefix: str, path: str, query: Dict[str, list], body: str) -> Optional[Tuple[str, str]]:
+        if prefix == '/ebay':
+            keywords = html.unescape(_xml_value(body, 'keywords') or '')
+            page = int(_xml_value(body, 'pageNumber') or 1)
+            return 'text/xml;charset=UTF-8', ebay_response(keywords, page)
+        if prefix == '/pokemontcg':
+            return 'application/json', json.dumps(pokemontcg_cards(query))
+        if prefix == '/tcgplayer-api':
+            points = tcgplayer_price_points(path)
+            return ('application/json', json.dumps(points)) if points is not None else None
+        render = {'/stockx': stockx_page, '/tcgplayer': tcgplayer_page, '/pwcc': pwcc_page}[prefix]
+        page = render(path, query)
+        return ('text/html; charset=utf-8', page) if page is not None else None
+
+    def _send(self, status: int, content_type: str, payload: bytes):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, faults: Optional[Dict[str, Fault]] = None,
+                 seed: int = 0):
+        super().__init__((host, port), StubHandler)
+        self.faults = {name: Fault() for name in UPSTREAMS}
+        self.faults.update(faults or {})
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._counts = {name: {'requests': 0, 'errors': 0, 'hangs': 0} for name in UPSTREAMS}
+        self._thread = None
+
+    def handle_error(self, request, client_address):
+        # Clients that time out hang up mid-response; that's expected under load
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def inject(self, upstream: str) -> Optional[int]:
+        """Apply ``upstream``'s latency; a status code when this request gets a fault instead."""
+        fault = self.faults[upstream]
+        with self._lock:
+            roll = self._random.random()
+            delay = fault.latency * self._random.uniform(1 - fault.jitter, 1 + fault.jitter)
+            counts = self._counts[upstream]
+            counts['requests'] += 1
+            outcome = 'hangs' if roll < fault.hangs else 'errors' if roll < fault.hangs + fault.errors else None
+            if outcome:
+                counts[outcome] += 1
+        if outcome == 'hangs':
+            time.sleep(HANG_SECONDS)
+            return 503
+        time.sleep(max(0.0, delay))
+        return 500 if outcome == 'errors' else None
+
+    def start(self) -> 'StubServer':
+        self._thread = threading.Thread(target=self.serve_forever, name='stubs', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {name: dict(counts) for name, counts in self._counts.items()}
+
+
+def upstream_env(base_url: str) -> Dict[str, str]:
+    """Environment pointing every upstream of the API at the stub server at ``base_url``."""
+    return {
+        'POKEMONTCG_API_URL': f"{base_url}/pokemontcg/v2",
+        'EBAY_FINDING_URL': f"{base_url}/ebay",
+        'STOCKX_BASE_URL': f"{base_url}/stockx",
+        'TCGPLAYER_BASE_URL': f"{base_url}/tcgplayer",
+        'TCGPLAYER_API_URL': f"{base_url}/tcgplayer-api",
+        'PWCC_BASE_URL': f"{base_url}/pwcc",
+        'EBAY_APP_ID': 'stub-app-id',
+    }
+
+
+def parse_overrides(values, field: str, faults: Dict[str, Fault]):
+    """Apply ``name=value`` (or bare ``value`` for every upstream) settings of one Fault field."""
+    for value in values or []:
+        name, _, number = value.rpartition('=')
+        for upstream in ([name] if name else UPSTREAMS):
+            if upstream not in faults:
+                raise SystemExit(f"Unknown upstream {upstream!r} (choose from {', '.join(UPSTREAMS)})")
+            setattr(faults[upstream], field, float(number))
+
+
+def add_fault_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--latency', action='append', metavar='[UPSTREAM=]SECONDS',
+                        help='upstream latency; repeat per upstream')
+    parser.add_argument('--jitter', action='append', metavar='[UPSTREAM=]FRACTION')
+    parser.add_argument('--errors', action='append', metavar='[UPSTREAM=]RATE', help='fraction answered with 500')
+    parser.add_argument('--hangs', action='append', metavar='[UPSTREAM=]RATE',
+                        help=f'fraction held open for {HANG_SECONDS:.0f}s')
+
+
+def faults_from_args(args, base: Optional[Dict[str, Fault]] = None) -> Dict[str, Fault]:
+    faults = {name: Fault(**asdict((base or {}).get(name, Fault()))) for name in UPSTREAMS}
+    for field in ('latency', 'jitter', 'errors', 'hangs'):
+        parse_overrides(getattr(args, field), field, faults)
+    return faults
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8300)
+    parser.add_argument('--seed', type=int, default=0)
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    server = StubServer(args.host, args.port, faults_from_args(args), args.seed)
+    print(f"Stubs: serving on {server.base_url}")
+    for name, value in upstream_env(server.base_url).items():
+        print(f"  export {name}={value}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""
+Shared headless Chromium pool for the source agents.
+
+The browser is launched once per process and reused across requests. Every
+scrape gets its own context and page, the number of open pages is capped,
+and the browser is recycled after a page budget or when it crashes.
+
+The pool owns a dedicated event loop thread, so it can be shared by request
+handlers regardless of which event loop they run on.
+"""
+
+import asyncio
+import atexit
+import random
+import threading
+
+from playwright.async_api import async_playwright
+from playwright_stealth import stealth
+
+from config import BROWSER_HEADLESS, BROWSER_POOL_MAX_PAGES, BROWSER_POOL_RECYCLE_AFTER
+from metrics import carry_trace, span
+
+# User agents to rotate
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+]
+
+
+class _BrowserSlot:
+    """A launched browser plus the bookkeeping needed to recycle it."""
+
+    def __init__(self, browser):
+        self.browser = browser
+        self.pages_served = 0
+        self.active = 0
+        self.retired = False
+
+
+class BrowserPool:
+    def __init__(self, max_pages: int = BROWSER_POOL_MAX_PAGES,
+                 recycle_after: int = BROWSER_POOL_RECYCLE_AFTER,
+                 headless: bool = BROWSER_HEADLESS):
+        self.max_pages = max_pages
+        self.recycle_after = recycle_after
+        self.headless = headless
+
+        self._start_lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+
+        # Only touched from the pool loop
+        self._playwright = None
+        self._slot = None
+        self._semaphore = None
+        self._launch_lock = None
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name='browser-pool', daemon=True)
+                thread.start()
+                self._loop, self._thread = loop, thread
+            return self._loop
+
+    async def run(self, fn, user_agents=None):
+        """Run ``await fn(page)`` on a pooled page and return its result.
+
+        The page lives in a fresh browser context that is closed afterwards.
+        """
+        loop = self._ensure_started()
+        coro = carry_trace(self._run_on_pool(fn, user_agents or USER_AGENTS))
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+    async def _run_on_pool(self, fn, user_agents):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_pages)
+            self._launch_lock = asyncio.Lock()
+
+        with span('pool_wait', 'browser'):
+            await self._semaphore.acquire()
+        try:
+            slot = await self._acquire_slot()
+            context = None
+            try:
+                with span('page_setup', 'browser'):
+                    context = await slot.browser.new_context(user_agent=random.choice(user_agents))
+                    page = await context.new_page()
+                    await stealth(page)
+                return await fn(page)
+            finally:
+                if context is not None:
+                    try:
+                        await context.close()
+                    except Exception:
+                        # The browser may already be gone; the slot gets recycled below
+                        slot.retired = True
+                await self._release_slot(slot)
+        finally:
+            self._semaphore.release()
+
+    async def _acquire_slot(self) -> _BrowserSlot:
+        async with self._launch_lock:
+            slot = self._slot
+            if slot is None or slot.retired or not slot.browser.is_connected():
+                if slot is not None:
+                    slot.retired = True
+                    if slot.active == 0:
+                        await self._close_slot(slot)
+                slot = self._slot = await self._launch()
+
+            slot.active += 1
+            slot.pages_served += 1
+            if slot.pages_served >= self.recycle_after:
+                slot.retired = True
+            return slot
+
+    async def _release_slot(self, slot: _BrowserSlot):
+        slot.active -= 1
+        if slot.active == 0 and (slot.retired or not slot.browser.is_connected()):
+            await self._close_slot(slot)
+            if self._slot is slot:
+                self._slot = None
+
+    async def _launch(self) -> _BrowserSlot:
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+        print("Browser Pool: Launching Chromium")
+        with span('launch', 'browser'):
+            browser = await self._playwright.chromium.launch(headless=self.headless)
+        slot = _BrowserSlot(browser)
+
+        def on_disconnected(_):
+            print("Browser Pool: Browser disconnected, recycling")
+            slot.retired = True
+
+        browser.on('disconnected', on_disconnected)
+        return slot
+
+    async def _close_slot(self, slot: _BrowserSlot):
+        try:
+            await slot.browser.close()
+        except Exception as e:
+            print(f"Browser Pool: Error closing browser: {str(e)}")
+
+    async def _shutdown(self):
+        if self._slot is not None:
+            await self._close_slot(self._slot)
+            self._slot = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    def shutdown(self, timeout: float = 10):
+        """Close the browser and stop the pool loop. Safe to call more than once."""
+        with self._start_lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None or loop.is_closed():
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result(timeout)
+        except Exception as e:
+            print(f"Browser Pool: Error during shutdown: {str(e)}")
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout)
+            loop.close()
+            self._semaphore = None
+            self._launch_lock = None
+
+
+browser_pool = BrowserPool()
+atexit.register(browser_pool.shutdown)
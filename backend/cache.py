@@ -0,0 +1,247 @@
+"""
+Tiered TTL cache for /search results.
+
+An in-process LRU sits in front of a pluggable shared backend (SQLite by
+default). Every source has its own fresh TTL and stale-while-revalidate
+window: a stale hit is served immediately while the value is refreshed in
+the background.
+"""
+
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from config import CACHE_BACKEND, CACHE_DB_PATH, CACHE_LRU_SIZE, CACHE_TTLS
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase and collapse whitespace so equivalent queries share a key."""
+    return re.sub(r'\s+', ' ', query.strip().lower())
+
+
+class CacheBackend:
+    """Interface for shared cache backends. Values are JSON strings."""
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: str, stored_at: float, expires_at: float):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+
+class SQLiteCacheBackend(CacheBackend):
+    PURGE_EVERY = 500
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS cache ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, '
+            'stored_at REAL NOT NULL, expires_at REAL NOT NULL)'
+        )
+        self._conn.commit()
+        self._writes = 0
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value, stored_at FROM cache WHERE key = ? AND expires_at > ?',
+                (key, time.time())
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def set(self, key: str, value: str, stored_at: float, expires_at: float):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO cache (key, value, stored_at, expires_at) VALUES (?, ?, ?, ?)',
+                (key, value, stored_at, expires_at)
+            )
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY == 0:
+                self._conn.execute('DELETE FROM cache WHERE expires_at <= ?', (time.time(),))
+            self._conn.commit()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute('DELETE FROM cache WHERE key = ?', (key,))
+            self._conn.commit()
+
+
+class LRUCache:
+    """Thread-safe bounded LRU of key -> (json value, stored_at)."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+            return entry
+
+    def set(self, key: str, value: str, stored_at: float):
+        with self._lock:
+            self._data[key] = (value, stored_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class TieredCache:
+    def __init__(self, lru_size: int = CACHE_LRU_SIZE, backend: Optional[CacheBackend] = None,
+                 ttls: Dict[str, Tuple[float, float]] = CACHE_TTLS):
+        self.lru = LRUCache(lru_size)
+        self.backend = backend
+        self.ttls = ttls
+        self._counters = {}
+        self._counter_lock = threading.Lock()
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+
+    @staticmethod
+    def make_key(source: str, query: Optional[str] = None, card_id: Optional[str] = None) -> str:
+        """Card-scoped sources key on ``metadata['id']``, the rest on the normalized query."""
+        if card_id:
+            return f"{source}:id:{card_id}"
+        return f"{source}:q:{normalize_query(query or '')}"
+
+    @staticmethod
+    def card_key(source: str, card: Dict) -> str:
+        """Key for a scraped source: the card id once known, else name + set."""
+        if card.get('id'):
+            return TieredCache.make_key(source, card_id=card['id'])
+        return TieredCache.make_key(source, f"{card['name']} {card.get('set_name', '')}")
+
+    def _count(self, source: str, outcome: str):
+        with self._counter_lock:
+            counters = self._counters.setdefault(source, {'hit': 0, 'stale': 0, 'miss': 0})
+            counters[outcome] += 1
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._counter_lock:
+            return {source: dict(c) for source, c in self._counters.items()}
+
+    def _lookup(self, key: str, fresh_ttl: Optional[float] = None) -> Optional[Tuple[str, float]]:
+        entry = self.lru.get(key)
+        # A local copy past its fresh TTL may have been refreshed by another
+        # process (a sidecar refresher or another worker) in the shared backend
+        if entry is not None and (fresh_ttl is None or time.time() - entry[1] < fresh_ttl):
+            return entry
+        if self.backend is not None:
+            try:
+                shared = self.backend.get(key)
+            except Exception as e:
+                print(f"Cache backend error: {str(e)}")
+                shared = None
+            if shared is not None and (entry is None or shared[1] > entry[1]):
+                self.lru.set(key, *shared)
+                entry = shared
+        return entry
+
+    def peek(self, source: str, key: str):
+        """Return a fresh cached value without counting or fetching, else None."""
+        fresh_ttl, _ = self.ttls[source]
+        entry = self._lookup(key, fresh_ttl)
+        if entry is None:
+            return None
+        if time.time() - entry[1] >= fresh_ttl:
+            return None
+        return json.loads(entry[0])
+
+    def age(self, source: str, key: str) -> Optional[float]:
+        """Seconds since ``key`` was stored, or None when it isn't cached."""
+        entry = self._lookup(key, self.ttls[source][0])
+        return None if entry is None else time.time() - entry[1]
+
+    def set(self, source: str, key: str, value):
+        fresh_ttl, stale_ttl = self.ttls[source]
+        stored_at = time.time()
+        serialized = json.dumps(value)
+        self.lru.set(key, serialized, stored_at)
+        if self.backend is not None:
+            try:
+                self.backend.set(key, serialized, stored_at, stored_at + fresh_ttl + stale_ttl)
+            except Exception as e:
+                print(f"Cache backend error: {str(e)}")
+
+    def invalidate(self, key: str):
+        self.lru.delete(key)
+        if self.backend is not None:
+            self.backend.delete(key)
+
+    async def get_or_fetch(self, source: str, key: str, fetch, refresh=None):
+        """Return the cached value for ``key`` or ``await fetch()`` and store it.
+
+        ``fetch`` is a zero-argument callable returning an awaitable. ``None``
+        results are not cached so failed scrapes are retried on the next call.
+        A stale hit is refreshed with ``refresh`` (default ``fetch``) on a
+        thread of its own, so it must not touch the caller's loop.
+        """
+        fresh_ttl, stale_ttl = self.ttls[source]
+        entry = self._lookup(key, fresh_ttl)
+        if entry is not None:
+            age = time.time() - entry[1]
+            if age < fresh_ttl:
+                self._count(source, 'hit')
+                return json.loads(entry[0])
+            if age < fresh_ttl + stale_ttl:
+                self._count(source, 'stale')
+                self._refresh_in_background(source, key, refresh or fetch)
+                return json.loads(entry[0])
+
+        self._count(source, 'miss')
+        value = await fetch()
+        if value is not None:
+            self.set(source, key, value)
+        return value
+
+    def _refresh_in_background(self, source: str, key: str, fetch):
+        with self._refresh_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        async def refresh():
+            return await fetch()
+
+        def run():
+            try:
+                value = asyncio.run(refresh())
+                if value is not None:
+                    self.set(source, key, value)
+            except Exception as e:
+                print(f"Cache refresh error for {key}: {str(e)}")
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(key)
+
+        # A thread with its own loop outlives the request that triggered it
+        threading.Thread(target=run, name=f'cache-refresh-{source}', daemon=True).start()
+
+
+def _build_backend() -> Optional[CacheBackend]:
+    if CACHE_BACKEND == 'sqlite':
+        return SQLiteCacheBackend(CACHE_DB_PATH)
+    return None
+
+
+result_cache = TieredCache(backend=_build_backend())
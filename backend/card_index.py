@@ -0,0 +1,39 @@
+"""
+Local card-name index used to guess the scrape target before metadata resolves.
+
+Built from the seeded products: a query naming a seeded card maps to that
+card's name and set, which is what the scraped sources search for.
+"""
+
+from typing import Dict, Optional
+
+from cache import normalize_query
+from seed_data import PRODUCTS
+
+
+def base_card_name(product: Dict) -> str:
+    """Strip the set and edition suffix, e.g. "Charizard Base Set 1st Edition" -> "Charizard"."""
+    set_name = product['specs'].get('set', '')
+    if set_name and set_name in product['name']:
+        return product['name'].split(set_name)[0].strip()
+    return product['name']
+
+
+def _build_index() -> Dict[str, Dict]:
+    index = {}
+    for product in PRODUCTS:
+        name = base_card_name(product)
+        card = {'name': name, 'set_name': product['specs'].get('set', '')}
+        # First seeded printing wins for a bare name; name + set is always exact
+        index.setdefault(normalize_query(name), card)
+        index[normalize_query(f"{name} {card['set_name']}")] = card
+    return index
+
+
+_INDEX = _build_index()
+
+
+def guess_card(query: str) -> Optional[Dict]:
+    """Return ``{'name', 'set_name'}`` for a query naming a known card, else None."""
+    card = _INDEX.get(normalize_query(query))
+    return dict(card) if card else None
@@ -0,0 +1,264 @@
+"""
+Local pokemontcg.io card catalog.
+
+``python catalog.py sync`` downloads the full card and set catalog into a
+compact SQLite file. At startup it is loaded into memory as parallel
+columns with a token index, a trigram index and a sorted name array, so
+metadata resolution (name + set + number, tolerant of typos) happens
+locally in microseconds and can also back autocomplete.
+"""
+
+import bisect
+import os
+import re
+import sqlite3
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from pokemontcgsdk import RestClient
+
+from config import CATALOG_DB_PATH, POKEMONTCG_API_KEY, POKEMONTCG_API_URL
+
+PAGE_SIZE = 250
+CARD_FIELDS = 'id,name,number,rarity,set,images'
+
+# "4/102", "#4", "no. 4"
+NUMBER_PATTERN = re.compile(r'(?:#|\bno\.?\s*)(\w+)\b|\b(\w+)/\d+\b')
+
+
+def normalize(text: str) -> str:
+    return re.sub(r'\s+', ' ', re.sub(r"[^a-z0-9/ ]+", ' ', text.lower())).strip()
+
+
+def trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def sync_catalog(db_path: str = CATALOG_DB_PATH):
+    """Download every set and card from pokemontcg.io into ``db_path``."""
+    if POKEMONTCG_API_KEY:
+        RestClient.configure(POKEMONTCG_API_KEY)
+
+    tmp_path = db_path + '.tmp'
+    os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    conn.executescript('''
+        CREATE TABLE sets (
+            id TEXT PRIMARY KEY, name TEXT, series TEXT, release_date TEXT
+        );
+        CREATE TABLE cards (
+            id TEXT PRIMARY KEY, name TEXT, number TEXT, rarity TEXT,
+            set_id TEXT REFERENCES sets(id), image_url TEXT
+        );
+    ''')
+
+    page = 1
+    total = 0
+    while True:
+        data = RestClient.get(f"{POKEMONTCG_API_URL}/cards",
+                              {'page': page, 'pageSize': PAGE_SIZE, 'select': CARD_FIELDS})['data']
+        if not data:
+            break
+        for card in data:
+            card_set = card.get('set') or {}
+            conn.execute('INSERT OR IGNORE INTO sets VALUES (?, ?, ?, ?)', (
+                card_set.get('id'), card_set.get('name'), card_set.get('series'), card_set.get('releaseDate')
+            ))
+            conn.execute('INSERT OR REPLACE INTO cards VALUES (?, ?, ?, ?, ?, ?)', (
+                card['id'], card['name'], card.get('number', ''), card.get('rarity'),
+                card_set.get('id'), (card.get('images') or {}).get('large')
+            ))
+        total += len(data)
+        print(f"Catalog sync: {total} cards")
+        page += 1
+
+    conn.commit()
+    conn.close()
+    os.replace(tmp_path, db_path)
+    return total
+
+
+class CardCatalog:
+    """In-memory, column-oriented view of the synced catalog."""
+
+    def __init__(self, rows: List[tuple] = ()):
+        # Columns
+        self.ids = []
+        self.names = []
+        self.numbers = []
+        self.rarities = []
+        self.image_urls = []
+        self.set_names = []
+        self.set_series = []
+        self.release_dates = []
+        self.norm_names = []
+        self.norm_sets = []
+
+        self._by_id = {}
+        self._tokens = defaultdict(list)      # name token -> card indexes
+        self._set_tokens = set()              # every token of every set name/series
+        self._vocab = []                      # distinct name tokens
+        self._trigrams = defaultdict(list)    # trigram -> vocab ids, for typo correction
+        self._name_cards = defaultdict(list)  # normalized name -> card indexes
+        self._sorted_names = []               # distinct normalized names, for prefix search
+
+        for row in rows:
+            self._add(*row)
+        self._finish()
+
+    @classmethod
+    def load(cls, db_path: str = CATALOG_DB_PATH) -> 'CardCatalog':
+        if not os.path.exists(db_path):
+            return cls()
+        conn = sqlite3.connect(db_path)
+        try:
+            rows = conn.execute('''
+                SELECT c.id, c.name, c.number, c.rarity, c.image_url,
+                       s.name, s.series, s.release_date
+                FROM cards c LEFT JOIN sets s ON s.id = c.set_id
+                ORDER BY s.release_date, c.id
+            ''').fetchall()
+        finally:
+            conn.close()
+        catalog = cls(rows)
+        print(f"Card catalog: loaded {len(catalog)} cards")
+        return catalog
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _add(self, card_id, name, number, rarity, image_url, set_name, set_series, release_date):
+        i = len(self.ids)
+        self.ids.append(card_id)
+        self.names.append(name)
+        self.numbers.append(number or '')
+        self.rarities.append(rarity)
+        self.image_urls.append(image_url)
+        self.set_names.append(set_name or 'Unknown Set')
+        self.set_series.append(set_series or 'Unknown Series')
+        self.release_dates.append(release_date)
+        norm_name = normalize(name)
+        self.norm_names.append(norm_name)
+        set_tokens = set(normalize(f"{set_name or ''} {set_series or ''}").split())
+        self.norm_sets.append(set_tokens)
+        self._set_tokens.update(set_tokens)
+        self._by_id[card_id] = i
+        for token in set(norm_name.split()):
+            self._tokens[token].append(i)
+        self._name_cards[norm_name].append(i)
+
+    def _finish(self):
+        self._sorted_names = sorted(self._name_cards)
+        self._vocab = sorted(self._tokens)
+        for token_id, token in enumerate(self._vocab):
+            for gram in trigrams(token):
+                self._trigrams[gram].append(token_id)
+
+    def metadata(self, i: int) -> Dict:
+        """The same shape ``_fetch_card_metadata`` returns."""
+        return {
+            'name': self.names[i],
+            'id': self.ids[i],
+            'image_url': self.image_urls[i],
+            'set_name': self.set_names[i],
+            'set_series': self.set_series[i],
+            'number': self.numbers[i],
+            'rarity': self.rarities[i] or 'Unknown',
+            'release_date': self.release_dates[i],
+        }
+
+    def get(self, card_id: str) -> Optional[Dict]:
+        i = self._by_id.get(card_id)
+        return self.metadata(i) if i is not None else None
+
+    def _correct(self, token: str) -> str:
+        """Map a misspelled token to the closest name token by trigram overlap."""
+        if token in self._tokens or token in self._set_tokens or len(token) < 3:
+            return token
+        grams = trigrams(token)
+        counts = defaultdict(int)
+        for gram in grams:
+            for token_id in self._trigrams.get(gram, ()):
+                counts[token_id] += 1
+        best, best_similarity = token, 0.4
+        for token_id, shared in counts.items():
+            candidate = self._vocab[token_id]
+            similarity = shared / (len(grams) + len(trigrams(candidate)) - shared)
+            if similarity > best_similarity:
+                best, best_similarity = candidate, similarity
+        return best
+
+    def resolve(self, query: str) -> Optional[Dict]:
+        """Best matching card for a free-text query like "charizard base set 4/102"."""
+        if not self.ids:
+            return None
+        number = None
+        match = NUMBER_PATTERN.search(query.lower())
+        if match:
+            number = (match.group(1) or match.group(2)).lower()
+            query = NUMBER_PATTERN.sub(' ', query.lower())
+        q_tokens = {self._correct(token) for token in normalize(query).split()}
+        if not q_tokens:
+            return None
+
+        # Cards carrying the query's rarest name token ("charizard", not "ex")
+        postings = [self._tokens[token] for token in q_tokens if token in self._tokens]
+        if not postings:
+            return None
+        candidates = min(postings, key=len)
+
+        best, best_score = None, None
+        for i in candidates:
+            name_tokens = set(self.norm_names[i].split())
+            # Share of the query explained by this card's name and set
+            explained = len(q_tokens & (name_tokens | self.norm_sets[i])) / len(q_tokens)
+            # Share of the card's name the query asked for
+            name_cover = len(name_tokens & q_tokens) / len(name_tokens)
+            score = (
+                number is not None and self.numbers[i].lower() == number,
+                round(explained, 3),
+                round(name_cover, 3),
+                'holo' in (self.rarities[i] or '').lower(),
+                # Oldest printing wins ties: that's the card people usually mean
+                -int((self.release_dates[i] or '9999').replace('/', '')[:8]),
+            )
+            if best_score is None or score > best_score:
+                best, best_score = i, score
+        return self.metadata(best)
+
+    def complete(self, prefix: str, limit: int = 10) -> List[str]:
+        """Distinct card names starting with ``prefix``, alphabetically."""
+        p = normalize(prefix)
+        if not p:
+            return []
+        start = bisect.bisect_left(self._sorted_names, p)
+        out = []
+        for name in self._sorted_names[start:start + limit]:
+            if not name.startswith(p):
+                break
+            out.append(self.names[self._name_cards[name][0]])
+        return out
+
+
+card_catalog = CardCatalog.load()
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'help'
+    if command == 'sync':
+        started = time.time()
+        count = sync_catalog()
+        print(f"Catalog sync: wrote {count} cards to {CATALOG_DB_PATH} in {time.time() - started:.1f}s")
+    elif command == 'resolve' and len(sys.argv) > 2:
+        started = time.perf_counter()
+        result = card_catalog.resolve(' '.join(sys.argv[2:]))
+        print(result)
+        print(f"resolved in {(time.perf_counter() - started) * 1e6:.0f} us")
+    else:
+        print('usage: python catalog.py sync | resolve <query>')
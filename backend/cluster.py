@@ -0,0 +1,270 @@
+"""
+Cluster mode: shard the agents' card scrapes across backend nodes.
+
+Without it every node scrapes and caches the same popular cards on its own,
+so N nodes mean N times the upstream load and the anti-bot exposure. With
+CLUSTER_SELF and a member list set, each card is owned by one node, picked
+on a consistent-hash ring. Each node has CLUSTER_VNODES points on the ring,
+so adding or removing a node moves only about 1/N of the cards.
+
+    value = await cluster.fetch('stockx', card, lambda: scrape_here(card))
+
+A card's identity is its pokemontcg id, or its normalized name + set while
+the id isn't known yet. The identity picks the owner for every agent, so
+all of a card's comparison prices are scraped and cached on one node.
+
+A node that doesn't own a card POSTs the fetch to the owner's
+/cluster/fetch. The owner answers from its result cache, with concurrent
+requests coalesced, so a popular card is scraped once per TTL for the whole
+cluster. The forwarding node caches the answer as well.
+
+An owner that can't be reached is skipped for CLUSTER_RETRY_AFTER seconds.
+Its cards go to the next node on the ring, which is the same node on every
+member. When no other node is left, the card is scraped locally. An owner
+that answers with an error (an open breaker, a failed scrape) is not
+bypassed: the error is raised as a local scrape error would be, so the site
+isn't hit again from another node.
+
+Members are ``name=url`` pairs in CLUSTER_NODES
+(``a=http://10.0.0.1:5000,b=http://10.0.0.2:5000``), or ``name url`` lines in
+CLUSTER_NODES_FILE. The file is re-read when it changes, so nodes can be
+added or drained without a restart. Every node needs the same member list,
+and the same CLUSTER_SECRET: /cluster/fetch only answers callers that send
+it, and isn't served at all outside cluster mode.
+"""
+
+import asyncio
+import bisect
+import hashlib
+import hmac
+import os
+import re
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import httpx
+
+from cache import normalize_query
+from config import CLUSTER_NODES, CLUSTER_NODES_FILE, CLUSTER_RETRY_AFTER, CLUSTER_SECRET, CLUSTER_SELF, \
+    CLUSTER_TIMEOUT, CLUSTER_VNODES
+from metrics import cluster_fetches
+
+SECRET_HEADER = 'X-Cluster-Secret'
+NODE_HEADER = 'X-Cluster-Node'
+# Seconds between checks of CLUSTER_NODES_FILE for changes
+RELOAD_EVERY = 2.0
+# A node that doesn't accept a connection within this long counts as down
+CONNECT_TIMEOUT = 2.0
+NODE_ENTRY = re.compile(r'^(\S+?)\s*[=\s]\s*(\S+)$')
+
+
+class NodeUnreachable(Exception):
+    """A forwarded fetch couldn't reach its node."""
+
+
+class ClusterError(Exception):
+    """The owner node answered a forwarded fetch with an error."""
+
+
+def card_identity(card: Dict) -> str:
+    """What a card is sharded by: its pokemontcg id, else its normalized name and set."""
+    if card.get('id'):
+        return f"id:{card['id']}"
+    return 'name:' + normalize_query(f"{card.get('name', '')} {card.get('set_name', '')}")
+
+
+def parse_nodes(text: str) -> Dict[str, str]:
+    """``name=url`` or ``name url`` entries, separated by commas or newlines; ``#`` lines are comments."""
+    nodes = {}
+    for entry in text.replace(',', '\n').splitlines():
+        entry = entry.strip()
+        if not entry or entry.startswith('#'):
+            continue
+        match = NODE_ENTRY.match(entry)
+        if not match:
+            print(f"Cluster: Ignoring malformed node entry {entry!r}")
+            continue
+        nodes[match.group(1)] = match.group(2).rstrip('/')
+    return nodes
+
+
+def _point(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    def __init__(self, nodes: Iterable[str], vnodes: int = CLUSTER_VNODES):
+        self.nodes = sorted(set(nodes))
+        points = sorted((_point(f"{node}#{i}"), node) for node in self.nodes for i in range(vnodes))
+        self._hashes = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def preference(self, key: str) -> List[str]:
+        """Every node in the order it takes over ``key``: the owner first, then its successors."""
+        order = []
+        start = bisect.bisect(self._hashes, _point(key))
+        for i in range(len(self._owners)):
+            node = self._owners[(start + i) % len(self._owners)]
+            if node not in order:
+                order.append(node)
+                if len(order) == len(self.nodes):
+                    break
+        return order
+
+    def owner(self, key: str) -> Optional[str]:
+        order = self.preference(key)
+        return order[0] if order else None
+
+
+class Cluster:
+    def __init__(self, self_name: str = CLUSTER_SELF, nodes: str = CLUSTER_NODES,
+                 nodes_file: str = CLUSTER_NODES_FILE, vnodes: int = CLUSTER_VNODES,
+                 timeout: float = CLUSTER_TIMEOUT, retry_after: float = CLUSTER_RETRY_AFTER,
+                 secret: str = CLUSTER_SECRET):
+        self.self_name = self_name
+        self.nodes_file = nodes_file
+        self.vnodes = vnodes
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.secret = secret
+        self.enabled = bool(self_name) and bool(nodes or nodes_file)
+        if self.enabled and not secret:
+            # /cluster/fetch runs scrapes for its callers, so it is never left open
+            raise RuntimeError('Cluster mode needs CLUSTER_SECRET, shared by every node')
+        # Members and their ring, swapped together
+        self._members_ring: Tuple[Dict[str, str], HashRing] = ({}, HashRing([], vnodes))
+        self._file_mtime = None
+        self._checked = 0.0
+        self._down: Dict[str, float] = {}    # node -> monotonic time it's tried again
+        self._lock = threading.Lock()
+        self._client = None
+        if self.enabled and nodes_file:
+            self._reload_file()
+        elif self.enabled:
+            self._set_nodes(parse_nodes(nodes))
+
+    def _set_nodes(self, nodes: Dict[str, str]):
+        self._members_ring = (nodes, HashRing(nodes, self.vnodes))
+        print(f"Cluster: {self.self_name} with {len(nodes)} nodes: {', '.join(sorted(nodes))}")
+        if self.self_name not in nodes:
+            print(f"Cluster: {self.self_name} is not a member; forwarding all card fetches")
+
+    def _reload_file(self):
+        """Re-read the member file when it has changed; keep the last members when it can't be read."""
+        try:
+            mtime = os.stat(self.nodes_file).st_mtime_ns
+            if mtime == self._file_mtime:
+                return
+            with open(self.nodes_file) as f:
+                text = f.read()
+        except OSError as e:
+            if self._file_mtime != -1:
+                print(f"Cluster: Can't read {self.nodes_file}: {str(e)}")
+                self._file_mtime = -1
+            return
+        self._file_mtime = mtime
+        self._set_nodes(parse_nodes(text))
+
+    def _members(self) -> Tuple[Dict[str, str], HashRing]:
+        if self.nodes_file and time.monotonic() - self._checked >= RELOAD_EVERY:
+            with self._lock:
+                if time.monotonic() - self._checked >= RELOAD_EVERY:
+                    self._checked = time.monotonic()
+                    self._reload_file()
+        return self._members_ring
+
+    def owner(self, card: Dict) -> Optional[str]:
+        """The node that owns ``card`` when every member is up."""
+        return self._members()[1].owner(card_identity(card))
+
+    def route(self, card: Dict) -> Optional[Tuple[str, str]]:
+        """``(name, url)`` of the node to forward ``card``'s fetches to; None when this node fetches it."""
+        if not self.enabled:
+            return None
+        nodes, ring = self._members()
+        now = time.monotonic()
+        for node in ring.preference(card_identity(card)):
+            if node == self.self_name:
+                return None
+            if self._down.get(node, 0.0) <= now:
+                return node, nodes[node]
+        return None
+
+    def _mark_down(self, node: str, error: Exception):
+        print(f"Cluster: {node} unreachable ({repr(error)}); skipping it for {self.retry_after:.0f}s")
+        self._down[node] = time.monotonic() + self.retry_after
+
+    def _get_client(self) -> httpx.Client:
+        # A sync client is safe to share across threads, and so across the request loops
+        with self._lock:
+            if self._client is None:
+                self._client = httpx.Client(timeout=httpx.Timeout(self.timeout, connect=CONNECT_TIMEOUT))
+            return self._client
+
+    def _post(self, node: str, url: str, source: str, card: Dict) -> Optional[Dict]:
+        headers = {NODE_HEADER: self.self_name}
+        if self.secret:
+            headers[SECRET_HEADER] = self.secret
+        try:
+            response = self._get_client().post(f"{url}/cluster/fetch", json={'source': source, 'card': card},
+                                               headers=headers)
+        except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+            self._mark_down(node, e)
+            raise NodeUnreachable(node) from e
+        except httpx.HTTPError as e:
+            raise ClusterError(f"{node}: {repr(e)}") from e
+        if response.status_code != 200:
+            raise ClusterError(f"{node} answered {response.status_code}: {response.text[:200]}")
+        self._down.pop(node, None)
+        return response.json().get('value')
+
+    async def fetch(self, source: str, card: Dict, local: Callable[[], Awaitable]) -> Optional[Dict]:
+        """``source``'s value for ``card`` from the card's owner; ``await local()`` when that's this node."""
+        if not self.enabled:
+            return await local()
+        route = 'local'
+        while True:
+            node = self.route(card)
+            if node is None:
+                return await self._counted(source, route, local)
+            try:
+                return await self._counted(source, 'forwarded',
+                                           lambda: asyncio.to_thread(self._post, *node, source, card))
+            except NodeUnreachable:
+                # Marked down, so the next pass picks the node after it
+                route = 'fallback'
+
+    async def _counted(self, source: str, route: str, fetch: Callable[[], Awaitable]):
+        try:
+            value = await fetch()
+        except NodeUnreachable:
+            cluster_fetches.inc(source=source, route=route, outcome='unreachable')
+            raise
+        except Exception:
+            cluster_fetches.inc(source=source, route=route, outcome='error')
+            raise
+        cluster_fetches.inc(source=source, route=route, outcome='ok' if value else 'empty')
+        return value
+
+    def served(self, source: str, ok: bool):
+        """Count a fetch answered for another node."""
+        cluster_fetches.inc(source=source, route='served', outcome='ok' if ok else 'error')
+
+    def authorized(self, secret: Optional[str]) -> bool:
+        return self.enabled and bool(self.secret) and hmac.compare_digest(self.secret, secret or '')
+
+    def status(self) -> Dict:
+        nodes, _ = self._members()
+        now = time.monotonic()
+        return {
+            'enabled': self.enabled,
+            'self': self.self_name,
+            'members': self.nodes_file or 'CLUSTER_NODES',
+            'vnodes': self.vnodes,
+            'nodes': {name: {'url': url, 'down_for': round(max(0.0, self._down.get(name, 0.0) - now), 1)}
+                      for name, url in sorted(nodes.items())},
+        }
+
+
+cluster = Cluster()
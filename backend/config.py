@@ -16,12 +16,215 @@ API_BASE_URL = os.environ.get(
 # Get your key at: https://dev.pokemontcg.io/
 POKEMONTCG_API_KEY = os.environ.get('POKEMONTCG_API_KEY', '')
 
+# Upstream base URLs. Only the offline benchmarks (benchmarks/stubs.py) point these elsewhere.
+POKEMONTCG_API_URL = os.environ.get('POKEMONTCG_API_URL', 'https://api.pokemontcg.io/v2')
+# Empty: the Finding API's own endpoint
+EBAY_FINDING_URL = os.environ.get('EBAY_FINDING_URL', '')
+STOCKX_BASE_URL = os.environ.get('STOCKX_BASE_URL', 'https://stockx.com')
+TCGPLAYER_BASE_URL = os.environ.get('TCGPLAYER_BASE_URL', 'https://www.tcgplayer.com')
+TCGPLAYER_API_URL = os.environ.get('TCGPLAYER_API_URL', 'https://mpapi.tcgplayer.com')
+PWCC_BASE_URL = os.environ.get('PWCC_BASE_URL', 'https://www.pwccmarketplace.com')
+
 # eBay API Credentials (required)
 # Get your credentials at: https://developer.ebay.com/
 EBAY_APP_ID = os.environ.get('EBAY_APP_ID', 'YOUR_EBAY_APP_ID_HERE')
 EBAY_DEV_ID = os.environ.get('EBAY_DEV_ID', 'YOUR_EBAY_DEV_ID_HERE')
 EBAY_CERT_ID = os.environ.get('EBAY_CERT_ID', 'YOUR_EBAY_CERT_ID_HERE')
 
+# eBay Finding fan-out: base query pages plus one call per grade variant, on a pooled set of connections
+EBAY_POOL_SIZE = int(os.environ.get('EBAY_POOL_SIZE', '8'))
+EBAY_MAX_PAGES = int(os.environ.get('EBAY_MAX_PAGES', '3'))
+EBAY_ENTRIES_PER_PAGE = int(os.environ.get('EBAY_ENTRIES_PER_PAGE', '100'))
+EBAY_GRADE_VARIANTS = [v.strip() for v in os.environ.get(
+    'EBAY_GRADE_VARIANTS', 'PSA 10,PSA 9,BGS 10,BGS 9.5,CGC 10,CGC 9.5,SGC 10').split(',') if v.strip()]
+# Finding API calls per day (the free tier allows 5,000)
+EBAY_DAILY_QUOTA = float(os.environ.get('EBAY_DAILY_QUOTA', '5000'))
+# Share of the daily bucket extra pages and variants leave for base queries (0-1)
+EBAY_QUOTA_RESERVE = float(os.environ.get('EBAY_QUOTA_RESERVE', '0.5'))
+
+# Modules that register the comparison-market source agents (see agents.py)
+AGENT_MODULES = os.environ.get('AGENT_MODULES', 'stockx_scraper,tcgplayer_analyst,pwcc_agent').split(',')
+# Max total agent cost per /search (0 = run every agent); cheapest agents are kept first
+SEARCH_COST_BUDGET = float(os.environ.get('SEARCH_COST_BUDGET', '0'))
+
+# Shared Chromium pool used by the StockX/TCGPlayer/PWCC agents
+BROWSER_HEADLESS = os.environ.get('BROWSER_HEADLESS', '1') != '0'
+BROWSER_POOL_MAX_PAGES = int(os.environ.get('BROWSER_POOL_MAX_PAGES', '6'))
+BROWSER_POOL_RECYCLE_AFTER = int(os.environ.get('BROWSER_POOL_RECYCLE_AFTER', '200'))
+
+# Scraper page loading: 'fast' blocks heavy resources and waits on selectors,
+# 'legacy' loads everything and waits for networkidle (for comparison)
+PAGE_POLICY = os.environ.get('PAGE_POLICY', 'fast')
+PAGE_BLOCK_RESOURCES = set(os.environ.get('PAGE_BLOCK_RESOURCES', 'image,media,font').split(','))
+PAGE_GOTO_TIMEOUT_MS = int(os.environ.get('PAGE_GOTO_TIMEOUT_MS', '30000'))
+
+# Plain-HTTP scraping tier, tried before the browser (SCRAPE_HTTP_TIER=0 goes straight to Chromium)
+SCRAPE_HTTP_TIER = os.environ.get('SCRAPE_HTTP_TIER', '1') != '0'
+HTTP_POOL_SIZE = int(os.environ.get('HTTP_POOL_SIZE', '20'))
+HTTP_TIMEOUT = float(os.environ.get('HTTP_TIMEOUT', '8'))
+# The HTTP tier is skipped for a site once fewer than this share of its recent attempts succeed...
+HTTP_TIER_MIN_SUCCESS = float(os.environ.get('HTTP_TIER_MIN_SUCCESS', '0.3'))
+# ...except for this share of scrapes, which keep probing it in case it recovers
+HTTP_TIER_PROBE = float(os.environ.get('HTTP_TIER_PROBE', '0.1'))
+HTTP_TIER_WINDOW = int(os.environ.get('HTTP_TIER_WINDOW', '50'))
+
+# Local data directory for caches and other on-disk stores
+DATA_DIR = os.environ.get('DATA_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
+
+# Result cache: in-process LRU in front of a shared backend ('sqlite' or 'none')
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'sqlite')
+CACHE_DB_PATH = os.environ.get('CACHE_DB_PATH', os.path.join(DATA_DIR, 'cache.sqlite3'))
+CACHE_LRU_SIZE = int(os.environ.get('CACHE_LRU_SIZE', '2048'))
+
+# Per-source (fresh TTL, stale-while-revalidate window) in seconds
+CACHE_TTLS = {
+    'metadata': (3 * 24 * 3600, 7 * 24 * 3600),
+    'ebay': (60, 300),
+    'stockx': (10 * 60, 30 * 60),
+    'tcgplayer': (30 * 60, 2 * 3600),
+    'pwcc': (10 * 60, 30 * 60),
+}
+
+# Where the source agents run: 'inline' in the web process, or 'queue' to hand
+# scrapes to worker processes (python workers.py) through the job queue
+SCRAPE_MODE = os.environ.get('SCRAPE_MODE', 'inline')
+# Empty: SQLite at JOB_DB_PATH; or a redis:// URL (needs the redis package)
+JOB_QUEUE_URL = os.environ.get('JOB_QUEUE_URL', '')
+JOB_DB_PATH = os.environ.get('JOB_DB_PATH', os.path.join(DATA_DIR, 'jobs.sqlite3'))
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '2'))
+# Jobs in flight per worker process
+JOB_WORKER_CONCURRENCY = int(os.environ.get('JOB_WORKER_CONCURRENCY', '4'))
+# A running job still unfinished after this long (its worker died) goes to another worker;
+# workers give up on a job at its agent's max timeout, well inside the lease
+JOB_LEASE = float(os.environ.get('JOB_LEASE', '60'))
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', '2'))
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', '0.05'))
+# Finished jobs are purged after this many seconds
+JOB_RETENTION = float(os.environ.get('JOB_RETENTION', '3600'))
+
+# Cluster mode: with several backend nodes, each card's agent scrapes are owned by one
+# node on a consistent-hash ring and the other nodes forward to it (see cluster.py).
+# CLUSTER_SELF is this node's name; members are 'name=url,...' in CLUSTER_NODES, or
+# one 'name url' per line in CLUSTER_NODES_FILE (re-read when it changes).
+CLUSTER_SELF = os.environ.get('CLUSTER_SELF', '')
+CLUSTER_NODES = os.environ.get('CLUSTER_NODES', '')
+CLUSTER_NODES_FILE = os.environ.get('CLUSTER_NODES_FILE', '')
+CLUSTER_VNODES = int(os.environ.get('CLUSTER_VNODES', '64'))          # ring points per node
+CLUSTER_TIMEOUT = float(os.environ.get('CLUSTER_TIMEOUT', '45'))      # a forwarded fetch, scrape included
+# An unreachable node is skipped (its cards go to the next node on the ring) for this long
+CLUSTER_RETRY_AFTER = float(os.environ.get('CLUSTER_RETRY_AFTER', '15'))
+# Shared secret /cluster/fetch callers must send; required in cluster mode
+CLUSTER_SECRET = os.environ.get('CLUSTER_SECRET', '')
+
+# Local pokemontcg.io card catalog (python catalog.py sync)
+CATALOG_DB_PATH = os.environ.get('CATALOG_DB_PATH', os.path.join(DATA_DIR, 'catalog.sqlite3'))
+
+# Per-source deadlines for /search in seconds, measured from the start of the request
+SOURCE_DEADLINES = {
+    'metadata': float(os.environ.get('DEADLINE_METADATA', '8')),
+    'ebay': float(os.environ.get('DEADLINE_EBAY', '10')),
+    'stockx': float(os.environ.get('DEADLINE_STOCKX', '25')),
+    'tcgplayer': float(os.environ.get('DEADLINE_TCGPLAYER', '25')),
+    'pwcc': float(os.environ.get('DEADLINE_PWCC', '25')),
+}
+
+# Per-source upstream call timeouts in seconds as (min, max): adapted to ~1.5x the
+# recent p95 latency within these bounds, and the max until there is enough history
+RESILIENCE_TIMEOUTS = {
+    'metadata': (1.0, float(os.environ.get('TIMEOUT_MAX_METADATA', '8'))),
+    'ebay': (2.0, float(os.environ.get('TIMEOUT_MAX_EBAY', '10'))),
+    'stockx': (5.0, float(os.environ.get('TIMEOUT_MAX_STOCKX', '25'))),
+    'tcgplayer': (5.0, float(os.environ.get('TIMEOUT_MAX_TCGPLAYER', '25'))),
+    'pwcc': (5.0, float(os.environ.get('TIMEOUT_MAX_PWCC', '25'))),
+}
+# Sources that get a hedged second attempt when the first is slower than their p95.
+# Off by default for eBay (a hedge repeats the whole multi-call fan-out) and the
+# scraped sources (a hedge there is a second browser page).
+RESILIENCE_HEDGE = set(filter(None, os.environ.get('RESILIENCE_HEDGE', 'metadata').split(',')))
+HEDGE_MAX_RATIO = float(os.environ.get('HEDGE_MAX_RATIO', '0.1'))
+
+# Circuit breakers: trip at this error rate over the window, then fail fast for the cooldown
+BREAKER_WINDOW = float(os.environ.get('BREAKER_WINDOW', '60'))
+BREAKER_MIN_CALLS = int(os.environ.get('BREAKER_MIN_CALLS', '5'))
+BREAKER_ERROR_RATE = float(os.environ.get('BREAKER_ERROR_RATE', '0.5'))
+BREAKER_COOLDOWN = float(os.environ.get('BREAKER_COOLDOWN', '30'))
+BREAKER_COOLDOWN_MAX = float(os.environ.get('BREAKER_COOLDOWN_MAX', '300'))
+
+# ASGI serving mode (uvicorn asgi:app): threads for the synchronous eBay/TCG SDK calls
+ASGI_UPSTREAM_THREADS = int(os.environ.get('ASGI_UPSTREAM_THREADS', '64'))
+
+# Learned card -> product page URLs for the scraped sources
+PRODUCT_URLS_DB_PATH = os.environ.get('PRODUCT_URLS_DB_PATH', os.path.join(DATA_DIR, 'product_urls.sqlite3'))
+
+# /products catalog: a JSON list in the seed_data format, used instead of the seeded products when present
+PRODUCTS_PATH = os.environ.get('PRODUCTS_PATH', os.path.join(DATA_DIR, 'products.json'))
+PRODUCTS_PAGE_SIZE = int(os.environ.get('PRODUCTS_PAGE_SIZE', '50'))
+PRODUCTS_MAX_PAGE_SIZE = int(os.environ.get('PRODUCTS_MAX_PAGE_SIZE', '200'))
+# Cache-Control max-age for /products responses; the catalog only changes on restart
+PRODUCTS_MAX_AGE = int(os.environ.get('PRODUCTS_MAX_AGE', '300'))
+
+# HTTP response caching and compression (see http_cache.py)
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', '1024'))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', '5'))
+# Pre-serialized responses kept for URL-keyed endpoints such as /products
+RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', '512'))
+
+# Price history: append-only observations plus rollup buckets (name -> seconds)
+HISTORY_DB_PATH = os.environ.get('HISTORY_DB_PATH', os.path.join(DATA_DIR, 'history.sqlite3'))
+HISTORY_ROLLUPS = {'1h': 3600, '1d': 24 * 3600, '7d': 7 * 24 * 3600}
+# Window of stored eBay listings used for market_stats when live listings are unavailable
+HISTORY_STATS_WINDOW = int(os.environ.get('HISTORY_STATS_WINDOW', str(24 * 3600)))
+
+# Bulk watchlist scanner (python scanner.py / POST /scan)
+SCAN_DIR = os.environ.get('SCAN_DIR', os.path.join(DATA_DIR, 'scans'))
+SCAN_WORKERS = int(os.environ.get('SCAN_WORKERS', '32'))
+
+# Per-source cap on concurrent upstream calls during a scan
+SCAN_CONCURRENCY = {
+    'metadata': int(os.environ.get('SCAN_CONCURRENCY_METADATA', '8')),
+    'ebay': int(os.environ.get('SCAN_CONCURRENCY_EBAY', '8')),
+    'stockx': int(os.environ.get('SCAN_CONCURRENCY_STOCKX', '2')),
+    'tcgplayer': int(os.environ.get('SCAN_CONCURRENCY_TCGPLAYER', '2')),
+    'pwcc': int(os.environ.get('SCAN_CONCURRENCY_PWCC', '2')),
+}
+
+# Upstream host of each source, and per-host (requests per second, burst)
+SOURCE_HOSTS = {
+    'metadata': 'api.pokemontcg.io',
+    'ebay': 'svcs.ebay.com',
+    'stockx': 'stockx.com',
+    'tcgplayer': 'www.tcgplayer.com',
+    'pwcc': 'www.pwccmarketplace.com',
+}
+HOST_RATE_LIMITS = {
+    'api.pokemontcg.io': (float(os.environ.get('RATE_POKEMONTCG', '5')), 10),
+    'svcs.ebay.com': (float(os.environ.get('RATE_EBAY', '5')), 10),
+    'stockx.com': (float(os.environ.get('RATE_STOCKX', '1')), 2),
+    'www.tcgplayer.com': (float(os.environ.get('RATE_TCGPLAYER', '1')), 2),
+    'www.pwccmarketplace.com': (float(os.environ.get('RATE_PWCC', '1')), 2),
+}
+
+# Background refresher that keeps the hottest cards warm: 'inline' runs it in the
+# web process, 'off' leaves it to a sidecar (python refresher.py)
+REFRESH_MODE = os.environ.get('REFRESH_MODE', 'inline')
+REFRESH_DB_PATH = os.environ.get('REFRESH_DB_PATH', os.path.join(DATA_DIR, 'demand.sqlite3'))
+REFRESH_HOT_CARDS = int(os.environ.get('REFRESH_HOT_CARDS', '50'))
+REFRESH_INTERVAL = float(os.environ.get('REFRESH_INTERVAL', '30'))      # seconds between passes
+REFRESH_JITTER = float(os.environ.get('REFRESH_JITTER', '0.2'))         # +/- fraction of the interval
+REFRESH_AHEAD = float(os.environ.get('REFRESH_AHEAD', '0.8'))           # refresh at this fraction of the fresh TTL
+REFRESH_DEMAND_HALF_LIFE = float(os.environ.get('REFRESH_DEMAND_HALF_LIFE', str(6 * 3600)))
+REFRESH_VOLATILITY_WEIGHT = float(os.environ.get('REFRESH_VOLATILITY_WEIGHT', '2'))
+REFRESH_VOLATILITY_WINDOW = int(os.environ.get('REFRESH_VOLATILITY_WINDOW', str(24 * 3600)))
+
+# Per-source refresh budget in refreshes per minute
+REFRESH_BUDGETS = {
+    'ebay': float(os.environ.get('REFRESH_BUDGET_EBAY', '30')),
+    'stockx': float(os.environ.get('REFRESH_BUDGET_STOCKX', '6')),
+    'tcgplayer': float(os.environ.get('REFRESH_BUDGET_TCGPLAYER', '6')),
+    'pwcc': float(os.environ.get('REFRESH_BUDGET_PWCC', '6')),
+}
+
 # Flask Configuration
 DEBUG = True
 HOST = '0.0.0.0'
@@ -0,0 +1,197 @@
+"""
+eBay Finding API client for graded listings.
+
+One search fans out into several Finding calls, run concurrently:
+
+- the base query ("<card> graded pokemon card"), pages 1..EBAY_MAX_PAGES
+  as far as eBay reports results, at EBAY_ENTRIES_PER_PAGE each
+- one call per grade variant ("<card> PSA 10", "<card> BGS 9.5", ...). On
+  popular cards these surface listings that fall far outside the base
+  query's first pages.
+
+Listings are deduplicated by eBay item id. Callers can get each call's
+parsed listings as it lands, instead of waiting for the whole fan-out.
+
+Calls run on a fixed pool of EBAY_POOL_SIZE threads. Each thread keeps one
+Finding connection, so keep-alive HTTP sessions are reused across
+searches instead of being opened per call.
+
+Every call takes a token from two buckets. The per-second bucket
+(RATE_EBAY) smooths bursts. The daily bucket refills at EBAY_DAILY_QUOTA
+per day and holds at most an hour's worth. The base query's first page
+waits for its per-second token. Extra pages and variants only run while
+the daily bucket holds more than its EBAY_QUOTA_RESERVE share, so they
+never take the tokens the base query needs: a busy day degrades to fewer
+calls per search, and lookups only fail once base queries alone outrun
+the quota.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from ebaysdk.finding import Connection as Finding
+
+from config import (EBAY_APP_ID, EBAY_CERT_ID, EBAY_DAILY_QUOTA, EBAY_DEV_ID, EBAY_ENTRIES_PER_PAGE,
+                    EBAY_FINDING_URL, EBAY_GRADE_VARIANTS, EBAY_MAX_PAGES, EBAY_POOL_SIZE, EBAY_QUOTA_RESERVE,
+                    HOST_RATE_LIMITS)
+from grade_parser import GradeParser
+from metrics import span
+from ratelimit import TokenBucket
+
+
+class EbayQuotaExceeded(Exception):
+    """The daily call budget is spent."""
+
+
+def parse_items(items) -> List[Dict]:
+    """Listing dicts for the graded items of one Finding response page."""
+    listings = []
+    for item in items:
+        title = item.title
+        parsed = GradeParser.parse_grade_details(title)
+        if not parsed:
+            continue
+        try:
+            price = float(item.sellingStatus.currentPrice.value)
+            listings.append({
+                'item_id': getattr(item, 'itemId', None) or item.viewItemURL,
+                'title': title,
+                'price': price,
+                'currency': item.sellingStatus.currentPrice._currencyId,
+                'url': item.viewItemURL,
+                'company': parsed['company'],
+                'grade': parsed['grade'],
+                'label': parsed['label'],
+                'qualifier': parsed['qualifier'],
+                'image_url': item.galleryURL if hasattr(item, 'galleryURL') else None,
+                'condition': item.condition.conditionDisplayName if hasattr(item, 'condition') else 'N/A',
+                'location': item.location if hasattr(item, 'location') else 'N/A',
+                'source': 'eBay'
+            })
+        except Exception:
+            continue
+    return listings
+
+
+class EbayClient:
+    def __init__(self, pool_size: int = EBAY_POOL_SIZE, max_pages: int = EBAY_MAX_PAGES,
+                 entries_per_page: int = EBAY_ENTRIES_PER_PAGE, variants: List[str] = EBAY_GRADE_VARIANTS,
+                 daily_quota: float = EBAY_DAILY_QUOTA, quota_reserve: float = EBAY_QUOTA_RESERVE):
+        self.max_pages = max_pages
+        self.entries_per_page = entries_per_page
+        self.variants = variants
+        self._executor = ThreadPoolExecutor(pool_size, thread_name_prefix='ebay')
+        self._local = threading.local()
+        self.per_second = TokenBucket(*HOST_RATE_LIMITS['svcs.ebay.com'])
+        self.daily = TokenBucket(daily_quota / 86400.0, daily_quota / 24.0)
+        # Daily tokens only the base query's first page may use
+        self.reserve = self.daily.burst * min(max(quota_reserve, 0.0), 1.0)
+        self.calls = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    def _connection(self) -> Finding:
+        api = getattr(self._local, 'api', None)
+        if api is None:
+            api = self._local.api = Finding(
+                appid=EBAY_APP_ID,
+                devid=EBAY_DEV_ID,
+                certid=EBAY_CERT_ID,
+                config_file=None,
+                siteid='EBAY-US'
+            )
+            if EBAY_FINDING_URL:
+                # The SDK forces https on svcs.ebay.com; point it at a stand-in instead
+                url = urlsplit(EBAY_FINDING_URL)
+                api.config.set('domain', url.netloc, force=True)
+                api.config.set('uri', url.path.rstrip('/') + '/services/search/FindingService/v1', force=True)
+                api.config.set('https', url.scheme == 'https', force=True)
+        return api
+
+    def _find(self, keywords: str, page: int):
+        """One findItemsAdvanced call; returns ``(listings, total_pages)``."""
+        response = self._connection().execute('findItemsAdvanced', {
+            'keywords': keywords,
+            'itemFilter': [
+                {'name': 'ListingType', 'value': 'FixedPrice'},
+                {'name': 'Condition', 'value': 'New'},
+            ],
+            'sortOrder': 'PricePlusShippingLowest',
+            'paginationInput': {'entriesPerPage': self.entries_per_page, 'pageNumber': page}
+        })
+        reply = response.reply
+        if reply.ack != 'Success':
+            return [], 0
+        items = getattr(reply.searchResult, 'item', None) or []
+        try:
+            total_pages = int(reply.paginationOutput.totalPages)
+        except (AttributeError, TypeError, ValueError):
+            total_pages = 1
+        return parse_items(items), total_pages
+
+    async def _call(self, keywords: str, page: int, required: bool = False):
+        """Run one call on the pool within the quotas; None when skipped for quota."""
+        if not self.daily.try_acquire(keep=0.0 if required else self.reserve):
+            if required:
+                raise EbayQuotaExceeded('eBay daily call budget is spent')
+            with self._lock:
+                self.skipped += 1
+            return None
+        await self.per_second.acquire()
+        with self._lock:
+            self.calls += 1
+        with span('call', 'ebay'):
+            return await asyncio.get_running_loop().run_in_executor(self._executor, self._find, keywords, page)
+
+    async def fetch_listings(self, query: str,
+                             on_batch: Optional[Callable[[List[Dict]], None]] = None) -> List[Dict]:
+        """
+        Graded listings for ``query`` from the base query's pages and the grade
+        variants, deduplicated by item id. ``on_batch`` is called with the
+        listings collected so far each time a call lands.
+        """
+        seen: Dict[str, Dict] = {}
+
+        def collect(batch):
+            before = len(seen)
+            for listing in batch or []:
+                seen.setdefault(listing['item_id'], listing)
+            if on_batch is not None and len(seen) > before:
+                on_batch(list(seen.values()))
+
+        async def optional_call(keywords: str, page: int):
+            # Extra pages and variants only add coverage; a failure just drops them
+            try:
+                landed = await self._call(keywords, page)
+            except Exception as e:
+                print(f"eBay: {keywords!r} page {page} failed: {repr(e)}")
+                return
+            if landed:
+                collect(landed[0])
+
+        base = f"{query} graded pokemon card"
+
+        async def base_pages():
+            listings, total_pages = await self._call(base, 1, required=True)
+            collect(listings)
+            pages = range(2, min(total_pages, self.max_pages) + 1)
+            await asyncio.gather(*(optional_call(base, page) for page in pages))
+
+        tasks = [asyncio.ensure_future(base_pages())]
+        tasks += [asyncio.ensure_future(optional_call(f"{query} {grade} pokemon", 1)) for grade in self.variants]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+        return list(seen.values())
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'calls': self.calls, 'skipped_for_quota': self.skipped}
+
+
+ebay_client = EbayClient()
@@ -0,0 +1,97 @@
+"""
+Dependency-aware fan-out helpers for the /search pipeline.
+
+Sources run as tasks with absolute per-source deadlines. A source that misses
+its deadline is cancelled and reported as timed out, so the response goes out
+on time with partial results instead of waiting on the slowest scraper.
+Streaming callers can take each source as it settles instead.
+"""
+
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from cache import normalize_query
+
+
+def same_card(guess: Optional[Dict], metadata: Dict) -> bool:
+    """Whether a speculative scrape target matches the resolved card."""
+    if not guess:
+        return False
+    if guess.get('id') and metadata.get('id'):
+        return guess['id'] == metadata['id']
+    return (normalize_query(f"{guess['name']} {guess.get('set_name', '')}")
+            == normalize_query(f"{metadata['name']} {metadata.get('set_name', '')}"))
+
+
+async def iter_with_deadlines(tasks: Dict[str, asyncio.Task], deadlines: Dict[str, float],
+                              progress: Optional[asyncio.Queue] = None) -> AsyncIterator[Tuple[str, Any, Optional[bool]]]:
+    """Yield ``(name, result, timed_out)`` for each of ``tasks`` as it settles.
+
+    Deadlines are in ``loop.time()`` units. Tasks that miss their deadline
+    are cancelled and yield ``(name, None, True)``; tasks that raise yield
+    ``(name, None, False)``. Closing the iterator early cancels the rest.
+
+    Tasks can report partial results by putting ``(name, partial)`` on the
+    ``progress`` queue; while the task is pending, the latest one is yielded
+    as ``(name, partial, None)``.
+    """
+    loop = asyncio.get_running_loop()
+    pending = dict(tasks)
+    next_progress = None
+
+    try:
+        while pending:
+            if progress is not None and next_progress is None:
+                next_progress = asyncio.ensure_future(progress.get())
+            nearest = min(deadlines[name] for name in pending)
+            done, _ = await asyncio.wait(
+                [*pending.values(), *([next_progress] if next_progress else [])],
+                timeout=max(0.0, nearest - loop.time()),
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            if next_progress is not None and next_progress in done:
+                # Only the latest partial per task is worth reporting
+                latest = dict([next_progress.result()])
+                next_progress = None
+                while not progress.empty():
+                    name, partial = progress.get_nowait()
+                    latest[name] = partial
+                for name, partial in latest.items():
+                    if name in pending and pending[name] not in done:
+                        yield name, partial, None
+            now = loop.time()
+            for name, task in list(pending.items()):
+                if task in done:
+                    del pending[name]
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        print(f"Source {name} failed: {repr(e)}")
+                        result = None
+                    yield name, result, False
+                elif now >= deadlines[name]:
+                    print(f"Source {name} missed its deadline, returning partial results")
+                    task.cancel()
+                    del pending[name]
+                    yield name, None, True
+    finally:
+        for task in pending.values():
+            task.cancel()
+        if next_progress is not None:
+            next_progress.cancel()
+
+
+async def gather_with_deadlines(tasks: Dict[str, asyncio.Task],
+                                deadlines: Dict[str, float]) -> Tuple[Dict[str, Any], List[str]]:
+    """Await ``tasks`` until their deadlines (in ``loop.time()`` units).
+
+    Returns ``(results, timed_out)``. Tasks that miss their deadline are
+    cancelled and yield ``None``; so do tasks that raise.
+    """
+    results = {}
+    timed_out = []
+    async for name, result, late in iter_with_deadlines(tasks, deadlines):
+        results[name] = result
+        if late:
+            timed_out.append(name)
+    return results, timed_out
@@ -0,0 +1,86 @@
+"""
+Grading company / grade extraction from listing titles.
+
+All companies share one precompiled alternation, so a title is scanned once
+instead of once per company. The leftmost grade in the title wins.
+Recognised forms include:
+
+    PSA 10, PSA10, PSA GEM MT 10, PSA 9 OC, PSA 8 (MK)
+    BGS 9.5, Beckett 10 Black Label, BGS 9.5 Gold Label
+    CGC Pristine 10, CGC 9.5 Gem Mint, SGC 10, TAG 8.5, ACE 10, PCA 9
+    GEM MT 10 (PSA's label on its own)
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+COMPANIES = ('PSA', 'BGS', 'CGC', 'SGC', 'TAG', 'ACE', 'PCA')
+COMPANY_ALIASES = {'BECKETT': 'BGS'}
+
+_LABEL = r'GEM[\s\-]*(?:MINT|MT)|PRISTINE|PERFECT|MINT|NM[\s\-]*MT|NEAR\s+MINT'
+_AFTER_LABEL = r'BLACK\s+LABEL|GOLD\s+LABEL|SILVER\s+LABEL|' + _LABEL
+# PSA qualifiers: off-center, stain, print defect, out of focus, marks, miscut
+_QUALIFIER = r'OC|ST|PD|OF|MK|MC'
+_GRADE = r'10(?:\.0)?|[1-9](?:\.\d)?'
+
+# Every alternative starts with a literal, so the regex engine can skip
+# ahead to candidate positions instead of trying the pattern at every one
+GRADE_PATTERN = re.compile(
+    r'(?:' + '|'.join(COMPANIES + tuple(COMPANY_ALIASES)) + r'|GEM[\s\-]*MT(?=\s*\d))'
+    r'[\s\-:#]*(?:(?P<label>' + _LABEL + r')[\s\-]*)?'
+    r'(?P<grade>' + _GRADE + r')(?![\d.])'
+    r'(?:\s*(?P<label_after>' + _AFTER_LABEL + r'))?'
+    r'(?:\s*\(?(?P<qualifier>' + _QUALIFIER + r')\)?(?![A-Z]))?'
+)
+
+# First three letters of the match -> canonical company; a bare "GEM MT" label is PSA's
+_CANONICAL = {company: company for company in COMPANIES}
+_CANONICAL.update({'BEC': 'BGS', 'GEM': 'PSA'})
+
+
+def _search(upper_title: str):
+    """First grade match that starts on a word boundary ("PSA", not "SPACE")."""
+    match = GRADE_PATTERN.search(upper_title)
+    while match is not None and match.start() and upper_title[match.start() - 1].isalnum():
+        match = GRADE_PATTERN.search(upper_title, match.start() + 1)
+    return match
+
+
+def _normalize_label(label: Optional[str]) -> Optional[str]:
+    if not label:
+        return None
+    return re.sub(r'[\s\-]+', ' ', label)
+
+
+class GradeParser:
+    # Titles are uppercased before matching; a case-sensitive pattern on an
+    # uppercased title is markedly faster than re.IGNORECASE.
+
+    @staticmethod
+    def parse_grade_details(title: str) -> Optional[Dict]:
+        """``{'company', 'grade', 'label', 'qualifier'}`` for the first grade in ``title``."""
+        match = _search(title.upper())
+        if match is None:
+            return None
+        text = match.group(0)
+        label = match.group('label_after') or match.group('label')
+        if text.startswith('GEM'):
+            label = label or text[:match.start('grade') - match.start()].strip()
+        return {
+            'company': _CANONICAL[text[:3]],
+            'grade': float(match.group('grade')),
+            'label': _normalize_label(label),
+            'qualifier': match.group('qualifier'),
+        }
+
+    @staticmethod
+    def parse_grade(title: str) -> Tuple[Optional[str], Optional[float]]:
+        match = _search(title.upper())
+        if match is None:
+            return None, None
+        return _CANONICAL[match.group(0)[:3]], float(match.group('grade'))
+
+    @staticmethod
+    def parse_grades(titles: Iterable[str]) -> List[Tuple[Optional[str], Optional[float]]]:
+        """Batch form of :meth:`parse_grade`, for history backfills."""
+        return [GradeParser.parse_grade(title) for title in titles]
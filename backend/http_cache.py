@@ -0,0 +1,194 @@
+"""
+HTTP caching for the JSON endpoints: ETags, conditional GETs, Cache-Control
+and response compression.
+
+A response body is serialized once into a Prepared response, which carries:
+
+- a weak ETag hashed from the body
+- an optional Last-Modified (e.g. the newest ``updated_at`` of the products
+  in a /products page)
+- its Cache-Control header
+
+``respond()`` answers a request from it:
+
+- 304 with no body when If-None-Match (or, failing that, If-Modified-Since)
+  says the client already has this version
+- otherwise the body, compressed with brotli or gzip when the client
+  accepts it and the body is at least COMPRESS_MIN_BYTES
+
+Compressed variants are memoized on the Prepared response. Endpoints whose
+output only depends on the URL (the /products catalog) keep their Prepared
+responses in a ResponseCache, so a hot page is serialized and compressed
+once instead of on every hit.
+
+Brotli is used when the ``brotli`` package is installed, gzip otherwise.
+"""
+
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Callable, Dict, Mapping, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from config import BROTLI_QUALITY, COMPRESS_MIN_BYTES, GZIP_LEVEL, RESPONSE_CACHE_SIZE
+
+JSON_TYPE = 'application/json'
+
+
+def cache_control(max_age: float, stale: float = 0) -> str:
+    """Cache-Control for a shared-cacheable response fresh for ``max_age`` seconds."""
+    value = f"public, max-age={max(0, int(max_age))}"
+    if stale > 0:
+        value += f", stale-while-revalidate={int(stale)}"
+    return value
+
+
+def iso_timestamp(value: Optional[str]) -> Optional[float]:
+    """Epoch seconds for an ISO 8601 timestamp such as seed_data's ``updated_at``."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+
+def _parse_http_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def _etag_matches(etag: str, if_none_match: str) -> bool:
+    """Weak comparison, as If-None-Match uses."""
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if (candidate[2:] if candidate.startswith('W/') else candidate) == opaque:
+            return True
+    return False
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """'br' or 'gzip' from an Accept-Encoding header, preferring brotli; None for identity."""
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if coding:
+            accepted[coding.strip().lower()] = quality
+    for coding in (('br', 'gzip') if brotli is not None else ('gzip',)):
+        if accepted.get(coding, accepted.get('*', 0.0)) > 0:
+            return coding
+    return None
+
+
+class Prepared:
+    """A serialized response body with its validators and memoized compressed variants."""
+
+    def __init__(self, body: bytes, cache_control: str, last_modified: Optional[float] = None):
+        self.body = body
+        self.cache_control = cache_control
+        self.last_modified = last_modified
+        self.etag = f'W/"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+        self._encoded: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def encoded(self, encoding: Optional[str]) -> bytes:
+        if encoding is None:
+            return self.body
+        with self._lock:
+            cached = self._encoded.get(encoding)
+        if cached is None:
+            if encoding == 'br':
+                cached = brotli.compress(self.body, quality=BROTLI_QUALITY)
+            else:
+                cached = gzip.compress(self.body, compresslevel=GZIP_LEVEL, mtime=0)
+            with self._lock:
+                self._encoded[encoding] = cached
+        return cached
+
+    def not_modified(self, headers: Mapping[str, str]) -> bool:
+        if_none_match = headers.get('if-none-match')
+        if if_none_match:
+            return _etag_matches(self.etag, if_none_match)
+        since = _parse_http_date(headers.get('if-modified-since'))
+        return since is not None and self.last_modified is not None and int(self.last_modified) <= since
+
+
+def prepare(body, cache_control: str, last_modified: Optional[float] = None) -> Prepared:
+    return Prepared(json.dumps(body, separators=(',', ':')).encode('utf-8'), cache_control, last_modified)
+
+
+def respond(prepared: Prepared, headers: Mapping[str, str], status: int = 200) -> Tuple[int, Dict[str, str], bytes]:
+    """``(status, headers, body)`` answering a request with ``headers`` (lowercase names) from ``prepared``."""
+    out = {'ETag': prepared.etag, 'Cache-Control': prepared.cache_control, 'Vary': 'Accept-Encoding'}
+    if prepared.last_modified is not None:
+        out['Last-Modified'] = formatdate(prepared.last_modified, usegmt=True)
+    if status == 200 and prepared.not_modified(headers):
+        return 304, out, b''
+
+    encoding = None
+    if len(prepared.body) >= COMPRESS_MIN_BYTES:
+        encoding = choose_encoding(headers.get('accept-encoding'))
+    body = prepared.encoded(encoding)
+    out['Content-Type'] = JSON_TYPE
+    if encoding:
+        out['Content-Encoding'] = encoding
+    return status, out, body
+
+
+def flask_response(prepared: Prepared, status: int = 200):
+    """``respond()`` for the current Flask request."""
+    from flask import Response, request
+
+    status, headers, body = respond(prepared, request.headers, status)
+    return Response(body, status=status, headers=headers)
+
+
+class ResponseCache:
+    """LRU of Prepared responses for endpoints whose output only depends on the URL."""
+
+    def __init__(self, max_size: int = RESPONSE_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: 'OrderedDict[str, Prepared]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_prepare(self, key: str, build: Callable[[], Prepared]) -> Prepared:
+        with self._lock:
+            prepared = self._entries.get(key)
+            if prepared is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return prepared
+            self.misses += 1
+        prepared = build()
+        with self._lock:
+            self._entries[key] = prepared
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return prepared
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,238 @@
+"""
+Pooled plain-HTTP fetching for the source agents' cheap tier.
+
+Many of the values the agents want are in the server-rendered HTML or in
+embedded JSON (Next.js pages carry their data in ``__NEXT_DATA__``). Those
+can be read with one HTTP request and an HTML parser, without the cost of
+a browser page: no Chromium process, no JavaScript, no subresources.
+
+Like the browser pool, the HTTP pool owns a dedicated event loop thread.
+One httpx client, with up to HTTP_POOL_SIZE keep-alive connections, lives
+on that loop and serves request handlers on any loop. An agent's HTTP
+scrape runs there with an HttpLoader, the HTTP counterpart of PageLoader:
+
+    async def scrape(loader):
+        page = await loader.get(url)
+        return page.select_price('.price') if page else None
+
+    result = await http_pool.run(scrape, 'PWCC', USER_AGENTS)
+
+Pages are parsed lazily: ``next_data()`` pulls the embedded JSON out of the
+raw text, and the HTML is only parsed (with lxml when it is installed) the
+first time a selector is used. Scrapes are recorded in the same per-agent
+metrics as browser scrapes, under mode ``http``.
+"""
+
+import asyncio
+import atexit
+import json
+import random
+import re
+import threading
+import time
+from typing import Dict, Optional
+
+import httpx
+from bs4 import BeautifulSoup
+
+from config import HTTP_POOL_SIZE, HTTP_TIMEOUT
+from metrics import carry_trace, span
+from page_policy import scrape_metrics
+
+try:
+    import lxml  # noqa: F401
+    PARSER = 'lxml'
+except ImportError:
+    PARSER = 'html.parser'
+
+NEXT_DATA = re.compile(r'<script[^>]*id=["\']__NEXT_DATA__["\'][^>]*>(.*?)</script>', re.DOTALL)
+DEFAULT_HEADERS = {
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+}
+
+
+def parse_price(text: Optional[str]) -> float:
+    """``'$1,234.56'`` as 1234.56; 0 when there is no number."""
+    try:
+        return float((text or '').strip().replace('$', '').replace(',', ''))
+    except ValueError:
+        return 0.0
+
+
+class HtmlPage:
+    """A fetched page: its status and text, parsed on demand."""
+
+    def __init__(self, url: str, status: int, text: str):
+        self.url = url
+        self.status = status
+        self.text = text
+        self._soup = None
+
+    @property
+    def soup(self) -> BeautifulSoup:
+        if self._soup is None:
+            self._soup = BeautifulSoup(self.text, PARSER)
+        return self._soup
+
+    def next_data(self) -> Optional[Dict]:
+        """The page's embedded ``__NEXT_DATA__`` JSON, if it is a Next.js page."""
+        match = NEXT_DATA.search(self.text)
+        if not match:
+            return None
+        try:
+            return json.loads(match.group(1))
+        except ValueError:
+            return None
+
+    def select_attr(self, selector: str, attr: str) -> Optional[str]:
+        element = self.soup.select_one(selector)
+        return element.get(attr) if element is not None else None
+
+    def select_price(self, selector: str) -> float:
+        element = self.soup.select_one(selector)
+        return parse_price(element.get_text()) if element is not None else 0.0
+
+
+class HttpLoader:
+    """Requests plus metrics for one HTTP scrape; see the module docstring."""
+
+    def __init__(self, client: httpx.AsyncClient, agent: str, user_agent: str):
+        self.client = client
+        self.agent = agent
+        self.source = agent.lower()
+        self.headers = {'User-Agent': user_agent}
+        self.requests = 0
+        self.bytes = 0
+        self.navigation_ms = 0.0
+        self.ok = False
+        self.last_status = None
+        self._started = None
+
+    async def __aenter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.ok = self.ok and exc_type is None
+        scrape_metrics.add(self.agent, {
+            'mode': 'http',
+            'ok': self.ok,
+            'total_ms': (time.perf_counter() - self._started) * 1000,
+            'navigation_ms': self.navigation_ms,
+            'wait_ms': 0.0,
+            'requests': self.requests,
+            'bytes': self.bytes,
+            'blocked': {},
+        })
+        return False
+
+    async def _get(self, url: str, stage: str, headers: Optional[Dict] = None) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            with span(stage, self.source):
+                response = await self.client.get(url, headers={**self.headers, **(headers or {})})
+        except httpx.HTTPError as e:
+            print(f"{self.agent} Agent: HTTP request failed for {url}: {repr(e)}")
+            self.last_status = None
+            return None
+        finally:
+            self.navigation_ms += (time.perf_counter() - started) * 1000
+        self.requests += 1
+        self.bytes += len(response.content)
+        self.last_status = response.status_code
+        return response
+
+    async def get(self, url: str) -> Optional[HtmlPage]:
+        """The page at ``url``; None on a network error or an error status."""
+        response = await self._get(url, 'http_get')
+        if response is None or response.status_code >= 400:
+            return None
+        return HtmlPage(str(response.url), response.status_code, response.text)
+
+    async def fetch_json(self, url: str):
+        """GET a JSON endpoint; None on any failure."""
+        response = await self._get(url, 'fetch_json', {'Accept': 'application/json'})
+        if response is None or response.status_code >= 400:
+            return None
+        try:
+            return response.json()
+        except ValueError:
+            return None
+
+    def extract(self):
+        """A span for reading values off a fetched page."""
+        return span('extract', self.source)
+
+    def succeeded(self):
+        """Mark the scrape as having produced a result."""
+        self.ok = True
+
+
+class HttpPool:
+    def __init__(self, max_connections: int = HTTP_POOL_SIZE, timeout: float = HTTP_TIMEOUT):
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._start_lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        # Only touched from the pool loop
+        self._client = None
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name='http-pool', daemon=True)
+                thread.start()
+                self._loop, self._thread = loop, thread
+            return self._loop
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                headers=DEFAULT_HEADERS,
+                timeout=self.timeout,
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+            )
+        return self._client
+
+    async def run(self, fn, agent: str, user_agents):
+        """Run ``await fn(loader)`` with an HttpLoader on the pool loop and return its result."""
+        loop = self._ensure_started()
+
+        async def scrape():
+            async with HttpLoader(self._get_client(), agent, random.choice(user_agents)) as loader:
+                return await fn(loader)
+
+        coro = carry_trace(scrape())
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+    def shutdown(self, timeout: float = 10):
+        """Close the client and stop the pool loop. Safe to call more than once."""
+        with self._start_lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None or loop.is_closed():
+            return
+        try:
+            if self._client is not None:
+                asyncio.run_coroutine_threadsafe(self._client.aclose(), loop).result(timeout)
+                self._client = None
+        except Exception as e:
+            print(f"HTTP Pool: Error during shutdown: {str(e)}")
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout)
+
+
+http_pool = HttpPool()
+atexit.register(http_pool.shutdown)
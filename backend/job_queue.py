@@ -0,0 +1,412 @@
+"""
+Durable job queue between the web processes and the scrape workers.
+
+With SCRAPE_MODE=queue, the web tier does not run the source agents itself.
+Each agent fetch becomes a job (source, cache key, card). The web tier
+submits it and awaits its result, and a worker process (workers.py) claims
+and runs it. The worker also stores the result in the shared result cache.
+A request that gave up waiting still warms the cache for the next one.
+
+Jobs are deduplicated by cache key while queued or running, so concurrent
+searches for one card across web processes share a single scrape.
+
+A claimed job is leased for JOB_LEASE seconds. If its worker dies, the
+lease expires and another worker claims the job. A failed job is retried
+until it has run JOB_MAX_ATTEMPTS times, then fails for good.
+
+Waiting is cheap: one poller thread per process checks every pending job in
+a single query each JOB_POLL_INTERVAL and wakes the waiters. Waiters can be
+on any event loop.
+
+The queue lives in SQLite (JOB_DB_PATH) by default, which covers the web
+tier and workers on one machine. Set JOB_QUEUE_URL to a redis:// URL to use
+Redis instead (needs the ``redis`` package).
+"""
+
+import asyncio
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+from config import JOB_DB_PATH, JOB_LEASE, JOB_MAX_ATTEMPTS, JOB_POLL_INTERVAL, JOB_QUEUE_URL, JOB_RETENTION
+
+# A worker that has not checked in for this many seconds is listed as gone
+WORKER_TIMEOUT = 15.0
+
+
+class JobFailed(Exception):
+    """The job ran out of attempts; the message is its last error."""
+
+
+class JobQueue:
+    """
+    Interface for queue backends. A job is a dict with id, source, key,
+    payload and attempts. ``result()`` returns ``(status, result, error)``,
+    where status is queued, running, done or failed.
+    """
+
+    def __init__(self, poll_interval: float = JOB_POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self._waiters: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]]] = {}
+        self._waiters_lock = threading.Lock()
+        self._poller = None
+
+    def submit(self, source: str, key: str, payload: Dict) -> str:
+        raise NotImplementedError
+
+    def claim(self, worker: str, sources: Iterable[str]) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def complete(self, job_id: str, worker: str, result):
+        raise NotImplementedError
+
+    def fail(self, job_id: str, worker: str, error: str):
+        raise NotImplementedError
+
+    def results(self, job_ids: List[str]) -> Dict[str, Tuple[str, object, Optional[str]]]:
+        raise NotImplementedError
+
+    def heartbeat(self, worker: str, info: Dict):
+        raise NotImplementedError
+
+    def workers(self) -> List[Dict]:
+        raise NotImplementedError
+
+    def counts(self) -> Dict[str, int]:
+        raise NotImplementedError
+
+    def purge(self, older_than: float = JOB_RETENTION) -> int:
+        raise NotImplementedError
+
+    # -- waiting --------------------------------------------------------------
+
+    def result(self, job_id: str) -> Tuple[str, object, Optional[str]]:
+        return self.results([job_id]).get(job_id, ('failed', None, 'unknown job'))
+
+    async def wait(self, job_id: str):
+        """The job's result once it is done; raises JobFailed when it fails."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._waiters_lock:
+            self._waiters.setdefault(job_id, []).append((loop, future))
+            if self._poller is None or not self._poller.is_alive():
+                self._poller = threading.Thread(target=self._poll, name='job-poller', daemon=True)
+                self._poller.start()
+        try:
+            return await future
+        finally:
+            with self._waiters_lock:
+                waiters = [w for w in self._waiters.get(job_id, []) if w[1] is not future]
+                if waiters:
+                    self._waiters[job_id] = waiters
+                else:
+                    self._waiters.pop(job_id, None)
+
+    async def run(self, source: str, key: str, payload: Dict):
+        """Submit a job and wait for its result."""
+        job_id = await asyncio.to_thread(self.submit, source, key, payload)
+        return await self.wait(job_id)
+
+    def _poll(self):
+        while True:
+            time.sleep(self.poll_interval)
+            with self._waiters_lock:
+                pending = list(self._waiters)
+                if not pending:
+                    self._poller = None
+                    return
+            try:
+                finished = {job_id: state for job_id, state in self.results(pending).items()
+                            if state[0] in ('done', 'failed')}
+            except Exception as e:
+                print(f"Job queue: polling failed: {repr(e)}")
+                continue
+            with self._waiters_lock:
+                woken = [(waiter, finished[job_id]) for job_id in finished
+                         for waiter in self._waiters.pop(job_id, [])]
+            for (loop, future), (status, result, error) in woken:
+                loop.call_soon_threadsafe(_settle, future, status, result, error)
+
+    def stats(self) -> Dict:
+        with self._waiters_lock:
+            waiting = len(self._waiters)
+        return {'jobs': self.counts(), 'waiting': waiting, 'workers': self.workers()}
+
+
+def _settle(future: asyncio.Future, status: str, result, error: Optional[str]):
+    if future.done():
+        return
+    if status == 'done':
+        future.set_result(result)
+    else:
+        future.set_exception(JobFailed(error or 'job failed'))
+
+
+class SQLiteJobQueue(JobQueue):
+    def __init__(self, path: str, lease: float = JOB_LEASE, max_attempts: int = JOB_MAX_ATTEMPTS, **kwargs):
+        super().__init__(**kwargs)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        # Web and worker processes share the file; wait on each other's write locks
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'id TEXT PRIMARY KEY, source TEXT NOT NULL, key TEXT NOT NULL, payload TEXT NOT NULL, '
+            'status TEXT NOT NULL, result TEXT, error TEXT, attempts INTEGER NOT NULL DEFAULT 0, '
+            'worker TEXT, lease_until REAL, created_at REAL NOT NULL, updated_at REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, source, created_at)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key, status)')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS workers (id TEXT PRIMARY KEY, info TEXT NOT NULL, seen_at REAL NOT NULL)'
+        )
+
+    def _write(self, fn):
+        """Run ``fn(conn)`` in one IMMEDIATE transaction, so claims never race."""
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                result = fn(self._conn)
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+            return result
+
+    def submit(self, source: str, key: str, payload: Dict) -> str:
+        def submit(conn):
+            row = conn.execute("SELECT id FROM jobs WHERE key = ? AND status IN ('queued', 'running')",
+                               (key,)).fetchone()
+            if row:
+                return row[0]
+            job_id = secrets.token_hex(8)
+            now = time.time()
+            conn.execute('INSERT INTO jobs (id, source, key, payload, status, created_at, updated_at) '
+                         "VALUES (?, ?, ?, ?, 'queued', ?, ?)", (job_id, source, key, json.dumps(payload), now, now))
+            return job_id
+        return self._write(submit)
+
+    def claim(self, worker: str, sources: Iterable[str]) -> Optional[Dict]:
+        sources = list(sources)
+        marks = ','.join('?' * len(sources))
+
+        def claim(conn):
+            now = time.time()
+            # Jobs whose worker died mid-run are up for grabs again, unless out of attempts
+            conn.execute("UPDATE jobs SET status = 'failed', error = 'worker lost', updated_at = ? "
+                         "WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+                         (now, now, self.max_attempts))
+            row = conn.execute(
+                f"SELECT id, source, key, payload, attempts FROM jobs WHERE source IN ({marks}) AND "
+                f"(status = 'queued' OR (status = 'running' AND lease_until < ?)) ORDER BY created_at LIMIT 1",
+                (*sources, now)
+            ).fetchone()
+            if row is None:
+                return None
+            job_id, source, key, payload, attempts = row
+            conn.execute("UPDATE jobs SET status = 'running', worker = ?, lease_until = ?, attempts = ?, "
+                         "updated_at = ? WHERE id = ?", (worker, now + self.lease, attempts + 1, now, job_id))
+            return {'id': job_id, 'source': source, 'key': key, 'payload': json.loads(payload),
+                    'attempts': attempts + 1}
+        return self._write(claim)
+
+    def complete(self, job_id: str, worker: str, result):
+        self._write(lambda conn: conn.execute(
+            "UPDATE jobs SET status = 'done', result = ?, updated_at = ? WHERE id = ? AND worker = ?",
+            (json.dumps(result), time.time(), job_id, worker)))
+
+    def fail(self, job_id: str, worker: str, error: str):
+        self._write(lambda conn: conn.execute(
+            "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+            "error = ?, updated_at = ? WHERE id = ? AND worker = ?",
+            (self.max_attempts, error, time.time(), job_id, worker)))
+
+    def results(self, job_ids: List[str]) -> Dict[str, Tuple[str, object, Optional[str]]]:
+        out = {}
+        with self._lock:
+            for i in range(0, len(job_ids), 500):
+                chunk = job_ids[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT id, status, result, error FROM jobs WHERE id IN ({','.join('?' * len(chunk))})",
+                    chunk).fetchall()
+                for job_id, status, result, error in rows:
+                    out[job_id] = (status, json.loads(result) if result is not None else None, error)
+        return out
+
+    def heartbeat(self, worker: str, info: Dict):
+        self._write(lambda conn: conn.execute('INSERT OR REPLACE INTO workers (id, info, seen_at) VALUES (?, ?, ?)',
+                                              (worker, json.dumps(info), time.time())))
+
+    def workers(self) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute('SELECT id, info, seen_at FROM workers WHERE seen_at > ? ORDER BY id',
+                                      (time.time() - WORKER_TIMEOUT,)).fetchall()
+        return [dict(json.loads(info), id=worker, seen_at=seen_at) for worker, info, seen_at in rows]
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+        return dict(rows)
+
+    def purge(self, older_than: float = JOB_RETENTION) -> int:
+        def purge(conn):
+            cutoff = time.time() - older_than
+            conn.execute('DELETE FROM workers WHERE seen_at < ?', (cutoff,))
+            return conn.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?",
+                                (cutoff,)).rowcount
+        return self._write(purge)
+
+
+class RedisJobQueue(JobQueue):
+    """
+    The same queue on Redis: a list of job ids per source, a hash per job,
+    a key per in-flight cache key for dedupe, and a sorted set of leases.
+    """
+
+    PREFIX = 'pokeagg:jobs:'
+
+    def __init__(self, url: str, lease: float = JOB_LEASE, max_attempts: int = JOB_MAX_ATTEMPTS,
+                 retention: float = JOB_RETENTION, **kwargs):
+        super().__init__(**kwargs)
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.retention = retention
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+
+    def _k(self, *parts: str) -> str:
+        return self.PREFIX + ':'.join(parts)
+
+    def submit(self, source: str, key: str, payload: Dict) -> str:
+        job_id = secrets.token_hex(8)
+        # The in-flight marker outlives any run, so a crashed submit can't wedge the key
+        if not self._redis.set(self._k('key', key), job_id, nx=True, ex=int(self.lease * self.max_attempts) + 60):
+            existing = self._redis.get(self._k('key', key))
+            if existing:
+                return existing
+            self._redis.set(self._k('key', key), job_id, ex=int(self.lease * self.max_attempts) + 60)
+        now = time.time()
+        pipe = self._redis.pipeline()
+        pipe.hset(self._k('job', job_id), mapping={
+            'source': source, 'key': key, 'payload': json.dumps(payload), 'status': 'queued',
+            'attempts': 0, 'created_at': now, 'updated_at': now,
+        })
+        pipe.rpush(self._k('queue', source), job_id)
+        pipe.execute()
+        return job_id
+
+    def _requeue_expired(self):
+        now = time.time()
+        for job_id in self._redis.zrangebyscore(self._k('leases'), 0, now):
+            # Whoever removes the lease owns the requeue
+            if not self._redis.zrem(self._k('leases'), job_id):
+                continue
+            job = self._redis.hgetall(self._k('job', job_id))
+            if not job or job.get('status') != 'running':
+                continue
+            if int(job.get('attempts', 0)) >= self.max_attempts:
+                self._finish(job_id, job, 'failed', error='worker lost')
+            else:
+                self._redis.hset(self._k('job', job_id), mapping={'status': 'queued', 'updated_at': now})
+                self._redis.lpush(self._k('queue', job['source']), job_id)
+
+    def claim(self, worker: str, sources: Iterable[str]) -> Optional[Dict]:
+        self._requeue_expired()
+        for source in sources:
+            job_id = self._redis.lpop(self._k('queue', source))
+            if job_id is None:
+                continue
+            now = time.time()
+            attempts = self._redis.hincrby(self._k('job', job_id), 'attempts', 1)
+            self._redis.hset(self._k('job', job_id), mapping={'status': 'running', 'worker': worker,
+                                                              'updated_at': now})
+            self._redis.zadd(self._k('leases'), {job_id: now + self.lease})
+            job = self._redis.hgetall(self._k('job', job_id))
+            return {'id': job_id, 'source': job['source'], 'key': job['key'],
+                    'payload': json.loads(job['payload']), 'attempts': attempts}
+        return None
+
+    def _finish(self, job_id: str, job: Dict, status: str, result=None, error: Optional[str] = None):
+        pipe = self._redis.pipeline()
+        fields = {'status': status, 'updated_at': time.time()}
+        if result is not None:
+            fields['result'] = json.dumps(result)
+        if error is not None:
+            fields['error'] = error
+        pipe.hset(self._k('job', job_id), mapping=fields)
+        pipe.expire(self._k('job', job_id), int(self.retention))
+        pipe.zrem(self._k('leases'), job_id)
+        pipe.delete(self._k('key', job['key']))
+        pipe.execute()
+
+    def _owned(self, job_id: str, worker: str) -> Optional[Dict]:
+        job = self._redis.hgetall(self._k('job', job_id))
+        return job if job and job.get('worker') == worker and job.get('status') == 'running' else None
+
+    def complete(self, job_id: str, worker: str, result):
+        job = self._owned(job_id, worker)
+        if job:
+            self._finish(job_id, job, 'done', result=result)
+
+    def fail(self, job_id: str, worker: str, error: str):
+        job = self._owned(job_id, worker)
+        if not job:
+            return
+        if int(job.get('attempts', 0)) >= self.max_attempts:
+            self._finish(job_id, job, 'failed', error=error)
+            return
+        pipe = self._redis.pipeline()
+        pipe.hset(self._k('job', job_id), mapping={'status': 'queued', 'error': error, 'updated_at': time.time()})
+        pipe.zrem(self._k('leases'), job_id)
+        pipe.rpush(self._k('queue', job['source']), job_id)
+        pipe.execute()
+
+    def results(self, job_ids: List[str]) -> Dict[str, Tuple[str, object, Optional[str]]]:
+        pipe = self._redis.pipeline()
+        for job_id in job_ids:
+            pipe.hmget(self._k('job', job_id), 'status', 'result', 'error')
+        out = {}
+        for job_id, (status, result, error) in zip(job_ids, pipe.execute()):
+            if status is not None:
+                out[job_id] = (status, json.loads(result) if result is not None else None, error)
+        return out
+
+    def heartbeat(self, worker: str, info: Dict):
+        self._redis.set(self._k('worker', worker), json.dumps(dict(info, seen_at=time.time())),
+                        ex=int(WORKER_TIMEOUT))
+
+    def workers(self) -> List[Dict]:
+        keys = sorted(self._redis.scan_iter(self._k('worker', '*')))
+        values = self._redis.mget(keys) if keys else []
+        return [dict(json.loads(value), id=key.rsplit(':', 1)[1]) for key, value in zip(keys, values) if value]
+
+    def counts(self) -> Dict[str, int]:
+        queued = sum(self._redis.llen(key) for key in self._redis.scan_iter(self._k('queue', '*')))
+        return {'queued': queued, 'running': self._redis.zcard(self._k('leases'))}
+
+    def purge(self, older_than: float = JOB_RETENTION) -> int:
+        # Finished jobs expire on their own
+        return 0
+
+
+def _build_queue() -> JobQueue:
+    if JOB_QUEUE_URL.startswith(('redis://', 'rediss://', 'unix://')):
+        if redis is None:
+            raise RuntimeError('JOB_QUEUE_URL points at Redis, but the redis package is not installed')
+        return RedisJobQueue(JOB_QUEUE_URL)
+    return SQLiteJobQueue(JOB_DB_PATH)
+
+
+job_queue = _build_queue()
@@ -0,0 +1,217 @@
+"""
+Vectorized market statistics and arbitrage scoring.
+
+Listings are loaded into columnar NumPy arrays (price, grade, company,
+source). Each grouping (per grade, per company + grade) is one lexsort
+followed by index arithmetic over the sorted segments, so medians,
+percentiles, trimmed means and MAD outlier flags for every group come out of
+the same pass instead of a Python loop per group. Deal scoring compares every
+listing against every comparison source at once, counting a source only for
+the listings of the company and grade its reference price refers to (a PSA 10
+ask says nothing about a PSA 6, and a raw-card price nothing about a slab).
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+PERCENTILES = (10, 25, 75, 90)
+TRIM = 0.10               # fraction cut from each end for the trimmed mean
+MAD_CUTOFF = 3.5          # modified z-score above which a price is an outlier
+ARBITRAGE_DISCOUNT = 0.85
+STEAL_DISCOUNT = 0.80
+
+
+class ListingColumns:
+    """Columnar view of a list of listing dicts."""
+
+    def __init__(self, listings: List[Dict]):
+        n = len(listings)
+        self.price = np.fromiter((l['price'] for l in listings), dtype=np.float64, count=n)
+        self.grade = np.fromiter((l['grade'] for l in listings), dtype=np.float64, count=n)
+        self.companies, self.company = np.unique(
+            np.array([l.get('company') or '' for l in listings], dtype=object).astype(str),
+            return_inverse=True,
+        )
+        self.sources, self.source = np.unique(
+            np.array([l.get('source') or '' for l in listings], dtype=object).astype(str),
+            return_inverse=True,
+        )
+        self.grades, self.grade_code = np.unique(self.grade, return_inverse=True)
+
+    def __len__(self):
+        return len(self.price)
+
+
+def _quantile(sorted_values: np.ndarray, starts: np.ndarray, counts: np.ndarray, q: float) -> np.ndarray:
+    """Linear-interpolated quantile of each sorted segment ``[start, start + count)``."""
+    pos = starts + q * (counts - 1)
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.minimum(lo + 1, starts + counts - 1)
+    frac = pos - lo
+    return sorted_values[lo] * (1 - frac) + sorted_values[hi] * frac
+
+
+def grouped_stats(codes: np.ndarray, prices: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Per-group statistics for ``prices`` grouped by integer ``codes``.
+
+    Returns arrays indexed by group (``'group'`` holds each group's code) plus
+    two per-listing arrays, ``'center'`` (the group median) and ``'outlier'``.
+    """
+    if len(prices) == 0:
+        return {'group': np.empty(0, dtype=np.int64)}
+
+    order = np.lexsort((prices, codes))
+    sorted_codes = codes[order]
+    sorted_prices = prices[order]
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    counts = np.diff(np.r_[starts, len(prices)])
+
+    sums = np.add.reduceat(sorted_prices, starts)
+    median = _quantile(sorted_prices, starts, counts, 0.5)
+    stats = {
+        'group': sorted_codes[starts],
+        'count': counts,
+        'average': sums / counts,
+        'min': sorted_prices[starts],
+        'max': sorted_prices[starts + counts - 1],
+        'median': median,
+    }
+    for p in PERCENTILES:
+        stats[f'p{p}'] = _quantile(sorted_prices, starts, counts, p / 100)
+
+    # Trimmed mean from a running sum over the sorted segments
+    cut = np.floor(counts * TRIM).astype(np.int64)
+    running = np.r_[0.0, np.cumsum(sorted_prices)]
+    stats['trimmed_mean'] = (running[starts + counts - cut] - running[starts + cut]) / (counts - 2 * cut)
+
+    # Median absolute deviation: same grouping, sorted by deviation instead of price
+    group_of = np.repeat(np.arange(len(starts)), counts)
+    center = np.empty_like(prices)
+    center[order] = median[group_of]
+    deviation = np.abs(prices - center)
+    dev_order = np.lexsort((deviation, codes))
+    mad = _quantile(deviation[dev_order], starts, counts, 0.5)
+    stats['mad'] = mad
+
+    group_mad = np.empty_like(prices)
+    group_mad[order] = mad[group_of]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = 0.6745 * deviation / group_mad
+    stats['center'] = center
+    # A zero MAD (most prices identical) flags nothing
+    stats['outlier'] = (group_mad > 0) & (z > MAD_CUTOFF)
+    return stats
+
+
+def _round(values: np.ndarray) -> List[float]:
+    return np.round(values, 2).tolist()
+
+
+def _summaries(stats: Dict[str, np.ndarray]) -> List[Dict]:
+    fields = ['average', 'min', 'max', 'median', 'trimmed_mean', 'mad'] + [f'p{p}' for p in PERCENTILES]
+    columns = {field: _round(stats[field]) for field in fields}
+    counts = stats['count'].tolist()
+    return [
+        {'count': counts[i], **{field: columns[field][i] for field in fields}}
+        for i in range(len(counts))
+    ]
+
+
+def reference_prices(comparison_data: Dict[str, Optional[Dict]]) -> Dict[str, float]:
+    """The reference price of each comparison source that returned data (see agents.PriceRecord)."""
+    refs = {}
+    for source, result in comparison_data.items():
+        try:
+            value = float((result or {}).get('reference_price') or 0)
+        except (TypeError, ValueError):
+            continue
+        if value > 0:
+            refs[source] = value
+    return refs
+
+
+def reference_grades(comparison_data: Dict[str, Optional[Dict]]) -> Dict[str, Tuple[str, float]]:
+    """The (company, grade) each source's reference price refers to; ``('', 0.0)`` for raw cards."""
+    grades = {}
+    for source, result in comparison_data.items():
+        result = result or {}
+        try:
+            grade = float(result.get('grade') or 0)
+        except (TypeError, ValueError):
+            grade = 0.0
+        grades[source] = ((result.get('company') or '').upper(), grade)
+    return grades
+
+
+def market_stats(cols: ListingColumns) -> Tuple[Dict[str, Dict], Dict[str, np.ndarray]]:
+    """
+    ``{grade: stats}`` across all companies, each with a ``by_company``
+    breakdown, plus the raw per-(company, grade) arrays used for scoring.
+    """
+    by_grade = grouped_stats(cols.grade_code, cols.price)
+    pair_code = cols.company * len(cols.grades) + cols.grade_code
+    by_pair = grouped_stats(pair_code, cols.price)
+    if not len(cols):
+        return {}, by_pair
+
+    result = {}
+    for code, summary in zip(by_grade['group'].tolist(), _summaries(by_grade)):
+        summary['by_company'] = {}
+        result[str(float(cols.grades[code]))] = summary
+    for code, summary in zip(by_pair['group'].tolist(), _summaries(by_pair)):
+        company, grade = divmod(code, len(cols.grades))
+        result[str(float(cols.grades[grade]))]['by_company'][cols.companies[company] or 'Unknown'] = summary
+    return result, by_pair
+
+
+def summarize(listings: List[Dict]) -> Dict[str, Dict]:
+    """Market stats alone, e.g. for stored listings that don't need scoring."""
+    return market_stats(ListingColumns(listings))[0]
+
+
+def score_listings(listings: List[Dict], comparison_data: Dict[str, Optional[Dict]]) -> Dict[str, Dict]:
+    """
+    Compute market stats and annotate ``listings`` in place with
+    ``deal_score``, ``is_steal``, ``arbitrage_opportunity``,
+    ``arbitrage_sources``, ``arbitrage_margin`` and ``price_outlier``.
+    Returns the market stats.
+    """
+    cols = ListingColumns(listings)
+    stats, by_pair = market_stats(cols)
+    if not len(cols):
+        return stats
+
+    refs = reference_prices(comparison_data)
+    grades = reference_grades(comparison_data)
+    ref_names = list(refs)
+    ref_values = np.array([refs[name] for name in ref_names], dtype=np.float64)
+    ref_companies = np.array([grades[name][0] for name in ref_names], dtype=object).astype(str)
+    ref_grades = np.array([grades[name][1] for name in ref_names], dtype=np.float64)
+
+    # listings x sources: the source prices the listing's company and grade...
+    companies = np.char.upper(cols.companies.astype(str))[cols.company]
+    applies = (companies[:, None] == ref_companies[None, :]) & (cols.grade[:, None] == ref_grades[None, :])
+    # ...and the listing is cheaper than its reference by the arbitrage margin
+    below = applies & (cols.price[:, None] < ref_values[None, :] * ARBITRAGE_DISCOUNT)
+    arbitrage = below.any(axis=1)
+    if len(ref_values):
+        margin = np.max(np.where(applies, 1 - cols.price[:, None] / ref_values[None, :], 0.0), axis=1)
+    else:
+        margin = np.zeros(len(cols))
+
+    # Steals are judged against the median of the same company and grade
+    steal = cols.price < by_pair['center'] * STEAL_DISCOUNT
+    score = np.where(arbitrage, 90, 50) + np.where(steal, 20, 0)
+
+    rows = zip(listings, below.tolist(), arbitrage.tolist(), _round(np.maximum(margin, 0)),
+               steal.tolist(), score.tolist(), by_pair['outlier'].tolist())
+    for listing, hit, is_arbitrage, listing_margin, is_steal, deal_score, outlier in rows:
+        listing['arbitrage_opportunity'] = is_arbitrage
+        listing['arbitrage_sources'] = [name for name, is_below in zip(ref_names, hit) if is_below]
+        listing['arbitrage_margin'] = listing_margin
+        listing['is_steal'] = is_steal
+        listing['deal_score'] = deal_score
+        listing['price_outlier'] = outlier
+    return stats
@@ -0,0 +1,258 @@
+"""
+Latency instrumentation: timing spans, histograms and counters, exported in
+Prometheus text format at /metrics.
+
+Each stage of a search runs inside a span:
+
+    with span('goto', source='stockx'):
+        await page.goto(url)
+
+A span observes ``pokeagg_stage_seconds{stage, source}``. The stages are:
+
+- the /search pipeline: ``fetch`` per source, ``scoring``, ``history``
+- the browser pool: ``pool_wait``, ``launch``, ``page_setup``
+- each agent's page load: ``goto``, ``wait_for_selector``, ``fetch_json``,
+  ``extract``, and ``http_get`` for the HTTP tier
+- eBay: one ``call`` per Finding request
+
+Upstream outcomes (ok, empty, timeout, error, circuit_open) are counted per
+source in ``pokeagg_source_requests_total``, agent scrapes per tier in
+``pokeagg_scrape_attempts_total``, and in cluster mode agent fetches per
+route in ``pokeagg_cluster_fetches_total``. HTTP requests are counted and
+timed per route. Cache counters and breaker state are read at scrape time.
+
+Tracing is opt in, per request. A request sent with ``X-Trace: 1`` gets its
+stage breakdown back in a ``Server-Timing`` header (browser dev tools show
+it in the network panel). Spans reach the trace through contextvars, so
+spans from tasks the request starts count too, including scrapes on the
+browser pool's loop.
+"""
+
+import contextvars
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+PREFIX = 'pokeagg_'
+TRACE_HEADER = 'X-Trace'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Seconds; from a cache hit up to a slow browser scrape
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 25.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != float('inf') else '+Inf'
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name, self.help, self.label_names = PREFIX + name, help, labels
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(labels.get(name, '') for name in self.label_names)
+        with self._lock:
+            self._values[key] += amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        lines += [f'{self.name}{_labels(self.label_names, key)} {_number(v)}' for key, v in sorted(values.items())]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name, self.help, self.label_names = PREFIX + name, help, labels
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._series: Dict[Tuple, List] = {}    # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, '') for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            snapshot = {key: list(series) for key, series in self._series.items()}
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for key, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = 'le="%s"' % _number(bound)
+                lines.append(f'{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.label_names, key)} {_number(series[-2])}')
+            lines.append(f'{self.name}_count{_labels(self.label_names, key)} {series[-1]}')
+        return lines
+
+
+# A collector returns (name, type, help, [(labels, value), ...]) families, read at scrape time
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors: List[Collector] = []
+
+    def counter(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labels: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, fn: Collector) -> Collector:
+        self._collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        for collect in self._collectors:
+            try:
+                families = list(collect())
+            except Exception as e:
+                print(f"Metrics: collector {collect.__name__} failed: {repr(e)}")
+                continue
+            for name, kind, help, samples in families:
+                lines += [f'# HELP {PREFIX}{name} {help}', f'# TYPE {PREFIX}{name} {kind}']
+                for labels, value in samples:
+                    names = tuple(labels)
+                    lines.append(f'{PREFIX}{name}{_labels(names, tuple(labels[n] for n in names))} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
+
+stage_seconds = metrics.histogram('stage_seconds', 'Time spent per pipeline stage.', ('stage', 'source'))
+source_requests = metrics.counter('source_requests_total', 'Upstream calls by source and outcome.',
+                                  ('source', 'outcome'))
+scrape_attempts = metrics.counter('scrape_attempts_total', 'Agent scrapes by tier (http, browser) and outcome.',
+                                  ('source', 'tier', 'outcome'))
+cluster_fetches = metrics.counter('cluster_fetches_total', 'Agent fetches by cluster route and outcome.',
+                                  ('source', 'route', 'outcome'))
+http_requests = metrics.counter('http_requests_total', 'HTTP requests by route and status.',
+                                ('route', 'method', 'status'))
+http_seconds = metrics.histogram('http_request_seconds', 'HTTP request latency by route.', ('route',))
+
+
+class Trace:
+    """The spans recorded while serving one traced request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._spans: List[Tuple[str, str, float]] = []
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, source: str, seconds: float):
+        with self._lock:
+            self._spans.append((stage, source, seconds))
+
+    def breakdown(self) -> List[Dict]:
+        """Total time and span count per (source, stage), in first-seen order."""
+        totals: 'OrderedDict[Tuple[str, str], List]' = OrderedDict()
+        with self._lock:
+            spans = list(self._spans)
+        for stage, source, seconds in spans:
+            entry = totals.setdefault((source, stage), [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+        return [{'source': source, 'stage': stage, 'ms': round(seconds * 1000, 1), 'count': count}
+                for (source, stage), (seconds, count) in totals.items()]
+
+    def server_timing(self) -> str:
+        """The breakdown as a Server-Timing header value, ending with the request total."""
+        entries = []
+        for row in self.breakdown():
+            name = f"{row['source']}.{row['stage']}" if row['source'] else row['stage']
+            entry = f"{name};dur={row['ms']}"
+            if row['count'] > 1:
+                entry += f';desc="x{row["count"]}"'
+            entries.append(entry)
+        entries.append(f"total;dur={round((time.perf_counter() - self.started) * 1000, 1)}")
+        return ', '.join(entries)
+
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar('trace', default=None)
+
+
+def wants_trace(value: Optional[str]) -> bool:
+    return bool(value) and value.strip().lower() not in ('0', 'false', 'no', 'off')
+
+
+def start_trace() -> Trace:
+    trace = Trace()
+    _current_trace.set(trace)
+    return trace
+
+
+def end_trace():
+    _current_trace.set(None)
+
+
+def carry_trace(coro):
+    """Wrap ``coro`` so it records into the current trace when run on another loop or thread."""
+    trace = _current_trace.get()
+    if trace is None:
+        return coro
+
+    async def traced():
+        _current_trace.set(trace)
+        return await coro
+    return traced()
+
+
+class _Span:
+    __slots__ = ('stage', 'source', '_started')
+
+    def __init__(self, stage: str, source: str):
+        self.stage = stage
+        self.source = source
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self._started
+        stage_seconds.observe(seconds, stage=self.stage, source=self.source)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(self.stage, self.source, seconds)
+        return False
+
+
+def span(stage: str, source: str = '') -> _Span:
+    """Time the enclosed block as ``stage`` (of ``source``); works around awaits too."""
+    return _Span(stage, source)
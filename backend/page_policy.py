@@ -0,0 +1,245 @@
+"""
+Shared page-loading policy for the Playwright agents.
+
+Pages intercept every request and abort the ones the agents never read:
+images, media, fonts, and analytics/ad trackers. Navigation returns at
+DOMContentLoaded and then waits for the specific selector the agent is
+about to read, instead of waiting for the network to go idle (which on these
+sites means waiting out every tracker and lazy-loaded image).
+
+Each scrape records timings, request counts and bytes received per agent.
+Navigation, selector waits, JSON requests and extraction also run in
+metrics spans, so they show up in /metrics and in traced requests.
+Setting PAGE_POLICY=legacy restores full page loads with networkidle, to
+measure what the policy saves on the same traffic.
+"""
+
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Dict, Iterable, Optional
+from urllib.parse import urlsplit
+
+from config import PAGE_BLOCK_RESOURCES, PAGE_GOTO_TIMEOUT_MS, PAGE_POLICY
+from metrics import span
+
+# Third-party hosts that only serve analytics, ads and session recording
+TRACKER_HOSTS = (
+    'google-analytics.com', 'googletagmanager.com', 'doubleclick.net', 'googlesyndication.com',
+    'googleadservices.com', 'facebook.net', 'facebook.com', 'connect.facebook.net',
+    'segment.io', 'segment.com', 'hotjar.com', 'optimizely.com', 'nr-data.net', 'newrelic.com',
+    'datadoghq.com', 'browser-intake-datadoghq.com', 'sentry.io', 'amplitude.com', 'mixpanel.com',
+    'criteo.com', 'criteo.net', 'bat.bing.com', 'clarity.ms', 'fullstory.com', 'quantserve.com',
+    'scorecardresearch.com', 'tiktok.com', 'analytics.tiktok.com', 'ct.pinterest.com',
+    'adsrvr.org', 'branch.io', 'braze.com', 'onetrust.com', 'cookielaw.org', 'px-cloud.net',
+)
+
+SAMPLES_KEPT = 200
+
+
+def _is_tracker(url: str) -> bool:
+    host = urlsplit(url).hostname or ''
+    return any(host == t or host.endswith('.' + t) for t in TRACKER_HOSTS)
+
+
+def find_number(data: Any, keys: Iterable[str]) -> float:
+    """First positive number stored under any of ``keys`` anywhere in nested JSON, else 0."""
+    keys = set(keys)
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key in keys and isinstance(value, (int, float)) and not isinstance(value, bool) and value > 0:
+                    return float(value)
+                if isinstance(value, (dict, list)):
+                    stack.append(value)
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+    return 0.0
+
+
+class ScrapeMetrics:
+    """Recent per-agent scrape samples, summarised for /agents/metrics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=SAMPLES_KEPT))
+
+    def add(self, agent: str, sample: Dict):
+        with self._lock:
+            self._samples[agent].append(sample)
+
+    def summary(self) -> Dict[str, Dict]:
+        with self._lock:
+            samples = {agent: list(s) for agent, s in self._samples.items()}
+        out = {}
+        for agent, rows in samples.items():
+            by_mode = defaultdict(list)
+            for row in rows:
+                by_mode[row['mode']].append(row)
+            out[agent] = {mode: self._summarise(mode_rows) for mode, mode_rows in by_mode.items()}
+        return out
+
+    @staticmethod
+    def _summarise(rows) -> Dict:
+        n = len(rows)
+        totals = sorted(r['total_ms'] for r in rows)
+        blocked = defaultdict(int)
+        for r in rows:
+            for kind, count in r['blocked'].items():
+                blocked[kind] += count
+        return {
+            'scrapes': n,
+            'success_rate': round(sum(r['ok'] for r in rows) / n, 3),
+            'avg_total_ms': round(sum(totals) / n, 1),
+            'p95_total_ms': round(totals[min(n - 1, int(n * 0.95))], 1),
+            'avg_navigation_ms': round(sum(r['navigation_ms'] for r in rows) / n, 1),
+            'avg_wait_ms': round(sum(r['wait_ms'] for r in rows) / n, 1),
+            'avg_requests': round(sum(r['requests'] for r in rows) / n, 1),
+            'avg_bytes': round(sum(r['bytes'] for r in rows) / n),
+            'avg_blocked': {kind: round(count / n, 1) for kind, count in blocked.items()},
+        }
+
+
+scrape_metrics = ScrapeMetrics()
+
+
+class PageLoader:
+    """
+    Page-loading policy plus metrics for one scrape::
+
+        async with PageLoader(page, 'StockX') as loader:
+            await loader.goto(url, wait_for='.price')
+    """
+
+    def __init__(self, page, agent: str, mode: str = PAGE_POLICY):
+        self.page = page
+        self.agent = agent
+        self.source = agent.lower()
+        self.mode = mode
+        self.requests = 0
+        self.bytes = 0
+        self.blocked = defaultdict(int)
+        self.navigation_ms = 0.0
+        self.wait_ms = 0.0
+        self.ok = False
+        self.last_status = None
+        self._started = None
+
+    async def __aenter__(self):
+        self._started = time.perf_counter()
+        self.page.on('request', self._on_request)
+        self.page.on('response', self._on_response)
+        if self.mode != 'legacy':
+            await self.page.route('**/*', self._route)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.ok = self.ok and exc_type is None
+        scrape_metrics.add(self.agent, {
+            'mode': self.mode,
+            'ok': self.ok,
+            'total_ms': (time.perf_counter() - self._started) * 1000,
+            'navigation_ms': self.navigation_ms,
+            'wait_ms': self.wait_ms,
+            'requests': self.requests,
+            'bytes': self.bytes,
+            'blocked': dict(self.blocked),
+        })
+        return False
+
+    async def _route(self, route):
+        request = route.request
+        kind = request.resource_type
+        if kind in PAGE_BLOCK_RESOURCES:
+            self.blocked[kind] += 1
+            await route.abort()
+        elif _is_tracker(request.url):
+            self.blocked['tracker'] += 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+    def _on_request(self, request):
+        self.requests += 1
+
+    def _on_response(self, response):
+        try:
+            self.bytes += int(response.headers.get('content-length', 0))
+        except (TypeError, ValueError):
+            pass
+
+    async def goto(self, url: str, wait_for: Optional[str] = None, timeout: int = 10000,
+                   required: bool = True) -> bool:
+        """
+        Navigate to ``url`` and wait for ``wait_for`` to appear.
+
+        Returns whether the selector appeared. A missing selector raises when
+        ``required``; otherwise the caller reads whatever is on the page.
+        The HTTP status is kept in ``last_status``.
+        """
+        started = time.perf_counter()
+        wait_until = 'networkidle' if self.mode == 'legacy' else 'domcontentloaded'
+        with span('goto', self.source):
+            response = await self.page.goto(url, wait_until=wait_until, timeout=PAGE_GOTO_TIMEOUT_MS)
+        self.last_status = response.status if response is not None else None
+        self.navigation_ms += (time.perf_counter() - started) * 1000
+        if not wait_for:
+            return True
+        return await self.wait(wait_for, timeout, required)
+
+    async def wait(self, selector: str, timeout: int = 10000, required: bool = True) -> bool:
+        """Wait for ``selector`` on the current page; see :meth:`goto`."""
+        started = time.perf_counter()
+        try:
+            with span('wait_for_selector', self.source):
+                await self.page.wait_for_selector(selector, state='attached', timeout=timeout)
+            return True
+        except Exception:
+            if required:
+                raise
+            print(f"{self.agent} Agent: {selector!r} did not appear on {self.page.url}")
+            return False
+        finally:
+            self.wait_ms += (time.perf_counter() - started) * 1000
+
+    async def fetch_json(self, url: str, timeout: int = 5000):
+        """GET a JSON endpoint with the page's cookies and user agent, without navigating."""
+        started = time.perf_counter()
+        try:
+            with span('fetch_json', self.source):
+                response = await self.page.context.request.get(url, timeout=timeout)
+                body = await response.body()
+        except Exception as e:
+            print(f"{self.agent} Agent: JSON request failed for {url}: {str(e)}")
+            return None
+        finally:
+            self.navigation_ms += (time.perf_counter() - started) * 1000
+        self.requests += 1
+        self.bytes += len(body)
+        self.last_status = response.status
+        if not response.ok:
+            return None
+        try:
+            return json.loads(body)
+        except ValueError:
+            return None
+
+    async def next_data(self) -> Optional[Dict]:
+        """The page's embedded ``__NEXT_DATA__`` JSON, if it is a Next.js page."""
+        try:
+            with self.extract():
+                text = await self.page.inner_text('script#__NEXT_DATA__', timeout=1000)
+                return json.loads(text)
+        except Exception:
+            return None
+
+    def extract(self):
+        """A span for reading values off the loaded page: ``with loader.extract(): ...``"""
+        return span('extract', self.source)
+
+    def succeeded(self):
+        """Mark the scrape as having produced a result."""
+        self.ok = True
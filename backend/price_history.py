@@ -0,0 +1,206 @@
+"""
+Append-only price history with precomputed time-series rollups.
+
+Every price a search or scan sees is recorded as an observation keyed by
+card id, source, company, grade and metric (eBay ``listing`` prices,
+StockX ``lowest_ask``/``last_sale``/``highest_bid``, TCGPlayer
+``raw_market_price``/``listed_median``, PWCC ``market_price``). An item is
+sampled at most once per hour, so repeated searches and cache hits don't
+inflate the counts.
+
+Each new observation also updates its 1h, 1d and 7d rollup buckets
+(count/sum/min/max/last) in the same transaction. Trend queries read the
+rollups and never touch the raw rows. Writes go through a background thread
+so /search never waits on disk.
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from config import HISTORY_DB_PATH, HISTORY_ROLLUPS
+
+SAMPLE_EVERY = 3600   # seconds; one observation per item per hour
+
+
+def observations_for(card_id: str, listings: List[Dict], comparison_data: Dict[str, Optional[Dict]],
+                     observed_at: Optional[float] = None) -> List[tuple]:
+    """Observation rows for one search result."""
+    observed_at = observed_at or time.time()
+    rows = []
+    for listing in listings:
+        rows.append((card_id, listing.get('source') or 'eBay', listing.get('company') or '',
+                     float(listing.get('grade') or 0), 'listing', listing.get('url') or listing.get('title', ''),
+                     float(listing['price']), observed_at))
+    # Comparison results are agent PriceRecords: metrics plus the company/grade they refer to
+    for source, result in comparison_data.items():
+        if not result:
+            continue
+        company, grade = result.get('company') or '', float(result.get('grade') or 0)
+        for field, price in (result.get('metrics') or {}).items():
+            if price and price > 0:
+                rows.append((card_id, source, company, grade, field, '', float(price), observed_at))
+    return rows
+
+
+class PriceHistory:
+    BATCH = 500
+
+    def __init__(self, path: str, rollups: Dict[str, int] = HISTORY_ROLLUPS):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.rollups = rollups
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(
+            'CREATE TABLE IF NOT EXISTS observations ('
+            ' card_id TEXT NOT NULL, source TEXT NOT NULL, company TEXT NOT NULL, grade REAL NOT NULL,'
+            ' metric TEXT NOT NULL, item TEXT NOT NULL, price REAL NOT NULL, observed_at REAL NOT NULL,'
+            ' sample INTEGER NOT NULL);'
+            'CREATE UNIQUE INDEX IF NOT EXISTS observations_sample ON observations'
+            ' (card_id, source, company, grade, metric, item, sample);'
+            'CREATE INDEX IF NOT EXISTS observations_card ON observations (card_id, observed_at);'
+            'CREATE TABLE IF NOT EXISTS rollups ('
+            ' card_id TEXT NOT NULL, source TEXT NOT NULL, company TEXT NOT NULL, grade REAL NOT NULL,'
+            ' metric TEXT NOT NULL, bucket TEXT NOT NULL, bucket_start REAL NOT NULL,'
+            ' count INTEGER NOT NULL, sum REAL NOT NULL, min REAL NOT NULL, max REAL NOT NULL,'
+            ' last REAL NOT NULL, last_at REAL NOT NULL,'
+            ' PRIMARY KEY (card_id, bucket, source, company, grade, metric, bucket_start));'
+        )
+        self._conn.commit()
+        self._queue = queue.Queue()
+        self._writer = None
+
+    # -- writes -------------------------------------------------------------
+
+    def write(self, rows: List[tuple]) -> int:
+        """Insert observations and update their rollups; returns how many were new."""
+        inserted = 0
+        with self._lock:
+            for row in rows:
+                card_id, source, company, grade, metric, item, price, observed_at = row
+                cursor = self._conn.execute(
+                    'INSERT OR IGNORE INTO observations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (*row, int(observed_at // SAMPLE_EVERY))
+                )
+                if not cursor.rowcount:
+                    continue
+                inserted += 1
+                for bucket, seconds in self.rollups.items():
+                    self._conn.execute(
+                        'INSERT INTO rollups VALUES (?, ?, ?, ?, ?, ?, ?, 1, ?, ?, ?, ?, ?) '
+                        'ON CONFLICT (card_id, bucket, source, company, grade, metric, bucket_start) '
+                        'DO UPDATE SET count = count + 1, sum = sum + excluded.sum, '
+                        'min = MIN(min, excluded.min), max = MAX(max, excluded.max), '
+                        'last = CASE WHEN excluded.last_at >= last_at THEN excluded.last ELSE last END, '
+                        'last_at = MAX(last_at, excluded.last_at)',
+                        (card_id, source, company, grade, metric, bucket, observed_at // seconds * seconds,
+                         price, price, price, price, observed_at)
+                    )
+            self._conn.commit()
+        return inserted
+
+    def record(self, card_id: Optional[str], listings: List[Dict], comparison_data: Dict[str, Optional[Dict]]):
+        """Queue a search result for writing; returns immediately."""
+        if not card_id:
+            return
+        rows = observations_for(card_id, listings, comparison_data)
+        if not rows:
+            return
+        if self._writer is None or not self._writer.is_alive():
+            with self._lock:
+                if self._writer is None or not self._writer.is_alive():
+                    self._writer = threading.Thread(target=self._drain, name='price-history', daemon=True)
+                    self._writer.start()
+        self._queue.put(rows)
+
+    def _drain(self):
+        while True:
+            rows = self._queue.get()
+            # Fold whatever else is queued into the same transaction
+            while len(rows) < self.BATCH:
+                try:
+                    rows += self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            try:
+                self.write(rows)
+            except sqlite3.Error as e:
+                print(f"Price history write error: {str(e)}")
+
+    # -- reads --------------------------------------------------------------
+
+    def series(self, card_id: str, bucket: str = '1d', since: Optional[float] = None,
+               source: Optional[str] = None, company: Optional[str] = None,
+               grade: Optional[float] = None) -> List[Dict]:
+        """Rollup points grouped into one series per (source, company, grade, metric)."""
+        if bucket not in self.rollups:
+            raise ValueError(f"Unknown bucket {bucket!r}; expected one of {', '.join(self.rollups)}")
+        sql = ('SELECT source, company, grade, metric, bucket_start, count, sum, min, max, last '
+               'FROM rollups WHERE card_id = ? AND bucket = ?')
+        params = [card_id, bucket]
+        for column, value in (('source', source), ('company', company), ('grade', grade)):
+            if value is not None:
+                sql += f' AND {column} = ?'
+                params.append(value)
+        if since is not None:
+            sql += ' AND bucket_start >= ?'
+            params.append(since // self.rollups[bucket] * self.rollups[bucket])
+        sql += ' ORDER BY source, company, grade, metric, bucket_start'
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+
+        series = {}
+        for src, comp, grd, metric, start, count, total, low, high, last in rows:
+            key = (src, comp, grd, metric)
+            if key not in series:
+                series[key] = {'source': src, 'company': comp or None, 'grade': grd or None,
+                               'metric': metric, 'points': []}
+            series[key]['points'].append({
+                't': start, 'count': count, 'average': round(total / count, 2),
+                'min': low, 'max': high, 'last': last,
+            })
+        return list(series.values())
+
+    def volatility(self, card_id: str, since: float, bucket: str = '1h') -> float:
+        """
+        Largest coefficient of variation (stdev / mean) of the bucket averages
+        of any one price series since ``since``; 0 with too little history.
+        """
+        seconds = self.rollups[bucket]
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT source, company, grade, metric, sum / count FROM rollups '
+                'WHERE card_id = ? AND bucket = ? AND bucket_start >= ?',
+                (card_id, bucket, since // seconds * seconds)
+            ).fetchall()
+        averages = {}
+        for src, comp, grd, metric, average in rows:
+            averages.setdefault((src, comp, grd, metric), []).append(average)
+        worst = 0.0
+        for values in averages.values():
+            mean = sum(values) / len(values)
+            if len(values) < 2 or mean <= 0:
+                continue
+            stdev = (sum((v - mean) ** 2 for v in values) / (len(values) - 1)) ** 0.5
+            worst = max(worst, stdev / mean)
+        return worst
+
+    def listings_since(self, card_id: str, since: float) -> List[Dict]:
+        """Most recent stored price of each listing seen since ``since``, in listing-dict form."""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT source, company, grade, price, MAX(observed_at) FROM observations '
+                'WHERE card_id = ? AND metric = ? AND observed_at >= ? '
+                'GROUP BY source, company, grade, item',
+                (card_id, 'listing', since)
+            ).fetchall()
+        return [{'source': src, 'company': comp, 'grade': grd, 'price': price}
+                for src, comp, grd, price, _ in rows]
+
+
+price_history = PriceHistory(HISTORY_DB_PATH)
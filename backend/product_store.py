@@ -0,0 +1,205 @@
+"""
+In-memory product store behind /products.
+
+Products are loaded once, from PRODUCTS_PATH (a JSON list in the seed_data
+format) when it exists and from the seeded PRODUCTS otherwise. At load time
+the store builds:
+
+- an id index
+- posting lists for category, grading company, grade and set (keys
+  lowercased once)
+- each product's best price (its cheapest retailer)
+- one precomputed order per sort, as a list of positions plus each
+  position's rank in it
+
+A query intersects the posting lists of its filters, smallest first. A
+price range counts as one more posting list: the slice of the price order
+that it bisects to. The query then pages through the sort order with a
+cursor holding the last rank served. A page costs the matching candidates
+plus about ``limit`` products, never a pass over the whole catalog, so
+response size and latency stay flat as the catalog grows.
+"""
+
+import base64
+import bisect
+import json
+import os
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+from config import PRODUCTS_MAX_PAGE_SIZE, PRODUCTS_PAGE_SIZE, PRODUCTS_PATH
+from seed_data import PRODUCTS
+
+# sort name -> (key, descending); products without a price sort last either way
+SORTS = {
+    'id': (lambda p: p['id'], False),
+    'price': (lambda p: p['best_price'], False),
+    '-price': (lambda p: p['best_price'], True),
+    'name': (lambda p: p['name'].lower(), False),
+}
+# Filter parameters; each has an index keyed as in _filter_keys
+FILTERS = ('category', 'company', 'grade', 'set')
+
+
+def best_price(product: Dict) -> Optional[float]:
+    prices = [r['price'] for r in product.get('retailers') or [] if r.get('price')]
+    return min(prices) if prices else None
+
+
+def _grade_key(value) -> Optional[str]:
+    try:
+        return f"{float(value):g}"
+    except (TypeError, ValueError):
+        return None
+
+
+def _filter_keys(product: Dict) -> Dict[str, Optional[str]]:
+    specs = product.get('specs') or {}
+    return {
+        'category': (product.get('category') or '').lower() or None,
+        'company': (specs.get('grading_company') or '').lower() or None,
+        'grade': _grade_key(specs.get('grade')),
+        'set': (specs.get('set') or '').lower() or None,
+    }
+
+
+def _encode_cursor(sort: str, rank: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([sort, rank]).encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor: str, sort: str) -> int:
+    try:
+        cursor_sort, rank = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        rank = int(rank)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    if cursor_sort != sort:
+        raise ValueError(f"Cursor was issued for sort={cursor_sort}, not sort={sort}")
+    return rank
+
+
+class ProductStore:
+    def __init__(self, products: Iterable[Dict]):
+        self.products: List[Dict] = [dict(product, best_price=best_price(product)) for product in products]
+        self.fields = {field for product in self.products for field in product}
+        self.by_id: Dict[str, int] = {}
+        self.index: Dict[str, Dict[str, List[int]]] = {name: defaultdict(list) for name in FILTERS}
+        for position, product in enumerate(self.products):
+            self.by_id[product['id']] = position
+            for name, key in _filter_keys(product).items():
+                if key is not None:
+                    self.index[name][key].append(position)
+
+        self.orders: Dict[str, List[int]] = {}
+        self.ranks: Dict[str, List[int]] = {}
+        for sort, (key, descending) in SORTS.items():
+            priced = [i for i, p in enumerate(self.products) if key(p) is not None]
+            unpriced = [i for i, p in enumerate(self.products) if key(p) is None]
+            priced.sort(key=lambda i: (key(self.products[i]), self.products[i]['id']), reverse=descending)
+            order = priced + sorted(unpriced, key=lambda i: self.products[i]['id'])
+            rank = [0] * len(order)
+            for r, position in enumerate(order):
+                rank[position] = r
+            self.orders[sort], self.ranks[sort] = order, rank
+        # Ascending best prices along the 'price' order, for bisecting price ranges
+        self.sorted_prices = [self.products[i]['best_price'] for i in self.orders['price']
+                              if self.products[i]['best_price'] is not None]
+
+    def get(self, product_id: str) -> Optional[Dict]:
+        position = self.by_id.get(product_id)
+        return self.products[position] if position is not None else None
+
+    def facets(self) -> Dict[str, List[str]]:
+        """The values each filter can take."""
+        return {name: sorted(values) for name, values in self.index.items()}
+
+    def _candidates(self, filters: Dict[str, str], min_price: Optional[float],
+                    max_price: Optional[float]) -> Optional[set]:
+        """Positions matching every filter and the price range; None when nothing is filtered."""
+        postings = []
+        for name, value in filters.items():
+            key = _grade_key(value) if name == 'grade' else value.lower()
+            if name == 'grade' and key is None:
+                raise ValueError(f"Invalid grade: {value}")
+            postings.append(self.index[name].get(key, []))
+        if min_price is not None or max_price is not None:
+            low = bisect.bisect_left(self.sorted_prices, min_price) if min_price is not None else 0
+            high = (bisect.bisect_right(self.sorted_prices, max_price) if max_price is not None
+                    else len(self.sorted_prices))
+            postings.append(self.orders['price'][low:max(low, high)])
+        if not postings:
+            return None
+        postings.sort(key=len)
+        matches = set(postings[0])
+        for posting in postings[1:]:
+            matches.intersection_update(posting)
+        return matches
+
+    def query(self, filters: Optional[Dict[str, str]] = None, sort: str = 'id', cursor: Optional[str] = None,
+              limit: int = PRODUCTS_PAGE_SIZE, fields: Optional[List[str]] = None,
+              min_price: Optional[float] = None, max_price: Optional[float] = None) -> Dict:
+        """One page of products. Bad parameters raise ValueError."""
+        if sort not in SORTS:
+            raise ValueError(f"Unknown sort: {sort} (available: {', '.join(SORTS)})")
+        unknown = set(filters or {}) - set(FILTERS)
+        if unknown:
+            raise ValueError(f"Unknown filters: {', '.join(sorted(unknown))}")
+        limit = max(1, min(limit, PRODUCTS_MAX_PAGE_SIZE))
+        after = _decode_cursor(cursor, sort) if cursor else -1
+        order, rank = self.orders[sort], self.ranks[sort]
+
+        candidates = self._candidates({k: v for k, v in (filters or {}).items() if v}, min_price, max_price)
+        if candidates is None:
+            total = len(order)
+            page = order[after + 1:after + 2 + limit]
+        elif len(candidates) * 8 < len(order):
+            # Few matches: rank them directly
+            total = len(candidates)
+            page = sorted((p for p in candidates if rank[p] > after), key=rank.__getitem__)[:limit + 1]
+        else:
+            # Most of the catalog matches: walk the sort order from the cursor
+            total = len(candidates)
+            page = []
+            for r in range(after + 1, len(order)):
+                if order[r] in candidates:
+                    page.append(order[r])
+                    if len(page) > limit:
+                        break
+
+        more = len(page) > limit
+        page = page[:limit]
+        return {
+            'products': [self._project(self.products[p], fields) for p in page],
+            'total': total,
+            'limit': limit,
+            'sort': sort,
+            'next_cursor': _encode_cursor(sort, rank[page[-1]]) if more else None,
+        }
+
+    def parse_fields(self, value: Optional[str]) -> Optional[List[str]]:
+        """``?fields=name,best_price`` as a list; unknown fields raise ValueError."""
+        if not value:
+            return None
+        fields = [f.strip() for f in value.split(',') if f.strip()]
+        unknown = [f for f in fields if f not in self.fields]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        return fields
+
+    def _project(self, product: Dict, fields: Optional[List[str]]) -> Dict:
+        if not fields:
+            return product
+        return {field: product[field] for field in ['id', *fields] if field in product}
+
+
+def load_products(path: str = PRODUCTS_PATH) -> List[Dict]:
+    """The catalog from ``path`` when it exists, else the seeded products."""
+    if os.path.exists(path):
+        with open(path) as f:
+            products = json.load(f)
+        print(f"Product store: loaded {len(products)} products from {path}")
+        return products
+    return PRODUCTS
+
+
+product_store = ProductStore(load_products())
@@ -0,0 +1,116 @@
+"""
+Persisted card -> product page URL mapping for the scraped sources.
+
+With a mapped URL an agent skips the site's search page and goes straight to
+the product (or its JSON endpoint), saving a full navigation per lookup.
+Mappings come from the retailer links in seed_data.PRODUCTS and from every
+successful search-and-click scrape. A mapping that 404s is retired at once.
+One that keeps coming back empty is retired after MAX_FAILURES attempts,
+and the agent falls back to searching.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from cache import normalize_query
+from card_index import base_card_name
+from config import PRODUCT_URLS_DB_PATH
+from seed_data import PRODUCTS
+
+# seed_data retailer name -> source
+SEEDED_SOURCES = {'StockX': 'stockx', 'TCGPlayer': 'tcgplayer'}
+
+
+def url_key(card_name: str, set_name: str = '', variant: str = '') -> str:
+    """Mapping key, e.g. "charizard base set psa 10" for a graded StockX listing."""
+    return normalize_query(f"{card_name} {set_name} {variant}")
+
+
+class ProductUrlMap:
+    MAX_FAILURES = 2
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS product_urls ('
+            'source TEXT NOT NULL, key TEXT NOT NULL, url TEXT NOT NULL, origin TEXT NOT NULL, '
+            'learned_at REAL NOT NULL, confirmed_at REAL, failures INTEGER NOT NULL DEFAULT 0, '
+            'dead INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (source, key))'
+        )
+        self._conn.commit()
+
+    def get(self, source: str, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT url FROM product_urls WHERE source = ? AND key = ? AND NOT dead', (source, key)
+            ).fetchone()
+        return row[0] if row else None
+
+    def learn(self, source: str, key: str, url: str, origin: str = 'scrape'):
+        """Map ``key`` to ``url``, replacing any earlier mapping."""
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO product_urls '
+                '(source, key, url, origin, learned_at, confirmed_at, failures, dead) VALUES (?, ?, ?, ?, ?, ?, 0, 0)',
+                (source, key, url, origin, time.time(), time.time() if origin == 'scrape' else None)
+            )
+            self._conn.commit()
+
+    def confirm(self, source: str, key: str):
+        """The mapped page produced prices."""
+        with self._lock:
+            self._conn.execute(
+                'UPDATE product_urls SET confirmed_at = ?, failures = 0 WHERE source = ? AND key = ?',
+                (time.time(), source, key)
+            )
+            self._conn.commit()
+
+    def invalidate(self, source: str, key: str, gone: bool = False):
+        """
+        The mapped page broke. ``gone`` (a 404/410) retires the mapping at
+        once; otherwise it goes after MAX_FAILURES consecutive failures.
+        """
+        with self._lock:
+            self._conn.execute(
+                'UPDATE product_urls SET failures = failures + 1 WHERE source = ? AND key = ?', (source, key)
+            )
+            # Dead rows stay behind so a broken seed link isn't re-seeded on restart
+            self._conn.execute(
+                'UPDATE product_urls SET dead = 1 WHERE source = ? AND key = ? AND (? OR failures >= ?)',
+                (source, key, gone, self.MAX_FAILURES)
+            )
+            self._conn.commit()
+        print(f"Product URLs: invalidated {source} mapping for {key!r}")
+
+    def seed(self, products: List[Dict]) -> int:
+        """Add the retailer links of seeded products; existing mappings win."""
+        rows = []
+        for product in products:
+            specs = product.get('specs', {})
+            name, set_name = base_card_name(product), specs.get('set', '')
+            for retailer in product.get('retailers', []):
+                source = SEEDED_SOURCES.get(retailer.get('name'))
+                if not source or not retailer.get('url'):
+                    continue
+                # StockX lists each grade as its own product
+                variant = ''
+                if source == 'stockx' and specs.get('grading_company'):
+                    variant = f"{specs['grading_company']} {specs.get('grade', '')}"
+                rows.append((source, url_key(name, set_name, variant), retailer['url'], 'seed', time.time()))
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO product_urls (source, key, url, origin, learned_at) VALUES (?, ?, ?, ?, ?)',
+                rows
+            )
+            self._conn.commit()
+        return len(rows)
+
+
+product_urls = ProductUrlMap(PRODUCT_URLS_DB_PATH)
+product_urls.seed(PRODUCTS)
@@ -1,54 +1,84 @@
 import asyncio
-from playwright.async_api import async_playwright
-from playwright_stealth import stealth
-import random
+from agents import ScrapeFailed, SourceAgent, registry
+from browser_pool import browser_pool
+from config import CACHE_TTLS, PWCC_BASE_URL, RESILIENCE_TIMEOUTS
+from http_pool import http_pool
+from page_policy import PageLoader
+from scrape_tiers import tiers
+
+# User agents to rotate
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36'
+]
 
 async def get_pwcc_data(card_name, set_name):
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        
-        user_agents = [
-            'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36'
-        ]
-        
-        context = await browser.new_context(user_agent=random.choice(user_agents))
-        page = await context.new_page()
-        await stealth(page)
-        
-        # PWCC Marketplace search
-        search_query = f"{card_name} {set_name}"
-        search_url = f"https://www.pwccmarketplace.com/market-price-research?q={search_query.replace(' ', '+')}"
-        
-        try:
+    # PWCC Marketplace search
+    search_query = f"{card_name} {set_name}"
+    search_url = f"{PWCC_BASE_URL}/market-price-research?q={search_query.replace(' ', '+')}"
+
+    def result(sale_price):
+        return {
+            "source": "PWCC",
+            "market_price": sale_price,
+            "url": search_url
+        }
+
+    async def scrape_http(loader):
+        page = await loader.get(search_url)
+        if page is None:
+            return None
+        with loader.extract():
+            sale_price = page.select_price('.price')
+        if not sale_price:
+            return None
+        loader.succeeded()
+        return result(sale_price)
+
+    async def scrape(page):
+        async with PageLoader(page, 'PWCC') as loader:
             print(f"PWCC Agent: Navigating to {search_url}")
-            await page.goto(search_url, wait_until="networkidle", timeout=30000)
-            
+            await loader.goto(search_url, wait_for='.price', required=False)
+            if loader.last_status and loader.last_status >= 400:
+                raise ScrapeFailed(f"PWCC search answered {loader.last_status}")
+
             # PWCC often displays results in a grid. We want the market data.
             # This is a simplified extraction of the first result's sale price
             # Selectors for PWCC research are often complex
             sale_price = 0.0
-            
-            try:
-                # Example selector for a price in the results
-                price_elements = await page.query_selector_all('.price')
-                if price_elements:
-                    price_text = await price_elements[0].inner_text()
-                    sale_price = float(price_text.replace('$', '').replace(',', ''))
-            except:
-                pass
-            
-            return {
-                "source": "PWCC",
-                "market_price": sale_price,
-                "url": search_url
-            }
-            
-        except Exception as e:
-            print(f"PWCC Agent Error: {str(e)}")
-            return None
-        finally:
-            await browser.close()
+
+            with loader.extract():
+                try:
+                    # Example selector for a price in the results
+                    price_elements = await page.query_selector_all('.price')
+                    if price_elements:
+                        price_text = await price_elements[0].inner_text()
+                        sale_price = float(price_text.replace('$', '').replace(',', ''))
+                except:
+                    pass
+
+            if sale_price:
+                loader.succeeded()
+            return result(sale_price)
+
+    return await tiers.run('pwcc', lambda: http_pool.run(scrape_http, 'PWCC', USER_AGENTS),
+                           lambda: browser_pool.run(scrape, USER_AGENTS), lambda r: bool(r and r['market_price']))
+
+
+class PWCCAgent(SourceAgent):
+    name, label, host = 'pwcc', 'PWCC', 'www.pwccmarketplace.com'
+    cost = 3.0
+    concurrency = 2
+    ttl = CACHE_TTLS['pwcc']
+    timeout = RESILIENCE_TIMEOUTS['pwcc']
+    metrics = ('market_price',)
+    reference_fields = ('market_price',)
+
+    async def scrape(self, card):
+        return await get_pwcc_data(card['name'], card.get('set_name', ''))
+
+
+registry.register(PWCCAgent())
 
 if __name__ == "__main__":
     # Test
@@ -0,0 +1,77 @@
+"""
+Per-host token-bucket rate limiting.
+
+A bucket hands out reservations under a lock and callers sleep for the
+returned delay outside it, so one bucket can be shared by coroutines on
+different event loops and by plain threads.
+"""
+
+import asyncio
+import threading
+import time
+from typing import Dict, Tuple
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate            # tokens added per second
+        self.burst = burst          # bucket capacity
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """Take ``tokens`` now, possibly going into debt; return seconds to wait before using them."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def try_acquire(self, tokens: float = 1.0, keep: float = 0.0) -> bool:
+        """Take ``tokens`` only if they are available now with ``keep`` left over; never goes into debt."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens - tokens < keep:
+                return False
+            self._tokens -= tokens
+            return True
+
+    async def acquire(self, tokens: float = 1.0):
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def acquire_sync(self, tokens: float = 1.0):
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+
+class HostRateLimiter:
+    """One token bucket per host, created on first use from ``limits``."""
+
+    def __init__(self, limits: Dict[str, Tuple[float, float]], default: Tuple[float, float] = (5.0, 10.0)):
+        self._limits = limits
+        self._default = default
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, host: str) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                rate, burst = self._limits.get(host, self._default)
+                bucket = self._buckets[host] = TokenBucket(rate, burst)
+            return bucket
+
+    async def acquire(self, host: str):
+        await self.bucket(host).acquire()
+
+    def acquire_sync(self, host: str):
+        self.bucket(host).acquire_sync()
@@ -0,0 +1,288 @@
+"""
+Background refresher that keeps the hottest cards warm in the result cache.
+
+Every successful search records demand for its card, decaying with a
+half-life (REFRESH_DEMAND_HALF_LIFE) so the hot set follows what people are
+searching for now. A card's priority is its demand scaled up by its recent
+price volatility from the price-history rollups: a card whose prices move
+is worth re-checking more often than one that sits still. The featured
+cards are pinned into the hot set with a floor score.
+
+Each pass walks the top REFRESH_HOT_CARDS cards by priority and re-fetches
+every source entry that has used up REFRESH_AHEAD of its fresh TTL, so
+searches land on a fresh entry instead of a stale one or a miss. Each source
+has its own budget (refreshes per minute). Once a source's budget is spent,
+its remaining cards wait for the next pass, so the budget goes to the
+hottest cards first. Pass intervals and refresh start times are jittered so
+the sources never see a fixed-period burst.
+
+The refresher runs inside the web process (REFRESH_MODE=inline, started on
+the first request) or as a sidecar that shares the cache database:
+
+    python refresher.py
+"""
+
+import asyncio
+import json
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from cache import result_cache
+from config import (REFRESH_AHEAD, REFRESH_BUDGETS, REFRESH_DB_PATH, REFRESH_DEMAND_HALF_LIFE,
+                    REFRESH_HOT_CARDS, REFRESH_INTERVAL, REFRESH_JITTER, REFRESH_VOLATILITY_WEIGHT,
+                    REFRESH_VOLATILITY_WINDOW)
+from price_history import price_history
+from ratelimit import TokenBucket
+from seed_data import FEATURED_CARDS
+
+# Demand score a featured card never drops below
+FEATURED_FLOOR = 1.0
+# Demand below this is forgotten
+DEMAND_MIN = 0.01
+# Refreshes per minute for a source with no REFRESH_BUDGETS entry
+DEFAULT_BUDGET = 6.0
+# Most demand hits written per transaction
+WRITE_BATCH = 500
+
+# source -> plan(card, query) -> (cache key, zero-argument upstream fetch)
+RefreshPlan = Callable[[Dict, str], Tuple[str, Callable[[], Awaitable]]]
+
+
+def featured_query(card: Dict) -> str:
+    return f"{card['name']} {card['set']}"
+
+
+class DemandTracker:
+    """Exponentially decaying search counts per card, shared through SQLite."""
+
+    def __init__(self, path: str, half_life: float = REFRESH_DEMAND_HALF_LIFE):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.half_life = half_life
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS demand ('
+            'card_id TEXT PRIMARY KEY, card TEXT NOT NULL, query TEXT NOT NULL, '
+            'score REAL NOT NULL, updated_at REAL NOT NULL)'
+        )
+        self._conn.commit()
+        self._queue = queue.Queue()
+        self._writer = None
+
+    def _decayed(self, score: float, updated_at: float, now: float) -> float:
+        return score * 0.5 ** ((now - updated_at) / self.half_life)
+
+    def write(self, hits: List[Tuple[Dict, str, float]]):
+        """Count ``(card, query, searched_at)`` hits in one transaction."""
+        with self._lock:
+            for card, query, at in hits:
+                row = self._conn.execute('SELECT score, updated_at FROM demand WHERE card_id = ?',
+                                         (card['id'],)).fetchone()
+                score = (self._decayed(*row, at) if row else 0.0) + 1.0
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO demand (card_id, card, query, score, updated_at) VALUES (?, ?, ?, ?, ?)',
+                    (card['id'], json.dumps(card), query, score, at)
+                )
+            self._conn.commit()
+
+    def hit(self, card: Dict, query: str):
+        """Queue one search for ``card``; ``query`` is what the refresher re-runs for eBay. Returns immediately.
+
+        The database is shared with other web processes and the sidecar, so a
+        write can wait on their locks; that happens on the writer thread, never
+        on a request's event loop.
+        """
+        if not card or not card.get('id'):
+            return
+        if self._writer is None or not self._writer.is_alive():
+            with self._lock:
+                if self._writer is None or not self._writer.is_alive():
+                    self._writer = threading.Thread(target=self._drain, name='demand', daemon=True)
+                    self._writer.start()
+        self._queue.put((card, query, time.time()))
+
+    def _drain(self):
+        while True:
+            hits = [self._queue.get()]
+            # Fold whatever else is queued into the same transaction
+            while len(hits) < WRITE_BATCH:
+                try:
+                    hits.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.write(hits)
+            except sqlite3.Error as e:
+                print(f"Demand write error: {str(e)}")
+
+    def top(self, limit: int) -> List[Tuple[float, Dict, str]]:
+        """``(score, card, query)`` for the ``limit`` most demanded cards, highest first."""
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute('SELECT card_id, card, query, score, updated_at FROM demand').fetchall()
+            forgotten = [(card_id,) for card_id, _, _, score, updated_at in rows
+                         if self._decayed(score, updated_at, now) < DEMAND_MIN]
+            if forgotten:
+                self._conn.executemany('DELETE FROM demand WHERE card_id = ?', forgotten)
+                self._conn.commit()
+        scored = [(self._decayed(score, updated_at, now), card, query)
+                  for _, card, query, score, updated_at in rows]
+        scored = [row for row in scored if row[0] >= DEMAND_MIN]
+        scored.sort(key=lambda row: -row[0])
+        return [(score, json.loads(card), query) for score, card, query in scored[:limit]]
+
+
+demand = DemandTracker(REFRESH_DB_PATH)
+
+
+class Refresher:
+    def __init__(self, plans: Dict[str, RefreshPlan],
+                 resolve: Callable[[str], Awaitable[Optional[Dict]]],
+                 coalesce: Callable[[str, Callable[[], Awaitable]], Awaitable],
+                 tracker: DemandTracker = demand,
+                 budgets: Dict[str, float] = REFRESH_BUDGETS,
+                 hot_cards: int = REFRESH_HOT_CARDS,
+                 interval: float = REFRESH_INTERVAL,
+                 jitter: float = REFRESH_JITTER):
+        self.plans = plans
+        self.resolve = resolve          # query -> card metadata, for the featured cards
+        self.coalesce = coalesce        # (key, fetch) -> result, shared with /search
+        self.tracker = tracker
+        self.hot_cards = hot_cards
+        self.interval = interval
+        self.jitter = jitter
+        # Each bucket holds one pass worth of refreshes, refilled at the per-minute budget
+        self.budgets = {
+            source: TokenBucket(per_minute / 60.0, max(1.0, per_minute * interval / 60.0))
+            for source, per_minute in ((s, budgets.get(s, DEFAULT_BUDGET)) for s in plans)
+        }
+        self._counters = {source: {'refreshed': 0, 'failed': 0, 'over_budget': 0} for source in plans}
+        self._hot: List[Dict] = []
+        self._passes = 0
+        self._last_pass = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    # -- scheduling ---------------------------------------------------------
+
+    async def hot(self) -> List[Dict]:
+        """The cards to keep warm, highest priority first."""
+        entries = {}
+        for score, card, query in self.tracker.top(self.hot_cards):
+            entries[card['id']] = {'card': card, 'query': query, 'demand': score}
+        for featured in FEATURED_CARDS:
+            query = featured_query(featured)
+            card = await self.resolve(query)
+            if not card or not card.get('id'):
+                continue
+            entry = entries.setdefault(card['id'], {'card': card, 'query': query, 'demand': 0.0})
+            entry['demand'] = max(entry['demand'], FEATURED_FLOOR)
+
+        since = time.time() - REFRESH_VOLATILITY_WINDOW
+        for card_id, entry in entries.items():
+            volatility = await asyncio.to_thread(price_history.volatility, card_id, since)
+            entry['volatility'] = round(volatility, 4)
+            entry['priority'] = round(entry['demand'] * (1 + REFRESH_VOLATILITY_WEIGHT * min(volatility, 1.0)), 4)
+        return sorted(entries.values(), key=lambda e: -e['priority'])[:self.hot_cards]
+
+    def _due(self, source: str, key: str) -> bool:
+        age = result_cache.age(source, key)
+        if age is None:
+            return True
+        fresh_ttl, _ = result_cache.ttls[source]
+        # Jitter the threshold too, so entries stored together don't all come due together
+        return age >= fresh_ttl * REFRESH_AHEAD * random.uniform(1 - self.jitter, 1)
+
+    async def _refresh(self, source: str, key: str, fetch, delay: float):
+        await asyncio.sleep(delay)
+        try:
+            value = await self.coalesce(key, fetch)
+        except Exception as e:
+            print(f"Refresher: {source} refresh failed for {key}: {repr(e)}")
+            value = None
+        if value is None:
+            self._count(source, 'failed')
+            return
+        result_cache.set(source, key, value)
+        self._count(source, 'refreshed')
+
+    def _count(self, source: str, outcome: str):
+        with self._lock:
+            self._counters[source][outcome] += 1
+
+    async def refresh_pass(self) -> int:
+        """Refresh every due entry of the hot cards that fits the budgets; returns how many ran."""
+        hot = await self.hot()
+        refreshes = []
+        for entry in hot:
+            for source, plan in self.plans.items():
+                key, fetch = plan(entry['card'], entry['query'])
+                if not self._due(source, key):
+                    continue
+                if not self.budgets[source].try_acquire():
+                    self._count(source, 'over_budget')
+                    continue
+                # Spread the pass's refreshes over part of the interval instead of firing them at once
+                delay = random.uniform(0, self.interval * self.jitter)
+                refreshes.append(self._refresh(source, key, fetch, delay))
+        await asyncio.gather(*refreshes)
+        with self._lock:
+            self._hot = hot
+            self._passes += 1
+            self._last_pass = time.time()
+        return len(refreshes)
+
+    async def run_forever(self):
+        while True:
+            started = time.time()
+            try:
+                count = await self.refresh_pass()
+                if count:
+                    print(f"Refresher: refreshed {count} entries in {time.time() - started:.1f}s")
+            except Exception as e:
+                print(f"Refresher pass failed: {repr(e)}")
+            await asyncio.sleep(self.interval * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    def start(self):
+        """Run the refresher on a daemon thread with its own loop; a no-op once running."""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=lambda: asyncio.run(self.run_forever()),
+                                            name='refresher', daemon=True)
+            self._thread.start()
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {
+                'running': self._thread is not None and self._thread.is_alive(),
+                'passes': self._passes,
+                'last_pass': self._last_pass,
+                'sources': {source: dict(c) for source, c in self._counters.items()},
+                'hot': [
+                    {'card_id': e['card']['id'], 'name': e['card'].get('name'), 'demand': round(e['demand'], 3),
+                     'volatility': e['volatility'], 'priority': e['priority']}
+                    for e in self._hot
+                ],
+            }
+
+
+def main():
+    from app import REFRESH_PLANS, fetch_card_metadata_async, inflight
+
+    refresher = Refresher(REFRESH_PLANS, fetch_card_metadata_async, inflight.do)
+    print(f"Refresher: keeping the top {refresher.hot_cards} cards warm, a pass every ~{refresher.interval:.0f}s")
+    asyncio.run(refresher.run_forever())
+
+
+if __name__ == '__main__':
+    main()
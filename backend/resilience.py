@@ -0,0 +1,249 @@
+"""
+Per-source resilience for the upstream fetchers: circuit breakers, adaptive
+timeouts and hedged requests.
+
+Every upstream call (pokemontcg.io, eBay, and the StockX/TCGPlayer/PWCC
+agents) goes through its source's guard:
+
+- The timeout is about 1.5x the source's recent p95 latency, clamped to the
+  source's [min, max] from RESILIENCE_TIMEOUTS. The max is used until there
+  are enough samples. A hung page load is cancelled once it is clearly
+  slower than usual, instead of running out the agents' fixed
+  30s goto / 10s selector waits.
+- A circuit breaker trips when the error rate over the last
+  BREAKER_WINDOW seconds reaches BREAKER_ERROR_RATE (with at least
+  BREAKER_MIN_CALLS calls). While it is open, calls fail at once. After a
+  cooldown one probe is let through: success closes the breaker, and
+  failure re-opens it with a doubled cooldown.
+- Hedging (per source, RESILIENCE_HEDGE) starts a second attempt when the
+  first is slower than the recent p95, and takes whichever finishes first.
+  Hedges are capped at HEDGE_MAX_RATIO of calls, so a slow upstream can't
+  turn them into double load.
+
+A guarded call that can't produce a result raises SourceUnavailable with a
+reason. /search reports the reason under ``degraded_sources`` and carries on
+with the other sources.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+from config import (BREAKER_COOLDOWN, BREAKER_COOLDOWN_MAX, BREAKER_ERROR_RATE, BREAKER_MIN_CALLS,
+                    BREAKER_WINDOW, HEDGE_MAX_RATIO, RESILIENCE_HEDGE, RESILIENCE_TIMEOUTS)
+from metrics import source_requests
+
+LATENCY_SAMPLES = 100
+MIN_SAMPLES = 10        # latency samples needed before timeouts adapt and hedging starts
+TIMEOUT_FACTOR = 1.5    # timeout = p95 * this, clamped to the source's bounds
+
+class SourceUnavailable(Exception):
+    """A guarded source produced no result: 'circuit_open', 'timeout' or 'error'."""
+
+    def __init__(self, source: str, reason: str):
+        super().__init__(f"{source} unavailable ({reason})")
+        self.source = source
+        self.reason = reason
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, window: float = BREAKER_WINDOW, min_calls: int = BREAKER_MIN_CALLS,
+                 error_rate: float = BREAKER_ERROR_RATE, cooldown: float = BREAKER_COOLDOWN,
+                 cooldown_max: float = BREAKER_COOLDOWN_MAX):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.base_cooldown = cooldown
+        self.cooldown_max = cooldown_max
+        self.state = 'closed'
+        self.cooldown = cooldown
+        self.opened_at = 0.0
+        self.trips = 0
+        self._outcomes = deque()       # (time, ok)
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = 'half_open'
+            if self.state == 'half_open' and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record(self, ok: bool):
+        with self._lock:
+            now = time.monotonic()
+            if self.state == 'half_open' and self._probing:
+                self._probing = False
+                if ok:
+                    self.state, self.cooldown = 'closed', self.base_cooldown
+                    self._outcomes.clear()
+                else:
+                    self._open(now, min(self.cooldown * 2, self.cooldown_max))
+                return
+            self._outcomes.append((now, ok))
+            while self._outcomes and self._outcomes[0][0] < now - self.window:
+                self._outcomes.popleft()
+            calls = len(self._outcomes)
+            failures = sum(1 for _, success in self._outcomes if not success)
+            if self.state == 'closed' and calls >= self.min_calls and failures / calls >= self.error_rate:
+                self._open(now, self.base_cooldown)
+
+    def release(self):
+        """A probe was cancelled before it finished; let the next call probe instead."""
+        with self._lock:
+            self._probing = False
+
+    def _open(self, now: float, cooldown: float):
+        self.state, self.opened_at, self.cooldown = 'open', now, cooldown
+        self.trips += 1
+        print(f"Circuit breaker for {self.name} opened for {cooldown:.0f}s")
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            calls = len(self._outcomes)
+            failures = sum(1 for _, ok in self._outcomes if not ok)
+            return {
+                'state': self.state,
+                'calls': calls,
+                'error_rate': round(failures / calls, 3) if calls else 0.0,
+                'trips': self.trips,
+                'cooldown': self.cooldown,
+            }
+
+
+class SourceGuard:
+    def __init__(self, source: str, min_timeout: float, max_timeout: float, hedge: bool = False):
+        self.source = source
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.hedge = hedge
+        self.breaker = CircuitBreaker(source)
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._counters = {'calls': 0, 'ok': 0, 'errors': 0, 'timeouts': 0, 'short_circuited': 0, 'hedged': 0}
+        self._lock = threading.Lock()
+
+    def _count(self, outcome: str):
+        with self._lock:
+            self._counters[outcome] += 1
+
+    def _outcome(self, outcome: str):
+        source_requests.inc(source=self.source, outcome=outcome)
+
+    def p95(self) -> Optional[float]:
+        with self._lock:
+            if len(self._latencies) < MIN_SAMPLES:
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def timeout(self) -> float:
+        p95 = self.p95()
+        if p95 is None:
+            return self.max_timeout
+        return min(self.max_timeout, max(self.min_timeout, p95 * TIMEOUT_FACTOR))
+
+    def _may_hedge(self) -> bool:
+        with self._lock:
+            return self._counters['hedged'] < HEDGE_MAX_RATIO * max(1, self._counters['calls'])
+
+    async def _attempt(self, fetch):
+        """``await fetch()``, racing a second attempt against it if the first is slow."""
+        hedge_after = self.p95() if self.hedge else None
+        if hedge_after is None:
+            return await fetch()
+        attempts = {asyncio.ensure_future(fetch())}
+        try:
+            done, _ = await asyncio.wait(attempts, timeout=hedge_after)
+            if not done and self._may_hedge():
+                self._count('hedged')
+                attempts.add(asyncio.ensure_future(fetch()))
+            error = None
+            while attempts:
+                done, attempts = await asyncio.wait(attempts, return_when=asyncio.FIRST_COMPLETED)
+                for attempt in done:
+                    if attempt.exception() is None:
+                        return attempt.result()
+                    error = attempt.exception()
+            raise error
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+
+    async def call(self, fetch):
+        """Run ``await fetch()`` under the breaker, the adaptive timeout and hedging."""
+        self._count('calls')
+        if not self.breaker.allow():
+            self._count('short_circuited')
+            self._outcome('circuit_open')
+            raise SourceUnavailable(self.source, 'circuit_open')
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(self._attempt(fetch), self.timeout())
+        except asyncio.TimeoutError:
+            self._count('timeouts')
+            self._outcome('timeout')
+            self.breaker.record(False)
+            print(f"{self.source}: timed out after {time.monotonic() - started:.1f}s")
+            raise SourceUnavailable(self.source, 'timeout')
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        except Exception as e:
+            self._count('errors')
+            self._outcome('error')
+            self.breaker.record(False)
+            print(f"{self.source}: upstream error: {repr(e)}")
+            raise SourceUnavailable(self.source, 'error') from e
+
+        # None is an answer (nothing listed), not a failure: only errors and timeouts trip the breaker
+        self.breaker.record(True)
+        self._outcome('ok' if result is not None else 'empty')
+        self._count('ok')
+        with self._lock:
+            self._latencies.append(time.monotonic() - started)
+        return result
+
+    def status(self) -> Dict:
+        p95 = self.p95()
+        with self._lock:
+            counters = dict(self._counters)
+        return {
+            **counters,
+            'breaker': self.breaker.snapshot(),
+            'p95_ms': round(p95 * 1000) if p95 is not None else None,
+            'timeout_s': round(self.timeout(), 2),
+            'hedge': self.hedge,
+        }
+
+
+class Resilience:
+    def __init__(self, timeouts=RESILIENCE_TIMEOUTS, hedge=RESILIENCE_HEDGE):
+        self.timeouts = timeouts
+        self.hedge = hedge
+        self.guards = {
+            source: SourceGuard(source, low, high, source in hedge)
+            for source, (low, high) in timeouts.items()
+        }
+
+    def add(self, source: str, timeout: Tuple[float, float]) -> SourceGuard:
+        """Guard a new source (a registered agent). Bounds in RESILIENCE_TIMEOUTS take precedence."""
+        low, high = self.timeouts.get(source, timeout)
+        guard = self.guards[source] = SourceGuard(source, low, high, source in self.hedge)
+        return guard
+
+    async def call(self, source: str, fetch):
+        return await self.guards[source].call(fetch)
+
+    def status(self) -> Dict[str, Dict]:
+        return {source: guard.status() for source, guard in self.guards.items()}
+
+
+resilience = Resilience()
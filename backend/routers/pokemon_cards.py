@@ -1,40 +1,88 @@
 """
 Pokemon Cards Category Router.
-Blueprint for /products endpoints serving seeded product data.
+Blueprint for /products endpoints serving the indexed product store.
+
+List endpoints are paginated with an opaque cursor and take filters
+(category, company, grade, set, min_price, max_price), a sort (id, name,
+price, -price) and sparse fields (``fields=name,best_price``).
+
+The catalog only changes on restart, so responses are serialized once per
+URL and reused, with an ETag, a Last-Modified from the products'
+``updated_at`` and a PRODUCTS_MAX_AGE Cache-Control.
 """
 
-from flask import Blueprint, jsonify
-from seed_data import get_all_products, get_product_by_id, get_products_by_category
+from flask import Blueprint, jsonify, request
+from config import PRODUCTS_MAX_AGE, PRODUCTS_PAGE_SIZE
+from http_cache import ResponseCache, cache_control, flask_response, iso_timestamp, prepare
+from product_store import FILTERS, product_store
 
 pokemon_cards_bp = Blueprint('pokemon_cards', __name__, url_prefix='/products')
 
+# Prepared responses by path and query string
+responses = ResponseCache()
+
+
+def _last_modified(product_ids):
+    stamps = [iso_timestamp(product_store.get(product_id).get('updated_at')) for product_id in product_ids]
+    return max(filter(None, stamps), default=None)
+
+
+def _cached_response(build):
+    """Serve the request's prepared response, building it on the first hit; 400 on bad parameters."""
+    key = f"{request.path}?{'&'.join(sorted(f'{k}={v}' for k, v in request.args.items(multi=True)))}"
+    try:
+        prepared = responses.get_or_prepare(key, build)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return flask_response(prepared)
+
+
+def _list_response(category=None):
+    """A page of products for the request's query string."""
+    args = request.args
+
+    def build():
+        filters = {name: args.get(name) for name in FILTERS if args.get(name)}
+        if category is not None:
+            filters['category'] = category
+        page = product_store.query(
+            filters,
+            sort=args.get('sort', 'id'),
+            cursor=args.get('cursor'),
+            limit=int(args.get('limit', PRODUCTS_PAGE_SIZE)),
+            fields=product_store.parse_fields(args.get('fields')),
+            min_price=float(args['min_price']) if args.get('min_price') else None,
+            max_price=float(args['max_price']) if args.get('max_price') else None,
+        )
+        return prepare({**page, "category": category or "pokemon_cards"}, cache_control(PRODUCTS_MAX_AGE),
+                       _last_modified(p['id'] for p in page['products']))
+
+    return _cached_response(build)
+
 
 @pokemon_cards_bp.route('/', methods=['GET'])
 def list_products():
-    """Return all seeded products."""
-    products = get_all_products()
-    return jsonify({
-        "products": products,
-        "total": len(products),
-        "category": "pokemon_cards"
-    })
+    """Return a page of products."""
+    return _list_response()
+
+
+@pokemon_cards_bp.route('/facets', methods=['GET'])
+def list_facets():
+    """Return the values each /products filter can take."""
+    return _cached_response(lambda: prepare({"facets": product_store.facets()}, cache_control(PRODUCTS_MAX_AGE)))
 
 
 @pokemon_cards_bp.route('/<product_id>', methods=['GET'])
 def get_product(product_id):
     """Return a single product by ID."""
-    product = get_product_by_id(product_id)
+    product = product_store.get(product_id)
     if not product:
         return jsonify({"error": f"Product '{product_id}' not found"}), 404
-    return jsonify({"product": product})
+    return _cached_response(lambda: prepare({"product": product}, cache_control(PRODUCTS_MAX_AGE),
+                                            iso_timestamp(product.get('updated_at'))))
 
 
 @pokemon_cards_bp.route('/category/<category>', methods=['GET'])
 def list_by_category(category):
-    """Return products filtered by category (e.g., graded, raw, sealed)."""
-    products = get_products_by_category(category)
-    return jsonify({
-        "products": products,
-        "total": len(products),
-        "category": category
-    })
+    """Return a page of products in a category (e.g., graded, raw, sealed)."""
+    return _list_response(category)
@@ -0,0 +1,376 @@
+"""
+Bulk watchlist scanner: arbitrage sweeps over thousands of cards.
+
+    python scanner.py watchlist.txt [--workers 32] [--scan-id ID] [--every 15]
+
+The same pipeline is exposed as a job API (POST /scan). Each card runs the
+/search pipeline (metadata, eBay, the scraped sources, then
+normalize_and_calculate_arbitrage) on one of a fixed pool of workers. Every
+upstream call passes a per-source semaphore and a per-host token bucket, so
+adding workers raises throughput until the source limits are reached
+instead of flooding any one site.
+
+A scan lives in SCAN_DIR/<scan_id>/:
+
+    watchlist.json   the cards to scan
+    partial.ndjson   listing lines plus one "done" line per card, appended as cards finish
+    results.ndjson   every listing, sorted by deal_score, written when the scan completes
+    state.json       status and progress counters
+
+partial.ndjson doubles as the checkpoint: running a scan id again skips the
+cards that already have a "done" line.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from cache import normalize_query, result_cache
+from agents import registry
+from catalog import card_catalog
+from config import HOST_RATE_LIMITS, SCAN_CONCURRENCY, SCAN_DIR, SCAN_WORKERS, SOURCE_HOSTS
+from price_history import price_history
+from ratelimit import HostRateLimiter
+
+SCAN_ID_PATTERN = re.compile(r'^[A-Za-z0-9_\-]{1,64}$')
+STATE_EVERY = 1.0   # seconds between state.json writes while running
+
+# One limiter per process, so concurrent scans share each host's budget
+host_limiter = HostRateLimiter(HOST_RATE_LIMITS)
+
+
+def source_limits(source: str) -> Tuple[str, int]:
+    """(host, scan concurrency) for a source; agents missing from config use their own declarations."""
+    if source in SOURCE_HOSTS:
+        return SOURCE_HOSTS[source], SCAN_CONCURRENCY[source]
+    agent = registry.get(source)
+    return agent.host, agent.concurrency
+
+
+def new_scan_id() -> str:
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{secrets.token_hex(3)}"
+
+
+def scan_path(scan_id: str, name: str = '') -> str:
+    if not SCAN_ID_PATTERN.match(scan_id):
+        raise ValueError(f"Invalid scan id: {scan_id!r}")
+    return os.path.join(SCAN_DIR, scan_id, name)
+
+
+def load_watchlist(path: str) -> List[str]:
+    """Card queries from a JSON list or a text file with one card per line (# comments)."""
+    with open(path) as f:
+        if path.endswith('.json'):
+            cards = json.load(f)
+        else:
+            cards = [line.split('#', 1)[0].strip() for line in f]
+    return dedupe(cards)
+
+
+def dedupe(cards: List[str]) -> List[str]:
+    seen = set()
+    out = []
+    for card in cards:
+        key = normalize_query(str(card))
+        if key and key not in seen:
+            seen.add(key)
+            out.append(str(card).strip())
+    return out
+
+
+def read_state(scan_id: str) -> Optional[Dict]:
+    try:
+        with open(scan_path(scan_id, 'state.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path: str, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+class Scanner:
+    """
+    One scan job. ``fetchers`` maps 'metadata' and 'ebay' (called with the
+    query) and each scraped source (called with the card metadata) to the
+    same coroutines /search uses; ``analyze`` is normalize_and_calculate_arbitrage.
+    """
+
+    def __init__(self, scan_id: str, fetchers: Dict[str, Callable], analyze: Callable,
+                 workers: int = SCAN_WORKERS, limiter: HostRateLimiter = host_limiter):
+        self.scan_id = scan_id
+        self.fetchers = fetchers
+        self.analyze = analyze
+        self.workers = max(1, workers)
+        self.limiter = limiter
+        self.dir = scan_path(scan_id)
+        self.partial_path = os.path.join(self.dir, 'partial.ndjson')
+        self.results_path = os.path.join(self.dir, 'results.ndjson')
+        self.state = {}
+        self._state_written = 0.0
+
+    # -- setup / checkpoint -------------------------------------------------
+
+    def prepare(self, cards: Optional[List[str]] = None) -> List[str]:
+        """Create the scan directory (or reopen it) and return the cards still to scan."""
+        os.makedirs(self.dir, exist_ok=True)
+        watchlist_path = os.path.join(self.dir, 'watchlist.json')
+        if cards is None:
+            with open(watchlist_path) as f:
+                cards = json.load(f)
+        else:
+            _write_json(watchlist_path, cards)
+
+        done, counters = self._recover()
+        self.state = read_state(self.scan_id) or {}
+        self.state.update(counters)
+        self.state.update({
+            'scan_id': self.scan_id,
+            'status': 'running',
+            'total': len(cards),
+            'done': len(done),
+            'started_at': self.state.get('started_at', time.time()),
+            'updated_at': time.time(),
+            'workers': self.workers,
+        })
+        self.state.pop('error', None)
+        self._flush_state(force=True)
+        return [card for card in cards if normalize_query(card) not in done]
+
+    def _recover(self) -> Tuple[set, Dict[str, int]]:
+        """
+        Cards with a "done" line and the counters they add up to; listing
+        lines written after the last "done" line are dropped.
+        """
+        done = set()
+        counters = {'listings': 0, 'opportunities': 0, 'not_found': 0, 'errors': 0}
+        if not os.path.exists(self.partial_path):
+            return done, counters
+        keep = 0
+        with open(self.partial_path, 'rb') as f:
+            for line in f:
+                if line.startswith(b'{"done"') and line.endswith(b'\n'):
+                    result = json.loads(line)
+                    done.add(normalize_query(result['done']))
+                    self._count(counters, result)
+                    keep = f.tell()
+        with open(self.partial_path, 'r+b') as f:
+            f.truncate(keep)
+        return done, counters
+
+    @staticmethod
+    def _count(counters: Dict, result: Dict):
+        counters['listings'] += result['listings']
+        counters['opportunities'] += result.get('opportunities', 0)
+        if 'error' in result:
+            counters['errors'] += 1
+        elif result['card'] is None:
+            counters['not_found'] += 1
+
+    def _flush_state(self, force: bool = False):
+        now = time.time()
+        if force or now - self._state_written >= STATE_EVERY:
+            self.state['updated_at'] = now
+            _write_json(os.path.join(self.dir, 'state.json'), self.state)
+            self._state_written = now
+
+    # -- pipeline -----------------------------------------------------------
+
+    async def _call(self, source: str, arg):
+        # A fresh cache entry (say, on a resumed scan) costs no upstream call, so it
+        # skips the source's semaphore and host token bucket
+        key = result_cache.card_key(source, arg) if isinstance(arg, dict) else result_cache.make_key(source, arg)
+        cached = result_cache.peek(source, key)
+        if cached is not None:
+            return cached
+        async with self._semaphores[source]:
+            await self.limiter.acquire(source_limits(source)[0])
+            return await self.fetchers[source](arg)
+
+    async def scan_card(self, query: str) -> Dict:
+        """Run one card through the pipeline; returns the lines to append for it."""
+        # The local catalog needs no upstream call, so skip the gate when it resolves
+        metadata = card_catalog.resolve(query) or await self._call('metadata', query)
+        if not metadata:
+            return {'done': query, 'card': None, 'listings': 0}
+
+        agents = [source for source in self.fetchers if source not in ('metadata', 'ebay')]
+        results = await asyncio.gather(
+            self._call('ebay', query),
+            *(self._call(source, metadata) for source in agents),
+            return_exceptions=True,
+        )
+        failed = [source for source, r in zip(['ebay'] + agents, results) if isinstance(r, BaseException)]
+        for source in failed:
+            print(f"Scan {self.scan_id}: {source} failed for {query!r}")
+        ebay, *scraped = [None if isinstance(r, BaseException) else r for r in results]
+
+        listings, market_stats, comparison_data = self.analyze(ebay or [], dict(zip(agents, scraped)))
+        price_history.record(metadata.get('id'), listings, comparison_data)
+        card = {k: metadata.get(k) for k in ('id', 'name', 'set_name', 'number')}
+        return {
+            'done': query,
+            'card': card,
+            'listings': [dict(listing, query=query, card=card) for listing in listings],
+            'market_stats': market_stats,
+            'comparison_data': comparison_data,
+            'failed_sources': failed,
+        }
+
+    async def _worker(self, queue: asyncio.Queue, out):
+        while True:
+            try:
+                query = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                result = await self.scan_card(query)
+            except Exception as e:
+                print(f"Scan {self.scan_id}: error scanning {query!r}: {repr(e)}")
+                result = {'done': query, 'card': None, 'listings': 0, 'error': repr(e)}
+
+            listings = result['listings'] if isinstance(result['listings'], list) else []
+            result['listings'] = len(listings)
+            result['opportunities'] = sum(1 for l in listings if l.get('arbitrage_opportunity'))
+            # Listings first and the "done" line last, in one write: a crash
+            # mid-card leaves no done line, so the card is rescanned on resume
+            out.write(''.join(json.dumps(line) + '\n' for line in listings) + json.dumps(result) + '\n')
+            out.flush()
+
+            self.state['done'] += 1
+            self._count(self.state, result)
+            self._flush_state()
+
+    async def run(self, cards: Optional[List[str]] = None) -> Dict:
+        """Scan ``cards`` (or resume the stored watchlist) and write the sorted results."""
+        pending = self.prepare(cards)
+        self._semaphores = {source: asyncio.Semaphore(source_limits(source)[1]) for source in self.fetchers}
+        queue = asyncio.Queue()
+        for query in pending:
+            queue.put_nowait(query)
+
+        print(f"Scan {self.scan_id}: {len(pending)} of {self.state['total']} cards to scan, {self.workers} workers")
+        try:
+            with open(self.partial_path, 'a') as out:
+                await asyncio.gather(*(self._worker(queue, out) for _ in range(min(self.workers, len(pending)))))
+            self.state['results'] = self.write_sorted_results()
+            self.state['status'] = 'completed'
+        except BaseException as e:
+            self.state['status'] = 'failed' if isinstance(e, Exception) else 'interrupted'
+            self.state['error'] = repr(e)
+            raise
+        finally:
+            self._flush_state(force=True)
+        return self.state
+
+    # -- results ------------------------------------------------------------
+
+    def write_sorted_results(self) -> int:
+        """Copy every listing line of partial.ndjson into results.ndjson, best deal first."""
+        index = []
+        with open(self.partial_path, 'rb') as f:
+            offset = 0
+            for line in f:
+                if not line.startswith(b'{"done"'):
+                    listing = json.loads(line)
+                    index.append((-listing.get('deal_score', 0), listing.get('price', 0), offset, len(line)))
+                offset += len(line)
+        index.sort()
+
+        tmp = f"{self.results_path}.tmp"
+        with open(self.partial_path, 'rb') as src, open(tmp, 'wb') as dst:
+            for _, _, offset, length in index:
+                src.seek(offset)
+                dst.write(src.read(length))
+        os.replace(tmp, self.results_path)
+        return len(index)
+
+
+def run_scan(scanner: Scanner, cards: Optional[List[str]] = None) -> Dict:
+    """Run a scan on a fresh event loop in the calling thread."""
+    async def main():
+        # The eBay/TCG SDKs run via asyncio.to_thread; size the executor for the source limits
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(sum(SCAN_CONCURRENCY.values())))
+        return await scanner.run(cards)
+    return asyncio.run(main())
+
+
+class ScanJobs:
+    """Background scan jobs for the /scan API, one thread each."""
+
+    def __init__(self, fetchers: Dict[str, Callable], analyze: Callable):
+        self.fetchers = fetchers
+        self.analyze = analyze
+        self._threads: Dict[str, threading.Thread] = {}
+        self._lock = threading.Lock()
+
+    def running(self, scan_id: str) -> bool:
+        thread = self._threads.get(scan_id)
+        return thread is not None and thread.is_alive()
+
+    def start(self, cards: Optional[List[str]] = None, scan_id: Optional[str] = None,
+              workers: int = SCAN_WORKERS) -> str:
+        """Start a scan of ``cards``, or resume ``scan_id`` from its checkpoint when ``cards`` is None."""
+        scan_id = scan_id or new_scan_id()
+        scan_path(scan_id)  # validates the id
+        if cards is None and not os.path.exists(scan_path(scan_id, 'watchlist.json')):
+            raise KeyError(scan_id)
+        with self._lock:
+            if self.running(scan_id):
+                raise RuntimeError(f"Scan {scan_id} is already running")
+            scanner = Scanner(scan_id, self.fetchers, self.analyze, workers)
+
+            def target():
+                try:
+                    run_scan(scanner, cards)
+                except Exception as e:
+                    print(f"Scan {scan_id} failed: {repr(e)}")
+
+            thread = threading.Thread(target=target, name=f'scan-{scan_id}', daemon=True)
+            self._threads[scan_id] = thread
+            thread.start()
+        return scan_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sweep a watchlist of cards for arbitrage.')
+    parser.add_argument('watchlist', nargs='?', help='.txt (one card per line) or .json list; omit to resume --scan-id')
+    parser.add_argument('--workers', type=int, default=SCAN_WORKERS)
+    parser.add_argument('--scan-id', help='resume this scan, or name a new one')
+    parser.add_argument('--every', type=float, help='repeat the sweep every N minutes with a new scan id')
+    args = parser.parse_args()
+    if not args.watchlist and not args.scan_id:
+        parser.error('a watchlist or --scan-id is required')
+
+    from app import SCRAPED_SOURCES, fetch_card_metadata_async, fetch_ebay_listings_async, \
+        normalize_and_calculate_arbitrage
+    fetchers = {'metadata': fetch_card_metadata_async, 'ebay': fetch_ebay_listings_async, **SCRAPED_SOURCES}
+
+    scan_id = args.scan_id
+    while True:
+        started = time.time()
+        cards = load_watchlist(args.watchlist) if args.watchlist else None
+        scanner = Scanner(scan_id or new_scan_id(), fetchers, normalize_and_calculate_arbitrage, args.workers)
+        state = run_scan(scanner, cards)
+        elapsed = time.time() - started
+        print(f"Scan {scanner.scan_id}: {state['done']} cards, {state['listings']} listings, "
+              f"{state['opportunities']} arbitrage opportunities in {elapsed:.1f}s -> {scanner.results_path}")
+        if not args.every:
+            break
+        scan_id = None
+        time.sleep(max(0.0, args.every * 60 - elapsed))
+
+
+if __name__ == '__main__':
+    main()
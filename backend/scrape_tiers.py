@@ -0,0 +1,97 @@
+"""
+Tiered scraping: a plain HTTP fetch first, the browser only when it fails.
+
+Each agent has two ways to get its values. The HTTP tier (http_pool) is one
+or two requests and an HTML parse. The browser tier (browser_pool) is a full
+Chromium page. ``tiers.run()`` tries the HTTP tier, and escalates to the
+browser when the HTTP tier raises or returns nothing usable.
+
+Sites differ in how much they render on the server, and a site can start
+serving bot checks at any time. So the outcome of every HTTP attempt is
+kept per site over the last HTTP_TIER_WINDOW attempts. Once fewer than
+HTTP_TIER_MIN_SUCCESS of them succeed, that site goes straight to the
+browser, except for HTTP_TIER_PROBE of its scrapes, which keep trying the
+cheap path so it is picked up again when it starts working. Outcomes per
+tier are also counted in ``pokeagg_scrape_attempts_total``.
+"""
+
+import random
+import threading
+from collections import defaultdict, deque
+from typing import Awaitable, Callable, Dict, Optional
+
+from config import HTTP_TIER_MIN_SUCCESS, HTTP_TIER_PROBE, HTTP_TIER_WINDOW, SCRAPE_HTTP_TIER
+from metrics import scrape_attempts
+
+# Attempts before a site's success rate is trusted
+MIN_ATTEMPTS = 5
+
+
+class ScrapeTiers:
+    def __init__(self, enabled: bool = SCRAPE_HTTP_TIER, min_success: float = HTTP_TIER_MIN_SUCCESS,
+                 probe: float = HTTP_TIER_PROBE, window: int = HTTP_TIER_WINDOW):
+        self.enabled = enabled
+        self.min_success = min_success
+        self.probe = probe
+        self._outcomes = defaultdict(lambda: deque(maxlen=window))
+        self._counts = defaultdict(lambda: {'http_ok': 0, 'http_failed': 0, 'browser': 0, 'skipped_http': 0})
+        self._lock = threading.Lock()
+
+    def success_rate(self, source: str) -> Optional[float]:
+        """Share of the site's recent HTTP attempts that succeeded; None until there are enough."""
+        with self._lock:
+            outcomes = list(self._outcomes[source])
+        if len(outcomes) < MIN_ATTEMPTS:
+            return None
+        return sum(outcomes) / len(outcomes)
+
+    def use_http(self, source: str) -> bool:
+        if not self.enabled:
+            return False
+        rate = self.success_rate(source)
+        return rate is None or rate >= self.min_success or random.random() < self.probe
+
+    def _record(self, source: str, tier: str, ok: bool):
+        scrape_attempts.inc(source=source, tier=tier, outcome='ok' if ok else 'failed')
+        if tier == 'http':
+            with self._lock:
+                self._outcomes[source].append(ok)
+                self._counts[source]['http_ok' if ok else 'http_failed'] += 1
+
+    async def run(self, source: str, http: Callable[[], Awaitable], browser: Callable[[], Awaitable],
+                  ok: Callable[[Optional[Dict]], bool]) -> Optional[Dict]:
+        """The HTTP tier's result when ``ok`` accepts it, else the browser tier's; browser errors propagate."""
+        if self.use_http(source):
+            try:
+                result = await http()
+            except Exception as e:
+                print(f"Scrape tiers: {source} HTTP tier failed: {repr(e)}")
+                result = None
+            self._record(source, 'http', ok(result))
+            if ok(result):
+                return result
+        else:
+            with self._lock:
+                self._counts[source]['skipped_http'] += 1
+
+        with self._lock:
+            self._counts[source]['browser'] += 1
+        try:
+            result = await browser()
+        except Exception:
+            self._record(source, 'browser', False)
+            raise
+        self._record(source, 'browser', ok(result))
+        return result
+
+    def status(self) -> Dict:
+        with self._lock:
+            sources = {source: dict(counts) for source, counts in self._counts.items()}
+        for source, counts in sources.items():
+            rate = self.success_rate(source)
+            counts['http_success_rate'] = round(rate, 3) if rate is not None else None
+            counts['prefers'] = 'http' if self.enabled and (rate is None or rate >= self.min_success) else 'browser'
+        return {'http_tier': self.enabled, 'min_success': self.min_success, 'sources': sources}
+
+
+tiers = ScrapeTiers()
@@ -327,20 +327,13 @@ PRODUCTS = [
     }
 ]
 
+# Homepage cards; the refresher keeps these warm even before anyone searches for them
+FEATURED_CARDS = [
+    {"name": "Charizard", "set": "Base Set", "image": "https://images.pokemontcg.io/base1/4_hires.png"},
+    {"name": "Pikachu", "set": "Base Set", "image": "https://images.pokemontcg.io/base1/58_hires.png"},
+    {"name": "Mewtwo", "set": "Base Set", "image": "https://images.pokemontcg.io/base1/10_hires.png"},
+    {"name": "Blastoise", "set": "Base Set", "image": "https://images.pokemontcg.io/base1/2_hires.png"},
+    {"name": "Venusaur", "set": "Base Set", "image": "https://images.pokemontcg.io/base1/15_hires.png"},
+    {"name": "Gyarados", "set": "Base Set", "image": "https://images.pokemontcg.io/base1/6_hires.png"},
+]
 
-def get_all_products():
-    """Return all seeded products."""
-    return PRODUCTS
-
-
-def get_product_by_id(product_id: str):
-    """Return a single product by its ID."""
-    for product in PRODUCTS:
-        if product["id"] == product_id:
-            return product
-    return None
-
-
-def get_products_by_category(category: str):
-    """Return products filtered by category."""
-    return [p for p in PRODUCTS if p["category"].lower() == category.lower()]
@@ -0,0 +1,69 @@
+"""
+Request coalescing ("single-flight") for upstream fetches.
+
+Concurrent calls with the same key share one in-flight call: the first
+caller runs it and everyone else awaits its result. Flights are tracked
+with thread-safe futures so callers on different event loops (one per
+request under WSGI) still coalesce.
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+from typing import Dict
+
+
+class _LeaderCancelled(Exception):
+    """The caller running a flight was cancelled before it finished."""
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, concurrent.futures.Future] = {}
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def _join(self, key: str):
+        """Return ``(future, is_leader)`` for ``key``."""
+        with self._lock:
+            fut = self._calls.get(key)
+            if fut is not None:
+                return fut, False
+            fut = concurrent.futures.Future()
+            # A running future can't be cancelled by one impatient follower
+            fut.set_running_or_notify_cancel()
+            self._calls[key] = fut
+            return fut, True
+
+    def _forget(self, key: str, fut: concurrent.futures.Future):
+        with self._lock:
+            if self._calls.get(key) is fut:
+                del self._calls[key]
+
+    async def do(self, key: str, fn):
+        """Run ``await fn()`` once for all concurrent callers with ``key``."""
+        while True:
+            fut, leader = self._join(key)
+            if not leader:
+                try:
+                    return await asyncio.wrap_future(fut)
+                except _LeaderCancelled:
+                    # The leader went away; retry and possibly lead ourselves
+                    continue
+
+            try:
+                result = await fn()
+            except asyncio.CancelledError:
+                self._forget(key, fut)
+                fut.set_exception(_LeaderCancelled())
+                raise
+            except BaseException as e:
+                self._forget(key, fut)
+                fut.set_exception(e)
+                raise
+            self._forget(key, fut)
+            fut.set_result(result)
+            return result
@@ -1,86 +1,191 @@
 import asyncio
-from playwright.async_api import async_playwright
-from playwright_stealth import stealth
-import random
+from agents import ScrapeFailed, SourceAgent, registry
+from browser_pool import browser_pool
+from config import CACHE_TTLS, RESILIENCE_TIMEOUTS, STOCKX_BASE_URL
+from http_pool import http_pool
+from page_policy import PageLoader, find_number
+from product_urls import product_urls, url_key
+from scrape_tiers import tiers
 
-async def get_stockx_data(card_name, set_name, grade):
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        
-        # User agents to rotate
-        user_agents = [
-            'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36',
-            'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-        ]
-        
-        context = await browser.new_context(user_agent=random.choice(user_agents))
-        page = await context.new_page()
-        await stealth(page)
-        
-        # Construct search query
-        search_query = f"{card_name} {set_name} {grade}"
-        search_url = f"https://stockx.com/search?s={search_query.replace(' ', '+')}"
-        
-        try:
-            print(f"StockX Agent: Navigating to {search_url}")
-            await page.goto(search_url, wait_until="networkidle", timeout=30000)
-            
-            # Find the first product link
-            # StockX search results usually have product cards with links
-            product_selector = 'a[data-testid="product-card-link"]'
-            await page.wait_for_selector(product_selector, timeout=10000)
-            
-            product_link = await page.query_selector(product_selector)
-            if not product_link:
-                print("StockX Agent: No product found.")
-                return None
-                
-            href = await product_link.get_attribute('href')
-            product_url = f"https://stockx.com{href}"
-            
-            print(f"StockX Agent: Found product page: {product_url}")
-            await page.goto(product_url, wait_until="networkidle", timeout=30000)
-            
-            # Extract data
-            # Selectors might need adjustment as StockX changes frequently
-            last_sale = 0.0
-            lowest_ask = 0.0
-            highest_bid = 0.0
-            
-            # Example selectors (subject to change)
+# User agents to rotate
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+]
+
+# Market fields in the product page's embedded Next.js data
+MARKET_KEYS = {
+    'lowest_ask': ('lowestAsk', 'lowestAskAmount'),
+    'last_sale': ('lastSale', 'lastSaleAmount'),
+    'highest_bid': ('highestBid', 'highestBidAmount'),
+}
+PRODUCT_SELECTOR = 'a[data-testid="product-card-link"]'
+VALUE_SELECTORS = {
+    'lowest_ask': '.pdp-main-market-data__lowest-ask-value',
+    'last_sale': '.pdp-main-market-data__last-sale-value',
+    'highest_bid': '.pdp-main-market-data__highest-bid-value',
+}
+
+
+def market_result(values, product_url):
+    return {
+        "source": "StockX",
+        "type": "Market Ticker",
+        "lowest_ask": values['lowest_ask'],
+        "last_sale": values['last_sale'],
+        "highest_bid": values['highest_bid'],
+        "url": product_url
+    }
+
+
+async def read_product_page(page, loader, product_url):
+    """Market data from a product page: embedded JSON first, DOM as the fallback."""
+    await loader.goto(product_url)
+    if loader.last_status and loader.last_status >= 400:
+        return None
+
+    values = dict.fromkeys(MARKET_KEYS, 0.0)
+    data = await loader.next_data()
+    if data:
+        values = {field: find_number(data, keys) for field, keys in MARKET_KEYS.items()}
+
+    if not any(values.values()):
+        # The market data block renders together, so one selector covers all three values
+        await loader.wait('.pdp-main-market-data__lowest-ask-value', required=False)
+
+        # Extract data
+        # Selectors might need adjustment as StockX changes frequently
+        # Example selectors (subject to change)
+        with loader.extract():
             try:
-                last_sale_text = await page.inner_text('.pdp-main-market-data__last-sale-value', timeout=5000)
-                last_sale = float(last_sale_text.replace('$', '').replace(',', ''))
+                last_sale_text = await page.inner_text('.pdp-main-market-data__last-sale-value', timeout=1000)
+                values['last_sale'] = float(last_sale_text.replace('$', '').replace(',', ''))
             except:
                 pass
-                
+
             try:
-                lowest_ask_text = await page.inner_text('.pdp-main-market-data__lowest-ask-value', timeout=5000)
-                lowest_ask = float(lowest_ask_text.replace('$', '').replace(',', ''))
+                lowest_ask_text = await page.inner_text('.pdp-main-market-data__lowest-ask-value', timeout=1000)
+                values['lowest_ask'] = float(lowest_ask_text.replace('$', '').replace(',', ''))
             except:
                 pass
-                
+
             try:
-                highest_bid_text = await page.inner_text('.pdp-main-market-data__highest-bid-value', timeout=5000)
-                highest_bid = float(highest_bid_text.replace('$', '').replace(',', ''))
+                highest_bid_text = await page.inner_text('.pdp-main-market-data__highest-bid-value', timeout=1000)
+                values['highest_bid'] = float(highest_bid_text.replace('$', '').replace(',', ''))
             except:
                 pass
-            
-            return {
-                "source": "StockX",
-                "type": "Market Ticker",
-                "lowest_ask": lowest_ask,
-                "last_sale": last_sale,
-                "highest_bid": highest_bid,
-                "url": product_url
-            }
-            
-        except Exception as e:
-            print(f"StockX Agent Error: {str(e)}")
+
+    return market_result(values, product_url)
+
+
+async def read_product_html(loader, product_url):
+    """Market data from a product page fetched over plain HTTP."""
+    page = await loader.get(product_url)
+    if page is None:
+        return None
+    with loader.extract():
+        values = dict.fromkeys(MARKET_KEYS, 0.0)
+        data = page.next_data()
+        if data:
+            values = {field: find_number(data, keys) for field, keys in MARKET_KEYS.items()}
+        if not any(values.values()):
+            values = {field: page.select_price(selector) for field, selector in VALUE_SELECTORS.items()}
+    return market_result(values, product_url)
+
+
+def has_prices(result):
+    return bool(result and (result['lowest_ask'] or result['last_sale'] or result['highest_bid']))
+
+
+async def get_stockx_data(card_name, set_name, grade):
+    # Construct search query
+    search_query = f"{card_name} {set_name} {grade}"
+    search_url = f"{STOCKX_BASE_URL}/search?s={search_query.replace(' ', '+')}"
+    key = url_key(card_name, set_name, grade)
+
+    async def scrape_http(loader):
+        mapped_url = product_urls.get('stockx', key)
+        if mapped_url:
+            result = await read_product_html(loader, mapped_url)
+            if has_prices(result):
+                product_urls.confirm('stockx', key)
+                loader.succeeded()
+                return result
+            if loader.last_status in (404, 410):
+                product_urls.invalidate('stockx', key, gone=True)
+
+        search = await loader.get(search_url)
+        href = search.select_attr(PRODUCT_SELECTOR, 'href') if search else None
+        if not href:
             return None
-        finally:
-            await browser.close()
+        product_url = f"{STOCKX_BASE_URL}{href}"
+        result = await read_product_html(loader, product_url)
+        if not has_prices(result):
+            return None
+        if product_url != mapped_url:
+            product_urls.learn('stockx', key, product_url)
+        loader.succeeded()
+        return result
+
+    async def scrape(page):
+        async with PageLoader(page, 'StockX') as loader:
+            # Fast path: a known product page, no search navigation
+            mapped_url = product_urls.get('stockx', key)
+            if mapped_url:
+                print(f"StockX Agent: Using known product page: {mapped_url}")
+                result = await read_product_page(page, loader, mapped_url)
+                if has_prices(result):
+                    product_urls.confirm('stockx', key)
+                    loader.succeeded()
+                    return result
+                product_urls.invalidate('stockx', key, gone=loader.last_status in (404, 410))
+
+            print(f"StockX Agent: Navigating to {search_url}")
+
+            # Find the first product link
+            # StockX search results usually have product cards with links
+            await loader.goto(search_url, wait_for=PRODUCT_SELECTOR, required=False)
+            if loader.last_status and loader.last_status >= 400:
+                raise ScrapeFailed(f"StockX search answered {loader.last_status}")
+
+            product_link = await page.query_selector(PRODUCT_SELECTOR)
+            if not product_link:
+                print("StockX Agent: No product found.")
+                return None
+
+            href = await product_link.get_attribute('href')
+            product_url = f"{STOCKX_BASE_URL}{href}"
+
+            print(f"StockX Agent: Found product page: {product_url}")
+            result = await read_product_page(page, loader, product_url)
+            if result is None:
+                raise ScrapeFailed(f"StockX product page answered {loader.last_status}")
+            if product_url != mapped_url:
+                product_urls.learn('stockx', key, product_url)
+            if has_prices(result):
+                loader.succeeded()
+            return result
+
+    return await tiers.run('stockx', lambda: http_pool.run(scrape_http, 'StockX', USER_AGENTS),
+                           lambda: browser_pool.run(scrape, USER_AGENTS), has_prices)
+
+
+class StockXAgent(SourceAgent):
+    name, label, host = 'stockx', 'StockX', 'stockx.com'
+    cost = 3.0
+    concurrency = 2
+    ttl = CACHE_TTLS['stockx']
+    timeout = RESILIENCE_TIMEOUTS['stockx']
+    metrics = ('lowest_ask', 'last_sale', 'highest_bid')
+    reference_fields = ('lowest_ask', 'last_sale')
+    graded = ('PSA', 10.0)
+
+    async def scrape(self, card):
+        return await get_stockx_data(card['name'], card.get('set_name', ''), "PSA 10")
+
+
+registry.register(StockXAgent())
 
 if __name__ == "__main__":
     # Test
@@ -0,0 +1,79 @@
+"""
+Streaming /search responses: NDJSON by default, server-sent events on request.
+
+The pipeline is an async generator of ``(event, body)`` pairs. Under ASGI
+it is consumed directly on the server's loop. Flask's streaming responses
+are plain iterators, so there it runs on a private event loop in a worker
+thread and hands encoded chunks over through a queue.
+"""
+
+import asyncio
+import json
+import queue
+import threading
+from typing import AsyncIterator, Callable, Dict, Iterator, Tuple
+
+STREAM_HEADERS = {
+    'Cache-Control': 'no-cache',
+    # Stop reverse proxies (nginx, Railway's edge) from buffering the stream
+    'X-Accel-Buffering': 'no',
+}
+
+
+def wants_sse(fmt, accept: str) -> bool:
+    """``?format=sse`` or ``Accept: text/event-stream`` selects SSE; otherwise NDJSON."""
+    if fmt:
+        return fmt.lower() == 'sse'
+    return 'text/event-stream' in (accept or '')
+
+
+def stream_mimetype(sse: bool) -> str:
+    return 'text/event-stream' if sse else 'application/x-ndjson'
+
+
+def encode(event: str, body: Dict, sse: bool) -> bytes:
+    """One event as an SSE frame, or an NDJSON line with the event name in ``"event"``."""
+    if sse:
+        return f"event: {event}\ndata: {json.dumps(body)}\n\n".encode('utf-8')
+    return (json.dumps({'event': event, **body}) + '\n').encode('utf-8')
+
+
+_END = object()
+
+
+def stream_in_thread(make_events: Callable[[], AsyncIterator[Tuple[str, Dict]]], sse: bool) -> Iterator[bytes]:
+    """Drive ``make_events()`` on its own loop in a thread and yield the encoded events.
+
+    Closing the returned iterator (the client disconnected) cancels the pipeline.
+    """
+    chunks = queue.Queue()
+    running = {}
+
+    async def pump():
+        running['loop'] = asyncio.get_running_loop()
+        running['task'] = asyncio.current_task()
+        try:
+            async for event, body in make_events():
+                chunks.put(encode(event, body, sse))
+        finally:
+            chunks.put(_END)
+
+    def run():
+        try:
+            asyncio.run(pump())
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"Search stream error: {repr(e)}")
+
+    thread = threading.Thread(target=run, name='search-stream', daemon=True)
+    thread.start()
+    try:
+        while True:
+            chunk = chunks.get()
+            if chunk is _END:
+                return
+            yield chunk
+    finally:
+        if thread.is_alive() and 'task' in running:
+            running['loop'].call_soon_threadsafe(running['task'].cancel)
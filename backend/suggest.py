@@ -0,0 +1,166 @@
+"""
+In-memory typeahead index for /suggest.
+
+Card names, set names and printings ("Charizard 4/102") are stored as one
+sorted array of normalized keys, so a prefix lookup is a binary search plus
+a short scan. Every word of a multi-word name is also indexed, so "char"
+finds "Dark Charizard". Results are ranked by popularity: a static prior
+from the catalog/seed data plus live search counts. Top candidates for one-
+and two-character prefixes are precomputed, since those ranges are huge, and
+rebuilt on a background thread as live counts change.
+"""
+
+import bisect
+import heapq
+import math
+import threading
+from collections import defaultdict
+from typing import Dict, List
+
+from card_index import base_card_name
+from catalog import CardCatalog, normalize
+from seed_data import PRODUCTS
+
+SHORT_PREFIX = 2
+SHORT_PREFIX_CANDIDATES = 50
+MAX_SCAN = 2000
+REBUILD_EVERY = 500
+
+
+class SuggestIndex:
+    def __init__(self, entries: List[Dict]):
+        # entries: {'text', 'type', 'popularity', optional 'set', 'id'}
+        self._entries = entries
+        keyed = []
+        for entry_id, entry in enumerate(entries):
+            words = normalize(entry['text']).split()
+            for start in range(len(words)):
+                keyed.append((' '.join(words[start:]), start, entry_id))
+        keyed.sort()
+        self._keys = [k for k, _, _ in keyed]
+        self._key_entries = [e for _, _, e in keyed]
+        self._key_word = [w for _, w, _ in keyed]
+        # The card name whose searches count towards each entry
+        self._entry_card = [entry.get('card') or normalize(entry['text']) for entry in entries]
+
+        self._lock = threading.Lock()
+        self._searches = defaultdict(int)   # normalized card name -> searches
+        self._recorded = 0
+        self._rebuilding = False
+        self._short = self._build_short_prefixes()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _score(self, entry_id: int, word: int) -> float:
+        live = self._searches.get(self._entry_card[entry_id], 0)
+        # Matching the first word beats matching a later word of the name
+        return self._entries[entry_id]['popularity'] + math.log1p(live) * 2 - word * 0.5
+
+    def _build_short_prefixes(self) -> Dict[str, List]:
+        best = defaultdict(dict)
+        for key, entry_id, word in zip(self._keys, self._key_entries, self._key_word):
+            score = self._score(entry_id, word)
+            for n in range(1, SHORT_PREFIX + 1):
+                if len(key) >= n:
+                    bucket = best[key[:n]]
+                    if score > bucket.get(entry_id, (-math.inf,))[0]:
+                        bucket[entry_id] = (score, word)
+        return {
+            prefix: [(entry_id, word) for entry_id, (_, word) in
+                     heapq.nlargest(SHORT_PREFIX_CANDIDATES, bucket.items(), key=lambda item: item[1][0])]
+            for prefix, bucket in best.items()
+        }
+
+    def record(self, card_name: str):
+        """Count a search for ``card_name`` towards its suggestion ranking."""
+        with self._lock:
+            self._searches[normalize(card_name)] += 1
+            self._recorded += 1
+            rebuild = self._recorded % REBUILD_EVERY == 0 and not self._rebuilding
+            if rebuild:
+                self._rebuilding = True
+        if rebuild:
+            # A pass over every key; kept off the request (and the ASGI loop)
+            threading.Thread(target=self._rebuild, name='suggest-rebuild', daemon=True).start()
+
+    def _rebuild(self):
+        try:
+            self._short = self._build_short_prefixes()
+        except Exception as e:
+            print(f"Suggest: Rebuilding short prefixes failed: {repr(e)}")
+        finally:
+            with self._lock:
+                self._rebuilding = False
+
+    def suggest(self, prefix: str, limit: int = 8) -> List[Dict]:
+        p = normalize(prefix)
+        if not p:
+            return []
+
+        if len(p) <= SHORT_PREFIX:
+            candidates = self._short.get(p, [])
+        else:
+            start = bisect.bisect_left(self._keys, p)
+            end = bisect.bisect_right(self._keys, p + '\uffff', start, min(len(self._keys), start + MAX_SCAN))
+            candidates = zip(self._key_entries[start:end], self._key_word[start:end])
+
+        best = {}
+        for entry_id, word in candidates:
+            score = self._score(entry_id, word)
+            if score > best.get(entry_id, -math.inf):
+                best[entry_id] = score
+
+        top = heapq.nlargest(limit, best.items(), key=lambda item: item[1])
+        results = []
+        for entry_id, _ in top:
+            entry = self._entries[entry_id]
+            results.append({k: v for k, v in entry.items() if k not in ('popularity', 'card')})
+        return results
+
+
+def _entries_from_catalog(catalog: CardCatalog) -> List[Dict]:
+    printings = defaultdict(int)
+    for name in catalog.norm_names:
+        printings[name] += 1
+    set_sizes = defaultdict(int)
+    for set_name in catalog.set_names:
+        set_sizes[set_name] += 1
+
+    entries = []
+    seen_names = set()
+    for i, name in enumerate(catalog.names):
+        norm = catalog.norm_names[i]
+        # Cards reprinted often are the ones people look for
+        prior = math.log1p(printings[norm])
+        if norm not in seen_names:
+            seen_names.add(norm)
+            entries.append({'text': name, 'type': 'card', 'popularity': prior + 1})
+        entries.append({
+            'text': f"{name} {catalog.numbers[i]}".strip(), 'type': 'printing',
+            'set': catalog.set_names[i], 'id': catalog.ids[i], 'card': norm, 'popularity': prior - 1,
+        })
+    for set_name, size in set_sizes.items():
+        entries.append({'text': set_name, 'type': 'set', 'popularity': math.log1p(size) / 2})
+    return entries
+
+
+def _entries_from_seed() -> List[Dict]:
+    entries = []
+    seen = set()
+    for product in PRODUCTS:
+        name = base_card_name(product)
+        set_name = product['specs'].get('set', '')
+        for text, kind in ((name, 'card'), (set_name, 'set')):
+            if text and normalize(text) not in seen:
+                seen.add(normalize(text))
+                entries.append({'text': text, 'type': kind, 'popularity': 1.0})
+        entries.append({'text': product['name'], 'type': 'product', 'id': product['id'],
+                        'card': normalize(name), 'popularity': 0.5})
+    return entries
+
+
+def build_index(catalog: CardCatalog) -> SuggestIndex:
+    """Index the synced catalog, or the seeded products when there is none."""
+    entries = _entries_from_catalog(catalog) if len(catalog) else _entries_from_seed()
+    return SuggestIndex(entries)
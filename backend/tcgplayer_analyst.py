@@ -1,75 +1,198 @@
 import asyncio
-from playwright.async_api import async_playwright
-from playwright_stealth import stealth
-import random
+import re
+from agents import ScrapeFailed, SourceAgent, registry
+from browser_pool import browser_pool
+from config import CACHE_TTLS, RESILIENCE_TIMEOUTS, TCGPLAYER_API_URL, TCGPLAYER_BASE_URL
+from http_pool import http_pool, parse_price
+from page_policy import PageLoader
+from product_urls import product_urls, url_key
+from scrape_tiers import tiers
+
+# User agents to rotate
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36'
+]
+
+# The JSON endpoint behind the product page's price guide
+PRICE_POINTS_URL = TCGPLAYER_API_URL + "/v2/product/{product_id}/pricepoints"
+PRODUCT_ID = re.compile(r'/product/(\d+)')
+PRODUCT_SELECTOR = '.search-result__title a'
+
+
+async def read_price_points(loader, product_url):
+    """Market price and listed median from the price-guide API, without loading the page.
+
+    ``loader`` is a PageLoader or an HttpLoader.
+    """
+    match = PRODUCT_ID.search(product_url)
+    if not match:
+        return None
+    points = await loader.fetch_json(PRICE_POINTS_URL.format(product_id=match.group(1)))
+    if not isinstance(points, list):
+        return None
+    # One entry per printing (Normal, Holofoil, 1st Edition...); take the first that has a market price
+    for point in points:
+        if isinstance(point, dict) and point.get('marketPrice'):
+            return {
+                "source": "TCGPlayer",
+                "raw_market_price": float(point['marketPrice']),
+                "listed_median": float(point.get('listedMedianPrice') or 0.0),
+                "link": product_url
+            }
+    return None
+
+
+async def read_product_page(page, loader, product_url):
+    """Price guide values scraped from the rendered product page."""
+    await loader.goto(product_url)
+    if loader.last_status and loader.last_status >= 400:
+        return None
+    await loader.wait('.price-guide__table', required=False)
+
+    # Extract data
+    market_price = 0.0
+    listed_median = 0.0
+
+    # TCGPlayer often has price labels
+    with loader.extract():
+        try:
+            # Market Price
+            market_price_text = await page.inner_text('.price-guide__table tr:has-text("Market Price") .price', timeout=1000)
+            market_price = float(market_price_text.replace('$', '').replace(',', ''))
+        except:
+            pass
 
-async def get_tcgplayer_data(card_name, set_name):
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        
-        user_agents = [
-            'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36'
-        ]
-        
-        context = await browser.new_context(user_agent=random.choice(user_agents))
-        page = await context.new_page()
-        await stealth(page)
-        
-        # Construct search query
-        search_query = f"{card_name} {set_name}"
-        search_url = f"https://www.tcgplayer.com/search/all/product?q={search_query.replace(' ', '+')}"
-        
         try:
+            # Listed Median
+            median_price_text = await page.inner_text('.price-guide__table tr:has-text("Listed Median") .price', timeout=1000)
+            listed_median = float(median_price_text.replace('$', '').replace(',', ''))
+        except:
+            pass
+
+    return {
+        "source": "TCGPlayer",
+        "raw_market_price": market_price,
+        "listed_median": listed_median,
+        "link": product_url
+    }
+
+
+async def read_product_html(loader, product_url):
+    """Price guide values from a product page fetched over plain HTTP."""
+    page = await loader.get(product_url)
+    if page is None:
+        return None
+    prices = {}
+    with loader.extract():
+        for row in page.soup.select('.price-guide__table tr'):
+            label = row.get_text(' ', strip=True)
+            price = row.select_one('.price')
+            for name in ('Market Price', 'Listed Median'):
+                if name in label and price is not None:
+                    prices.setdefault(name, parse_price(price.get_text()))
+    return {
+        "source": "TCGPlayer",
+        "raw_market_price": prices.get('Market Price', 0.0),
+        "listed_median": prices.get('Listed Median', 0.0),
+        "link": product_url
+    }
+
+
+async def read_product(page, loader, product_url):
+    return await read_price_points(loader, product_url) or await read_product_page(page, loader, product_url)
+
+
+def has_prices(result):
+    return bool(result and (result['raw_market_price'] or result['listed_median']))
+
+
+async def get_tcgplayer_data(card_name, set_name):
+    # Construct search query
+    search_query = f"{card_name} {set_name}"
+    search_url = f"{TCGPLAYER_BASE_URL}/search/all/product?q={search_query.replace(' ', '+')}"
+    key = url_key(card_name, set_name)
+
+    async def scrape_http(loader):
+        mapped_url = product_urls.get('tcgplayer', key)
+        if mapped_url:
+            result = await read_price_points(loader, mapped_url) or await read_product_html(loader, mapped_url)
+            if has_prices(result):
+                product_urls.confirm('tcgplayer', key)
+                loader.succeeded()
+                return result
+            if loader.last_status in (404, 410):
+                product_urls.invalidate('tcgplayer', key, gone=True)
+
+        search = await loader.get(search_url)
+        href = search.select_attr(PRODUCT_SELECTOR, 'href') if search else None
+        if not href:
+            return None
+        product_url = f"{TCGPLAYER_BASE_URL}{href}"
+        result = await read_price_points(loader, product_url) or await read_product_html(loader, product_url)
+        if not has_prices(result):
+            return None
+        if product_url != mapped_url:
+            product_urls.learn('tcgplayer', key, product_url)
+        loader.succeeded()
+        return result
+
+    async def scrape(page):
+        async with PageLoader(page, 'TCGPlayer') as loader:
+            # Fast path: a known product, no search navigation
+            mapped_url = product_urls.get('tcgplayer', key)
+            if mapped_url:
+                print(f"TCGPlayer Agent: Using known product page: {mapped_url}")
+                result = await read_product(page, loader, mapped_url)
+                if has_prices(result):
+                    product_urls.confirm('tcgplayer', key)
+                    loader.succeeded()
+                    return result
+                product_urls.invalidate('tcgplayer', key, gone=loader.last_status in (404, 410))
+
             print(f"TCGPlayer Agent: Navigating to {search_url}")
-            await page.goto(search_url, wait_until="networkidle", timeout=30000)
-            
+
             # Find the first product link
-            product_selector = '.search-result__title a'
-            await page.wait_for_selector(product_selector, timeout=10000)
-            
-            product_link = await page.query_selector(product_selector)
+            await loader.goto(search_url, wait_for=PRODUCT_SELECTOR, required=False)
+            if loader.last_status and loader.last_status >= 400:
+                raise ScrapeFailed(f"TCGPlayer search answered {loader.last_status}")
+
+            product_link = await page.query_selector(PRODUCT_SELECTOR)
             if not product_link:
                 print("TCGPlayer Agent: No product found.")
                 return None
-                
+
             href = await product_link.get_attribute('href')
-            product_url = f"https://www.tcgplayer.com{href}"
-            
+            product_url = f"{TCGPLAYER_BASE_URL}{href}"
+
             print(f"TCGPlayer Agent: Found product page: {product_url}")
-            await page.goto(product_url, wait_until="networkidle", timeout=30000)
-            
-            # Extract data
-            market_price = 0.0
-            listed_median = 0.0
-            
-            # TCGPlayer often has price labels
-            try:
-                # Market Price
-                market_price_text = await page.inner_text('.price-guide__table tr:has-text("Market Price") .price', timeout=5000)
-                market_price = float(market_price_text.replace('$', '').replace(',', ''))
-            except:
-                pass
-                
-            try:
-                # Listed Median
-                median_price_text = await page.inner_text('.price-guide__table tr:has-text("Listed Median") .price', timeout=5000)
-                listed_median = float(median_price_text.replace('$', '').replace(',', ''))
-            except:
-                pass
-            
-            return {
-                "source": "TCGPlayer",
-                "raw_market_price": market_price,
-                "listed_median": listed_median,
-                "link": product_url
-            }
-            
-        except Exception as e:
-            print(f"TCGPlayer Agent Error: {str(e)}")
-            return None
-        finally:
-            await browser.close()
+            result = await read_product(page, loader, product_url)
+            if result is None:
+                raise ScrapeFailed(f"TCGPlayer product page answered {loader.last_status}")
+            if product_url != mapped_url:
+                product_urls.learn('tcgplayer', key, product_url)
+            if has_prices(result):
+                loader.succeeded()
+            return result
+
+    return await tiers.run('tcgplayer', lambda: http_pool.run(scrape_http, 'TCGPlayer', USER_AGENTS),
+                           lambda: browser_pool.run(scrape, USER_AGENTS), has_prices)
+
+
+class TCGPlayerAgent(SourceAgent):
+    name, label, host = 'tcgplayer', 'TCGPlayer', 'www.tcgplayer.com'
+    cost = 2.0
+    concurrency = 2
+    ttl = CACHE_TTLS['tcgplayer']
+    timeout = RESILIENCE_TIMEOUTS['tcgplayer']
+    metrics = ('raw_market_price', 'listed_median')
+    reference_fields = ('listed_median', 'raw_market_price')
+
+    async def scrape(self, card):
+        return await get_tcgplayer_data(card['name'], card.get('set_name', ''))
+
+
+registry.register(TCGPlayerAgent())
 
 if __name__ == "__main__":
     # Test
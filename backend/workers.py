@@ -0,0 +1,159 @@
+"""
+Scrape workers: run the source agents outside the web processes.
+
+    python workers.py [--processes 4] [--concurrency 4] [--sources stockx,pwcc]
+
+With SCRAPE_MODE=queue the web tier queues each agent fetch as a job (see
+job_queue.py) instead of running the agent itself. These worker processes
+claim the jobs, run the agents, store each result in the shared result
+cache, and mark the job done for the web request awaiting it.
+
+Each worker process runs up to --concurrency jobs at a time on its own
+event loop, with its own browser and HTTP pools. A slow page or a crashing
+browser only costs that worker, not the API, and scraping capacity scales
+with --processes independently of the web tier. The parent process
+restarts workers that die. Their claimed jobs are re-run once their lease
+runs out.
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from typing import List
+
+from config import JOB_LEASE, JOB_POLL_INTERVAL, JOB_RETENTION, JOB_WORKER_CONCURRENCY, JOB_WORKERS
+
+HEARTBEAT_EVERY = 5.0
+# Idle workers back off to this poll interval
+MAX_IDLE_POLL = 0.5
+PURGE_EVERY = 300.0
+
+
+async def run_job(job, worker_id: str):
+    from agents import registry
+    from cache import result_cache
+    from job_queue import job_queue
+
+    agent = registry.get(job['source'])
+    try:
+        # Give up well inside the lease, so a hung page never outlives its claim
+        record = await asyncio.wait_for(agent.fetch(job['payload']), min(agent.timeout[1], JOB_LEASE * 0.8))
+    except Exception as e:
+        print(f"Worker {worker_id}: {job['source']} job {job['id']} failed (attempt {job['attempts']}): {repr(e)}")
+        await asyncio.to_thread(job_queue.fail, job['id'], worker_id, repr(e))
+        return False
+    value = record.to_dict() if record else None
+    if value is not None:
+        result_cache.set(job['source'], job['key'], value)
+    await asyncio.to_thread(job_queue.complete, job['id'], worker_id, value)
+    return True
+
+
+async def work(worker_id: str, sources: List[str], concurrency: int):
+    from agents import load_agents, registry
+    from job_queue import job_queue
+
+    load_agents()
+    sources = [s for s in sources if s in {agent.name for agent in registry.all()}] or \
+        [agent.name for agent in registry.all()]
+    slots = asyncio.Semaphore(concurrency)
+    counters = {'done': 0, 'failed': 0}
+    running = set()
+    idle_poll = JOB_POLL_INTERVAL
+    last_heartbeat = 0.0
+    print(f"Worker {worker_id}: serving {', '.join(sources)} with {concurrency} slots")
+
+    async def run(job):
+        try:
+            counters['done' if await run_job(job, worker_id) else 'failed'] += 1
+        finally:
+            slots.release()
+
+    while True:
+        if time.monotonic() - last_heartbeat >= HEARTBEAT_EVERY:
+            last_heartbeat = time.monotonic()
+            await asyncio.to_thread(job_queue.heartbeat, worker_id, {
+                'pid': os.getpid(), 'sources': sources, 'running': len(running), **counters})
+
+        await slots.acquire()
+        job = await asyncio.to_thread(job_queue.claim, worker_id, sources)
+        if job is None:
+            slots.release()
+            await asyncio.sleep(idle_poll)
+            idle_poll = min(MAX_IDLE_POLL, idle_poll * 2)
+            continue
+        idle_poll = JOB_POLL_INTERVAL
+        task = asyncio.ensure_future(run(job))
+        running.add(task)
+        task.add_done_callback(running.discard)
+
+
+def worker_main(index: int, sources: List[str], concurrency: int):
+    # The parent handles Ctrl-C and stops its workers with SIGTERM
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    worker_id = f"{socket.gethostname()}-{os.getpid()}-{index}"
+    asyncio.run(work(worker_id, sources, concurrency))
+
+
+def supervise(processes: int, sources: List[str], concurrency: int):
+    """Run ``processes`` workers, restarting any that exit, until interrupted."""
+    from job_queue import job_queue
+
+    context = multiprocessing.get_context('spawn')
+    workers = {}
+
+    def start(index: int):
+        process = context.Process(target=worker_main, args=(index, sources, concurrency),
+                                  name=f'scrape-worker-{index}', daemon=True)
+        process.start()
+        workers[index] = process
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for index in range(processes):
+        start(index)
+    last_purge = time.monotonic()
+    try:
+        while not stopping:
+            time.sleep(1.0)
+            for index, process in list(workers.items()):
+                if not process.is_alive() and not stopping:
+                    print(f"Workers: worker {index} (pid {process.pid}) exited with {process.exitcode}; restarting")
+                    start(index)
+            if time.monotonic() - last_purge >= PURGE_EVERY:
+                last_purge = time.monotonic()
+                purged = job_queue.purge(JOB_RETENTION)
+                if purged:
+                    print(f"Workers: purged {purged} finished jobs")
+    finally:
+        for process in workers.values():
+            process.terminate()
+        for process in workers.values():
+            process.join(10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--processes', type=int, default=JOB_WORKERS)
+    parser.add_argument('--concurrency', type=int, default=JOB_WORKER_CONCURRENCY, help='jobs in flight per worker')
+    parser.add_argument('--sources', default='', help='comma-separated agents to serve (default: all)')
+    args = parser.parse_args()
+
+    sources = [s.strip() for s in args.sources.split(',') if s.strip()]
+    print(f"Workers: starting {args.processes} processes x {args.concurrency} jobs")
+    supervise(args.processes, sources, args.concurrency)
+
+
+if __name__ == '__main__':
+    main()
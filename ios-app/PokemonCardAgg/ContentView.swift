@@ -96,7 +96,11 @@ struct ContentView: View {
         
         Task {
             do {
-                let results = try await networkManager.search(query: searchQuery)
+                // Render the card as soon as it resolves, then fill in markets as they arrive
+                let results = try await networkManager.searchStream(query: searchQuery) { partial in
+                    searchResults = partial
+                    isSearching = false
+                }
                 searchResults = results
             } catch {
                 // Error is already set in networkManager
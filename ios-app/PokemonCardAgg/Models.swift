@@ -20,6 +20,12 @@ struct SearchResult: Codable {
     }
 }
 
+/// Envelope of one /search/stream line: "card", "update", "done" or "error"
+struct StreamEvent: Codable {
+    let event: String
+    let error: String?
+}
+
 struct GradeStats: Codable {
     let average: Double
     let count: Int
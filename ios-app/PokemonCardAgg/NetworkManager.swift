@@ -95,6 +95,77 @@ class NetworkManager: ObservableObject {
         }
     }
     
+    /// Search with progressive results from /search/stream
+    /// - Parameters:
+    ///   - query: Search query (e.g., "Charizard")
+    ///   - onUpdate: Called with the full result so far, first with just the card,
+    ///     then again as eBay and each comparison market arrive
+    /// - Returns: The final SearchResult
+    func searchStream(query: String, onUpdate: @escaping (SearchResult) -> Void) async throws -> SearchResult {
+        guard !query.isEmpty else {
+            throw NetworkError.invalidURL
+        }
+        
+        guard var urlComponents = URLComponents(string: "\(baseURL)/search/stream") else {
+            throw NetworkError.invalidURL
+        }
+        
+        urlComponents.queryItems = [
+            URLQueryItem(name: "q", value: query)
+        ]
+        
+        guard let url = urlComponents.url else {
+            throw NetworkError.invalidURL
+        }
+        
+        isLoading = true
+        errorMessage = nil
+        
+        defer {
+            isLoading = false
+        }
+        
+        do {
+            // One NDJSON line per event; every non-error line is a complete SearchResult
+            let (bytes, response) = try await URLSession.shared.bytes(from: url)
+            
+            guard let httpResponse = response as? HTTPURLResponse, httpResponse.statusCode == 200 else {
+                throw NetworkError.serverError("Invalid response")
+            }
+            
+            let decoder = JSONDecoder()
+            var latest: SearchResult?
+            
+            for try await line in bytes.lines {
+                guard let data = line.data(using: .utf8), !data.isEmpty else { continue }
+                
+                let event = try decoder.decode(StreamEvent.self, from: data)
+                if event.event == "error" {
+                    throw NetworkError.serverError(event.error ?? "Search failed")
+                }
+                
+                let result = try decoder.decode(SearchResult.self, from: data)
+                latest = result
+                onUpdate(result)
+                if event.event == "done" {
+                    break
+                }
+            }
+            
+            guard let result = latest else {
+                throw NetworkError.noData
+            }
+            return result
+            
+        } catch let error as NetworkError {
+            errorMessage = error.localizedDescription
+            throw error
+        } catch {
+            errorMessage = "Network error: \(error.localizedDescription)"
+            throw NetworkError.serverError(error.localizedDescription)
+        }
+    }
+    
     /// Check if the API is healthy
     /// - Returns: True if the API is responding
     func checkHealth() async -> Bool {
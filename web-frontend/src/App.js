@@ -17,6 +17,8 @@ function App() {
     const [sortBy, setSortBy] = useState('DEAL_SCORE'); // DEAL_SCORE, PRICE_ASC, PRICE_DESC, GRADE_DESC, GRADE_ASC
 
     const [featuredCards, setFeaturedCards] = useState([]);
+    const [suggestions, setSuggestions] = useState([]);
+    const [showSuggestions, setShowSuggestions] = useState(false);
 
     // Fetch featured cards on mount
     useEffect(() => {
@@ -25,20 +27,73 @@ function App() {
             .catch(err => console.error('Failed to load featured cards:', err));
     }, []);
 
+    // Typeahead: /suggest is served from memory, so it's cheap to call per keystroke
+    useEffect(() => {
+        const prefix = query.trim();
+        if (!prefix) {
+            setSuggestions([]);
+            return;
+        }
+        const controller = new AbortController();
+        const timer = setTimeout(() => {
+            axios.get(`${API_BASE_URL}/suggest`, { params: { q: prefix }, signal: controller.signal })
+                .then(response => setSuggestions(response.data.suggestions || []))
+                .catch(() => {});
+        }, 80);
+        return () => {
+            clearTimeout(timer);
+            controller.abort();
+        };
+    }, [query]);
+
+    const handleSuggestionClick = (suggestion) => {
+        setQuery(suggestion.type === 'printing' && suggestion.set ? `${suggestion.text} ${suggestion.set}` : suggestion.text);
+        setShowSuggestions(false);
+    };
+
+    // Streams /search: the card renders first, then listings and each market as it arrives
+    const streamSearch = async (q) => {
+        const response = await fetch(`${API_BASE_URL}/search/stream?q=${encodeURIComponent(q)}`);
+        if (!response.ok || !response.body) throw new Error('stream unavailable');
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffered = '';
+        for (;;) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffered += decoder.decode(value, { stream: true });
+            const lines = buffered.split('\n');
+            buffered = lines.pop();
+            for (const line of lines) {
+                if (!line.trim()) continue;
+                const event = JSON.parse(line);
+                if (event.event === 'error') {
+                    setError(event.error);
+                    return;
+                }
+                setSearchResults(event);
+                setLoading(false);
+            }
+        }
+    };
+
     const handleSearch = async (e) => {
         e.preventDefault();
+        setShowSuggestions(false);
         if (!query.trim()) return;
         setLoading(true);
         setError(null);
         setSearchResults(null);
         try {
-            const response = await axios.get(`${API_BASE_URL}/search`, { params: { q: query } });
-            setSearchResults(response.data);
-
-            // Reset filters on new search? Optional. Let's keep them for continuity or reset if needed.
-            // For now, let's keep user preferences.
-        } catch (err) {
-            setError(err.response?.data?.error || 'Failed to fetch results. Check backend connection.');
+            await streamSearch(query);
+        } catch (streamErr) {
+            // Older backends (or proxies that buffer) fall back to the one-shot endpoint
+            try {
+                const response = await axios.get(`${API_BASE_URL}/search`, { params: { q: query } });
+                setSearchResults(response.data);
+            } catch (err) {
+                setError(err.response?.data?.error || 'Failed to fetch results. Check backend connection.');
+            }
         } finally {
             setLoading(false);
         }
@@ -145,10 +200,29 @@ function App() {
                                 <input
                                     type="text"
                                     value={query}
-                                    onChange={(e) => setQuery(e.target.value)}
+                                    onChange={(e) => {
+                                        setQuery(e.target.value);
+                                        setShowSuggestions(true);
+                                    }}
+                                    onFocus={() => setShowSuggestions(true)}
+                                    onBlur={() => setTimeout(() => setShowSuggestions(false), 150)}
                                     placeholder="Search cards (e.g., Charizard Base Set)..."
                                     className="w-full pl-12 pr-4 py-3 bg-transparent text-xl font-medium text-white placeholder-gray-500 focus:outline-none"
                                 />
+                                {showSuggestions && suggestions.length > 0 && (
+                                    <ul className="absolute left-0 right-0 top-full mt-3 z-50 bg-gray-900/95 backdrop-blur-xl border border-white/10 rounded-xl shadow-2xl overflow-hidden">
+                                        {suggestions.map((suggestion, idx) => (
+                                            <li
+                                                key={`${suggestion.type}-${suggestion.id || suggestion.text}-${idx}`}
+                                                onMouseDown={() => handleSuggestionClick(suggestion)}
+                                                className="flex justify-between items-center px-4 py-2 cursor-pointer hover:bg-cyan-500/10"
+                                            >
+                                                <span className="text-white">{suggestion.text}</span>
+                                                <span className="text-xs text-gray-500">{suggestion.set || suggestion.type}</span>
+                                            </li>
+                                        ))}
+                                    </ul>
+                                )}
                             </div>
                             <button
                                 type="submit"
@@ -197,6 +271,9 @@ function App() {
                                         </div>
                                         <h3 className="font-bold text-center text-white mb-1 group-hover:text-cyan-400 transition-colors">{card.name}</h3>
                                         <p className="text-xs text-center text-gray-500 group-hover:text-gray-400">{card.set}</p>
+                                        {card.prices?.lowest_listing != null && (
+                                            <p className="text-xs text-center text-cyan-400 mt-1">from ${card.prices.lowest_listing.toLocaleString()}</p>
+                                        )}
                                     </div>
                                 </div>
                             ))}
@@ -278,10 +355,22 @@ function App() {
                                 <div className="bg-gray-800/40 backdrop-blur-xl rounded-2xl border border-white/10 shadow-xl p-6">
                                     <h2 className="text-lg font-bold text-white mb-6 flex items-center gap-2">
                                         <span className="text-cyan-400">🌐</span> Cross-Market Data
+                                        {searchResults.pending_sources?.length > 0 && (
+                                            <span className="ml-auto text-xs font-normal text-gray-500 animate-pulse">
+                                                Waiting on {searchResults.pending_sources.join(', ')}…
+                                            </span>
+                                        )}
+                                        {!searchResults.pending_sources?.length && Object.keys(searchResults.degraded_sources || {}).length > 0 && (
+                                            <span className="ml-auto text-xs font-normal text-amber-500">
+                                                Unavailable: {Object.keys(searchResults.degraded_sources).join(', ')}
+                                            </span>
+                                        )}
                                     </h2>
                                     <PriceComparisonChart
                                         data={searchResults.comparison_data}
                                         ebayAvg={searchResults.market_stats?.['10.0']?.average}
+                                        cardId={searchResults.card?.id}
+                                        apiBaseUrl={API_BASE_URL}
                                     />
                                     <div className="mt-6 flex flex-col gap-3">
                                         {searchResults.comparison_data.StockX && (
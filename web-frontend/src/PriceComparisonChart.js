@@ -1,7 +1,66 @@
-import React from 'react';
-import { BarChart, Bar, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer } from 'recharts';
+import React, { useState, useEffect } from 'react';
+import axios from 'axios';
+import { BarChart, Bar, LineChart, Line, Legend, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer } from 'recharts';
 
-const PriceComparisonChart = ({ data, ebayAvg }) => {
+// Stored series to plot: [label, source, metric, company, grade, color]
+const HISTORY_LINES = [
+    ['eBay PSA 10 (Avg)', 'eBay', 'listing', 'PSA', 10, '#4F46E5'],
+    ['StockX (Last Sale)', 'StockX', 'last_sale', 'PSA', 10, '#000000'],
+    ['TCGPlayer', 'TCGPlayer', 'raw_market_price', null, null, '#22C55E'],
+    ['PWCC', 'PWCC', 'market_price', null, null, '#F59E0B'],
+];
+
+// Daily price history from the backend's stored rollups; no scrapes involved
+const PriceHistoryChart = ({ cardId, apiBaseUrl }) => {
+    const [history, setHistory] = useState([]);
+
+    useEffect(() => {
+        if (!cardId || !apiBaseUrl) return;
+        const controller = new AbortController();
+        axios.get(`${apiBaseUrl}/history/${encodeURIComponent(cardId)}`, {
+            params: { bucket: '1d', days: 90 },
+            signal: controller.signal,
+        })
+            .then(res => {
+                const byDay = {};
+                HISTORY_LINES.forEach(([label, source, metric, company, grade]) => {
+                    const series = res.data.series.find(s => s.source === source && s.metric === metric
+                        && s.company === company && s.grade === grade);
+                    (series?.points || []).forEach(p => {
+                        byDay[p.t] = byDay[p.t] || { t: p.t, date: new Date(p.t * 1000).toLocaleDateString() };
+                        byDay[p.t][label] = p.average;
+                    });
+                });
+                setHistory(Object.values(byDay).sort((a, b) => a.t - b.t));
+            })
+            .catch(() => setHistory([]));
+        return () => controller.abort();
+    }, [cardId, apiBaseUrl]);
+
+    if (history.length < 2) return null;
+
+    return (
+        <div className="w-full h-64 mt-10">
+            <h3 className="text-sm font-semibold text-gray-500 uppercase tracking-wider mb-4">
+                Price History (90 Days)
+            </h3>
+            <ResponsiveContainer width="100%" height="100%">
+                <LineChart data={history} margin={{ top: 5, right: 30, left: 20, bottom: 5 }}>
+                    <CartesianGrid strokeDasharray="3 3" vertical={false} />
+                    <XAxis dataKey="date" axisLine={false} tickLine={false} />
+                    <YAxis axisLine={false} tickLine={false} tickFormatter={(value) => `$${value}`} />
+                    <Tooltip formatter={(value) => `$${value.toFixed(2)}`} />
+                    <Legend />
+                    {HISTORY_LINES.map(([label, , , , , color]) => (
+                        <Line key={label} type="monotone" dataKey={label} stroke={color} dot={false} connectNulls />
+                    ))}
+                </LineChart>
+            </ResponsiveContainer>
+        </div>
+    );
+};
+
+const PriceComparisonChart = ({ data, ebayAvg, cardId, apiBaseUrl }) => {
     if (!data) return null;
 
     const chartData = [
@@ -28,12 +87,16 @@ const PriceComparisonChart = ({ data, ebayAvg }) => {
     ].filter(item => item.price > 0);
 
     if (chartData.length === 0) return (
-        <div className="text-center py-8 text-gray-500 italic">
-            Insufficient data for price comparison
-        </div>
+        <>
+            <div className="text-center py-8 text-gray-500 italic">
+                Insufficient data for price comparison
+            </div>
+            <PriceHistoryChart cardId={cardId} apiBaseUrl={apiBaseUrl} />
+        </>
     );
 
     return (
+        <>
         <div className="w-full h-64 mt-4">
             <h3 className="text-sm font-semibold text-gray-500 uppercase tracking-wider mb-4">
                 Cross-Platform Price Spread (PSA 10 Benchmark)
@@ -54,6 +117,8 @@ const PriceComparisonChart = ({ data, ebayAvg }) => {
                 Comparing current lowest asks and market averages across primary sources.
             </div>
         </div>
+        <PriceHistoryChart cardId={cardId} apiBaseUrl={apiBaseUrl} />
+        </>
     );
 };
 